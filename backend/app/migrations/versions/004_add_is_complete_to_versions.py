@@ -0,0 +1,27 @@
+"""add is_complete to law_versions
+
+Revision ID: 004_add_is_complete
+Revises: 003_add_content_html
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_add_is_complete'
+down_revision = '003_add_content_html'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Уже существующие версии считаем полностью загруженными
+    op.add_column(
+        'law_versions',
+        sa.Column('is_complete', sa.Boolean(), nullable=False, server_default=sa.true())
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('law_versions', 'is_complete')
@@ -59,6 +59,7 @@ class LawVersion(Base):
     version_date = Column(Date, nullable=False)  # Дата актуализации закона
     parsed_at = Column(DateTime, default=datetime.utcnow)  # Когда спарсили
     is_active = Column(Boolean, default=True)  # Активная версия (последняя)
+    is_complete = Column(Boolean, default=True)  # Все главы и статьи загружены (False — загрузка не завершена)
     
     # Связь с статьями
     articles = relationship("LawArticle", back_populates="version", cascade="all, delete-orphan")
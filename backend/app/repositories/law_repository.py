@@ -2,13 +2,26 @@
 Repository для работы с законами.
 CRUD операции для LawVersion, LawChapter, LawArticle.
 """
-from typing import Optional, List
+import io
+import json
+from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, insert, delete
 
 from ..models import LawVersion, LawChapter, LawArticle
 
 
+def _copy_csv_field(column: str, value: Any) -> str:
+    """Поле для COPY ... (FORMAT csv): строки в кавычках, NULL — пустое поле без кавычек"""
+    if value is None:
+        return ""
+    if column == "keywords":
+        value = json.dumps(value, ensure_ascii=False)
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
 class LawRepository:
     """Репозиторий для работы с законами"""
     
@@ -44,6 +57,32 @@ class LawRepository:
         ).update({"is_active": False})
         self.db.commit()
     
+    def activate_version(self, version_id: int, law_code: str) -> None:
+        """Пометить версию загруженной и сделать её единственной активной"""
+        self.db.query(LawVersion).filter(
+            LawVersion.law_code == law_code,
+            LawVersion.is_active.is_(True),
+            LawVersion.id != version_id
+        ).update({"is_active": False})
+        self.db.query(LawVersion).filter_by(id=version_id).update(
+            {"is_active": True, "is_complete": True}
+        )
+        self.db.commit()
+    
+    def get_incomplete_versions(self, law_code: str) -> List[LawVersion]:
+        """Получить недогруженные версии (остались после падения загрузки)"""
+        return self.db.query(LawVersion).filter_by(
+            law_code=law_code,
+            is_complete=False
+        ).all()
+    
+    def delete_version(self, version_id: int) -> None:
+        """Удалить версию вместе со всеми главами и статьями"""
+        self.db.execute(delete(LawArticle).where(LawArticle.version_id == version_id))
+        self.db.execute(delete(LawChapter).where(LawChapter.version_id == version_id))
+        self.db.execute(delete(LawVersion).where(LawVersion.id == version_id))
+        self.db.commit()
+    
     # ==================== LawChapter ====================
     
     def get_chapters_by_version(self, version_id: int) -> List[LawChapter]:
@@ -64,6 +103,35 @@ class LawRepository:
         self.db.refresh(chapter)
         return chapter
     
+    def delete_chapter_by_url(self, version_id: int, source_url: str) -> None:
+        """Удалить главу версии (по URL) вместе с её статьями, без коммита"""
+        chapter_ids = self.db.query(LawChapter.id).filter_by(
+            version_id=version_id,
+            source_url=source_url
+        )
+        self.db.execute(delete(LawArticle).where(LawArticle.chapter_id.in_(chapter_ids.scalar_subquery())))
+        self.db.execute(delete(LawChapter).where(
+            LawChapter.version_id == version_id,
+            LawChapter.source_url == source_url
+        ))
+    
+    def count_chapters(self, version_id: int) -> int:
+        """Количество глав версии"""
+        return self.db.query(LawChapter).filter_by(version_id=version_id).count()
+    
+    def bulk_create_chapters(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        Массовая вставка глав (INSERT ... VALUES пачками, без коммита).
+        Возвращает ID в том же порядке, что и rows.
+        """
+        if not rows:
+            return []
+        result = self.db.execute(
+            insert(LawChapter).returning(LawChapter.id, sort_by_parameter_order=True),
+            rows
+        )
+        return list(result.scalars())
+    
     # ==================== LawArticle ====================
     
     def get_articles_by_version(self, version_id: int) -> List[LawArticle]:
@@ -108,6 +176,49 @@ class LawRepository:
         self.db.add(article)
         return article
     
+    def count_articles(self, version_id: int) -> int:
+        """Количество статей версии"""
+        return self.db.query(LawArticle).filter_by(version_id=version_id).count()
+    
+    def bulk_create_articles(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        Массовая вставка статей (INSERT ... VALUES пачками, без коммита).
+        Возвращает ID в том же порядке, что и rows.
+        """
+        if not rows:
+            return []
+        result = self.db.execute(
+            insert(LawArticle).returning(LawArticle.id, sort_by_parameter_order=True),
+            rows
+        )
+        return list(result.scalars())
+    
+    def copy_articles(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Загрузка статей через COPY (Postgres) — быстрее любого INSERT, без коммита.
+        На других СУБД — обычная массовая вставка. Возвращает количество строк.
+        """
+        if not rows:
+            return 0
+        if self.db.get_bind().dialect.name != "postgresql":
+            return len(self.bulk_create_articles(rows))
+        
+        columns = list(rows[0].keys())
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(_copy_csv_field(c, row[c]) for c in columns) + "\n")
+        buffer.seek(0)
+        
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {LawArticle.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+        return len(rows)
+    
     def bulk_commit(self) -> None:
         """Закоммитить все изменения"""
         self.db.commit()
@@ -1,19 +1,39 @@
+import asyncio
+import base64
+import binascii
+import uuid
+from datetime import date
+
 from fastapi import APIRouter, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, Response, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
 from ..services.news_stub import list_news, get_news_detail
 from ..services.laws_stub import get_law_index, get_article, search_laws
 from ..services.account_stub import (
     get_account, update_account,
-    get_subscription, start_subscription, cancel_subscription,
+    get_subscription, start_subscription, cancel_subscription, get_quota_month,
 )
 from ..services.history_stub import list_history
 from ..services.stats_stub import get_stats
-from ..services.pdf_generator import generate_pdf_report
-from ..workers.queue import queue, process_ad_check_task
+from ..services.admission import estimate_wait
+from ..services.dedup import result_key, get_cached_result, dedup_stats
+from ..services.check_submission import submit_check, wait_for_check
+from ..services.job_status import fetch_job_statuses
+from ..services.quota import refund_quota
+from ..workers.cancellation import cancel_check, abandon_check, keep_check, is_cancelled
+from ..workers.reports import get_pdf, get_pdf_etag, render_pdf_on_demand
+from ..services.batch import parse_corpus, create_batch, batch_progress, stream_batch_results
+from ..services.report_export import batch_report_entries, period_report_entries, stream_reports_zip
+from ..services.report_pages import page_version, get_page, get_page_etag, store_page
+from ..schemas import CheckCreate, CheckStatusBatch
+from ..settings import settings
+from ..workers.queue import queue
 
 router = APIRouter()
+LAST_CHECK_COOKIE = "last_check_job"  # последняя проверка из этого браузера — её заменит следующая
+CLIENT_COOKIE = "check_client"  # ID браузера: отменить проверку может только тот, кто её ждёт
 templates = Jinja2Templates(directory="backend/app/templates")
 
 @router.get("/", response_class=HTMLResponse, name="web_v2_check")
@@ -71,11 +91,151 @@ async def check_submit(
         audio_bytes = await file.read()
         audio_content_type = file.content_type
 
-    # Создаем фоновую задачу для обработки ML модели
-    job = queue.enqueue(process_ad_check_task, text, audio_bytes, audio_content_type)
-    
+    # Дедупликация, контроль допуска, квота и постановка в очередь
+    client_id = request.cookies.get(CLIENT_COOKIE) or str(uuid.uuid4())
+    submission = submit_check(
+        text, audio_bytes, audio_content_type, get_account()["id"], get_quota_month(), client_id=client_id,
+    )
+    if submission["status"] == "rejected":
+        return templates.TemplateResponse(
+            "pages/check_busy_v2.html",
+            {"request": request, **submission},
+            status_code=429,
+            headers={"Retry-After": str(submission["retry_after"])},
+        )
+
+    # Новая проверка из того же браузера заменяет предыдущую, если та ещё идёт
+    job_id = submission["job_id"]
+    previous_job_id = request.cookies.get(LAST_CHECK_COOKIE)
+    if previous_job_id and previous_job_id != job_id:
+        _cancel_and_refund(previous_job_id, client_id, "superseded")
+
     # Перенаправляем на страницу ожидания с ID задачи
-    return RedirectResponse(url=f"/v2/check/status/{job.id}", status_code=303)
+    response = RedirectResponse(url=f"/v2/check/status/{job_id}", status_code=303)
+    response.set_cookie(LAST_CHECK_COOKIE, job_id, httponly=True, samesite="lax")
+    response.set_cookie(CLIENT_COOKIE, client_id, httponly=True, samesite="lax")
+    return response
+
+
+def _cancel_and_refund(job_id: str, client_id: str, reason: str) -> dict:
+    """Отменить проверку для клиента client_id; если она не успела начаться — вернуть квоту"""
+    result = cancel_check(job_id, client_id, reason)
+    if result.get("was") == "queued":
+        refund_quota(get_account()["id"], charged_at=result["enqueued_at"])
+    return result
+
+
+@router.post("/api/v2/check", name="api_v2_check")
+async def check_api(payload: CheckCreate):
+    """
+    JSON API проверки. Результат возвращается сразу, если такая проверка уже
+    есть в кэше или успела завершиться за wait секунд; иначе — 202 и ID задачи.
+    С callback_url итог поставленной проверки придёт вебхуком (для ответа из кэша вебхука нет).
+    """
+    audio_bytes = None
+    if payload.audio_base64:
+        try:
+            audio_bytes = base64.b64decode(payload.audio_base64, validate=True)
+        except binascii.Error:
+            return JSONResponse({"status": "error", "error": "audio_base64: некорректный base64"}, status_code=422)
+    if not payload.text and not audio_bytes:
+        return JSONResponse({"status": "error", "error": "Нужен text или audio_base64"}, status_code=422)
+
+    cached = get_cached_result(result_key(payload.text, audio_bytes, payload.audio_content_type))
+    if cached:
+        return JSONResponse({"status": "completed", "cached": True, "result": cached})
+
+    callback_url = str(payload.callback_url) if payload.callback_url else None
+    try:
+        # В потоке: проверка callback_url разрешает имя хоста (блокирующий getaddrinfo)
+        submission = await asyncio.to_thread(
+            submit_check,
+            payload.text, audio_bytes, payload.audio_content_type, get_account()["id"], get_quota_month(),
+            callback_url=callback_url, client_id=payload.client_id,
+        )
+    except ValueError as e:
+        return JSONResponse({"status": "error", "error": str(e)}, status_code=422)
+    if submission["status"] == "rejected":
+        return JSONResponse(
+            submission, status_code=429, headers={"Retry-After": str(submission["retry_after"])}
+        )
+
+    job_id, client_id = submission["job_id"], submission["client_id"]
+    if payload.supersedes and payload.supersedes != job_id:
+        _cancel_and_refund(payload.supersedes, client_id, "superseded")
+
+    wait = min(max(payload.wait, 0.0), settings.CHECK_MAX_WAIT_SECONDS)
+    outcome = await wait_for_check(job_id, wait) if wait else None
+    if outcome:
+        return JSONResponse(jsonable_encoder({"job_id": job_id, "client_id": client_id, "cached": False, **outcome}))
+
+    return JSONResponse(
+        {
+            "status": "processing", "job_id": job_id, "client_id": client_id,
+            "status_url": f"/api/v2/check/status/{job_id}",
+        },
+        status_code=202,
+    )
+
+
+@router.post("/api/v2/batch", name="api_v2_batch")
+async def batch_create_api(file: UploadFile = File(...)):
+    """Пакет проверок из CSV (колонка text) или JSONL ({"text"} на строку) — в массовую очередь"""
+    try:
+        items = parse_corpus(await file.read(), file.filename)
+    except ValueError as e:
+        return JSONResponse({"status": "error", "error": str(e)}, status_code=422)
+
+    batch = create_batch(items, get_account()["id"], get_quota_month())
+    if batch["status"] == "rejected":
+        return JSONResponse(batch, status_code=429, headers={"Retry-After": str(batch["retry_after"])})
+
+    batch_id = batch["batch_id"]
+    return JSONResponse({
+        **batch,
+        "status_url": f"/api/v2/batch/{batch_id}",
+        "results_url": f"/api/v2/batch/{batch_id}/results",
+    }, status_code=202)
+
+
+@router.get("/api/v2/batch/{batch_id}", name="api_v2_batch_status")
+async def batch_status_api(batch_id: str):
+    """Прогресс пакета"""
+    progress = batch_progress(batch_id)
+    if progress is None:
+        return JSONResponse({"status": "error", "error": "Пакет не найден"}, status_code=404)
+    return JSONResponse(progress)
+
+
+@router.get("/api/v2/batch/{batch_id}/results", name="api_v2_batch_results")
+async def batch_results_api(batch_id: str):
+    """Результаты пакета потоком JSONL — строка на проверку по мере завершения"""
+    if batch_progress(batch_id) is None:
+        return JSONResponse({"status": "error", "error": "Пакет не найден"}, status_code=404)
+    return StreamingResponse(stream_batch_results(batch_id), media_type="application/x-ndjson")
+
+
+@router.get("/api/v2/reports/export", name="api_v2_reports_export")
+async def reports_export_api(batch_id: str | None = None, date_from: date | None = None, date_to: date | None = None):
+    """PDF-отчёты архивом ZIP (потоком): за пакет batch_id или за период date_from..date_to включительно"""
+    if batch_id:
+        if batch_progress(batch_id) is None:
+            return JSONResponse({"status": "error", "error": "Пакет не найден"}, status_code=404)
+        entries = batch_report_entries(batch_id)
+        filename = f"reports_{batch_id}.zip"
+    elif date_from or date_to:
+        if date_from and date_to and date_from > date_to:
+            return JSONResponse({"status": "error", "error": "date_from позже date_to"}, status_code=422)
+        entries = period_report_entries(date_from, date_to)
+        filename = f"reports_{date_from or 'start'}_{date_to or 'now'}.zip"
+    else:
+        return JSONResponse({"status": "error", "error": "Укажите batch_id или date_from / date_to"}, status_code=422)
+
+    return StreamingResponse(
+        stream_reports_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 
 @router.get("/v2/check/status/{job_id}", response_class=HTMLResponse, name="web_v2_check_status")
@@ -87,6 +247,19 @@ async def check_status_page(request: Request, job_id: str):
     })
 
 
+@router.post("/api/v2/check/status:batch", name="api_v2_check_status_batch")
+async def check_status_batch_api(payload: CheckStatusBatch):
+    """Статусы многих задач одним запросом (один pipeline к Redis); отчёты — с include_results"""
+    if len(payload.job_ids) > settings.STATUS_BATCH_MAX_JOBS:
+        return JSONResponse({
+            "status": "error",
+            "error": f"Слишком много задач: {len(payload.job_ids)} (максимум {settings.STATUS_BATCH_MAX_JOBS})",
+        }, status_code=422)
+
+    statuses = await asyncio.to_thread(fetch_job_statuses, payload.job_ids, payload.include_results)
+    return JSONResponse(jsonable_encoder({"jobs": statuses}))
+
+
 @router.get("/api/v2/check/status/{job_id}", name="api_v2_check_status")
 async def check_status_api(job_id: str):
     """API для проверки статуса задачи"""
@@ -98,8 +271,13 @@ async def check_status_api(job_id: str):
         
         job = Job.fetch(job_id, connection=redis)
         print(f"📝 Статус задачи: {job.get_status()}")
+        # Страница ожидания открыта — проверка нужна
+        keep_check(job_id)
         
-        if job.is_finished:
+        if job.is_canceled or job.is_stopped or (job.is_failed and is_cancelled(job_id)):
+            print("🚫 Задача отменена")
+            return JSONResponse({"status": "cancelled"})
+        elif job.is_finished:
             print("✅ Задача завершена успешно")
             
             # Дополнительная защита: преобразуем любые datetime объекты в строки
@@ -129,9 +307,13 @@ async def check_status_api(job_id: str):
             })
         else:
             print("⏳ Задача еще выполняется")
-            return JSONResponse({
-                "status": "processing"
-            })
+            response = {"status": "processing"}
+            # Пока задача в очереди — показываем место и оценку ожидания
+            position = job.get_position()
+            if position is not None:
+                response["position"] = position + 1
+                response["eta_seconds"] = estimate_wait(queue, position)["eta_seconds"]
+            return JSONResponse(response)
             
     except Exception as e:
         print(f"🚨 Ошибка при проверке статуса: {e}")
@@ -141,10 +323,68 @@ async def check_status_api(job_id: str):
         }, status_code=200)  # Изменяем на 200, чтобы JS мог обработать ответ
 
 
+@router.post("/api/v2/check/{job_id}/cancel", name="api_v2_check_cancel")
+async def check_cancel_api(request: Request, job_id: str, client_id: str | None = None):
+    """
+    Отмена проверки клиентом (client_id из ответа API или cookie браузера): из очереди
+    снимается сразу, выполняющаяся прерывается между этапами, если её не ждут другие
+    """
+    client_id = client_id or request.cookies.get(CLIENT_COOKIE)
+    if not client_id:
+        return JSONResponse({"status": "error", "error": "Нужен client_id"}, status_code=422)
+    result = await asyncio.to_thread(_cancel_and_refund, job_id, client_id, "cancelled")
+    status_code = 404 if result["status"] == "not_found" else 200
+    return JSONResponse({"job_id": job_id, **result}, status_code=status_code)
+
+
+@router.post("/api/v2/check/{job_id}/abandon", name="api_v2_check_abandon")
+async def check_abandon_api(request: Request, job_id: str):
+    """Страницу ожидания закрыли (sendBeacon): отмена для этого браузера, если страница не вернётся за пару опросов"""
+    client_id = request.cookies.get(CLIENT_COOKIE)
+    if client_id:
+        await asyncio.to_thread(abandon_check, job_id, client_id)
+    return Response(status_code=204)
+
+
+@router.get("/api/v2/ready", name="api_v2_ready")
+async def ready_api():
+    """Готовность закона: загружен ли он в БД или проверки идут на встроенных сведениях"""
+    from ..services.law_status import get_law_readiness
+    return JSONResponse(get_law_readiness())
+
+
+@router.get("/api/v2/queues", name="api_v2_queues")
+async def queues_api():
+    """Глубина очередей по классам (интерактивные, массовые, обслуживание)"""
+    from ..workers.queue import queue_depths
+    return JSONResponse(queue_depths())
+
+
+@router.get("/api/v2/check/dedup", name="api_v2_check_dedup")
+async def check_dedup_api():
+    """Дедупликация проверок: сколько отправлено и сколько присоединено к уже идущим"""
+    return JSONResponse(dedup_stats())
+
+
 @router.get("/v2/check/result/{job_id}", response_class=HTMLResponse, name="web_v2_check_result")
 async def check_result_page(request: Request, job_id: str):
-    """Страница с результатом проверки"""
+    """
+    Страница с результатом проверки. Отчёт завершённой проверки не меняется —
+    готовый HTML берётся из кэша (report_pages.py), повторный просмотр с If-None-Match — 304
+    """
+    version = page_version(str(request.base_url))
+    headers = {"Cache-Control": "private, no-cache"}
     try:
+        if request.headers.get("if-none-match"):
+            etag = get_page_etag(job_id, version)
+            if etag and _etag_matches(request, etag):
+                return Response(status_code=304, headers={**headers, "ETag": etag})
+
+        cached = get_page(job_id, version)
+        if cached:
+            html, etag = cached
+            return HTMLResponse(html, headers={**headers, "ETag": etag})
+
         from rq.job import Job
         from ..workers.queue import redis
         
@@ -153,7 +393,12 @@ async def check_result_page(request: Request, job_id: str):
         if job.is_finished:
             data = job.result
             data["job_id"] = job_id  # Передаем job_id в шаблон для PDF ссылки
-            return templates.TemplateResponse("pages/check_report_v2.html", {"request": request, **data})
+            # Страница общая для всех, кто откроет ссылку: рендерим без query string,
+            # иначе ?q= первого посетителя попал бы в поиск у всех остальных
+            page_request = Request({**request.scope, "query_string": b""})
+            response = templates.TemplateResponse("pages/check_report_v2.html", {"request": page_request, **data})
+            response.headers.update({**headers, "ETag": store_page(job_id, version, response.body)})
+            return response
         else:
             # Если задача еще не завершена, перенаправляем на страницу ожидания
             return RedirectResponse(url=f"/v2/check/status/{job_id}", status_code=303)
@@ -164,32 +409,46 @@ async def check_result_page(request: Request, job_id: str):
 
 
 @router.get("/v2/check/result/{job_id}/pdf", name="web_v2_check_result_pdf")
-async def check_result_pdf(job_id: str):
-    """Скачивание PDF отчета"""
+async def check_result_pdf(request: Request, job_id: str):
+    """
+    Скачивание PDF отчета: готовый из Redis (его рендерит воркер после проверки),
+    иначе — рендер в пуле процессов. Повторное скачивание с If-None-Match — 304
+    """
+    headers = {
+        "Content-Disposition": f"attachment; filename=report_{job_id[:8]}.pdf",
+        "Cache-Control": "private, no-cache",
+    }
     try:
-        from rq.job import Job
-        from ..workers.queue import redis
-        
-        job = Job.fetch(job_id, connection=redis)
-        
-        if job.is_finished:
-            data = job.result
-            pdf_bytes = generate_pdf_report(data)
-            
-            headers = {
-                "Content-Disposition": f"attachment; filename=report_{job_id[:8]}.pdf",
-                "Content-Type": "application/pdf",
-            }
-            return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
-        else:
-            # Если задача еще не завершена, перенаправляем на страницу ожидания
-            return RedirectResponse(url=f"/v2/check/status/{job_id}", status_code=303)
-            
+        if request.headers.get("if-none-match"):
+            etag = get_pdf_etag(job_id)
+            if etag and _etag_matches(request, etag):
+                return Response(status_code=304, headers={**headers, "ETag": etag})
+
+        stored = get_pdf(job_id)
+        if stored is None:
+            from rq.job import Job
+            from ..workers.queue import redis
+
+            job = Job.fetch(job_id, connection=redis)
+            if not job.is_finished:
+                # Если задача еще не завершена, перенаправляем на страницу ожидания
+                return RedirectResponse(url=f"/v2/check/status/{job_id}", status_code=303)
+            stored = await render_pdf_on_demand(job_id, job.result)
+
+        pdf_bytes, etag = stored
+        return Response(content=pdf_bytes, media_type="application/pdf", headers={**headers, "ETag": etag})
+
     except Exception:
         # Если задача не найдена, перенаправляем на главную
         return RedirectResponse(url="/v2/check", status_code=303)
 
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match запроса совпадает с ETag (или "*") — клиенту хватит 304"""
+    candidates = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    return "*" in candidates or etag in candidates
+
+
 @router.get("/v2/account", response_class=HTMLResponse, name="web_v2_account")
 async def account_page(request: Request):
     data = get_account()
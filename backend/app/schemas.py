@@ -1,9 +1,20 @@
-from pydantic import BaseModel
+from pydantic import AnyHttpUrl, BaseModel
 from typing import Any
 
 
 class CheckCreate(BaseModel):
     text: str | None = None
+    audio_base64: str | None = None
+    audio_content_type: str | None = None
+    wait: float = 0  # сколько секунд ждать результат в ответе (до CHECK_MAX_WAIT_SECONDS)
+    callback_url: AnyHttpUrl | None = None  # вебхук с итогом проверки вместо опроса статуса
+    supersedes: str | None = None  # ID прежней проверки, которую эта заменяет (её отменим)
+    client_id: str | None = None  # ID клиента: отменить проверку (cancel, supersedes) может только тот, кто её ждёт
+
+
+class CheckStatusBatch(BaseModel):
+    job_ids: list[str]
+    include_results: bool = False  # по умолчанию — только статусы, без отчётов
 
 
 class CheckOut(BaseModel):
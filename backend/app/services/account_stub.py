@@ -2,6 +2,10 @@ from __future__ import annotations
 from datetime import date, timedelta
 from typing import Literal
 from pydantic import BaseModel
+from ..settings import settings
+from .quota import (
+    consume_quota, get_used_this_month, reset_month, save_subscription, load_subscription, delete_subscription,
+)
 
 class Account(BaseModel):
     id: int = 1
@@ -28,10 +32,10 @@ class Subscription(BaseModel):
     price: str | None = None          # напр. "990 ₽/мес"
     renews_at: str | None = None      # ISO-строка даты, напр. "2025-12-01"
     quota_month: int | None = None    # месячный лимит проверок
-    used: int | None = None           # сколько уже использовано в текущем месяце
+    used: int | None = None           # сколько уже использовано в текущем месяце (счётчик в Redis)
 
-# Память процесса для подписки
-_sub_state: dict = Subscription().model_dump()
+# Подписка — в Redis рядом со счётчиком использованных проверок (quota.py):
+# тариф и лимит одинаковы во всех процессах uvicorn
 
 def _next_renewal_iso(days: int = 30) -> str:
     return (date.today() + timedelta(days=days)).isoformat()
@@ -40,9 +44,20 @@ def get_subscription() -> dict | None:
     """
     Вернёт dict с данными подписки, если она активна; иначе None.
     """
-    if _sub_state.get("status") != "active":
+    subscription = load_subscription(_state["id"])
+    if not subscription or subscription.get("status") != "active":
         return None
-    return _sub_state.copy()
+    return {**subscription, "used": get_used_this_month(_state["id"])}
+
+def get_quota_month() -> int | None:
+    """
+    Месячный лимит проверок текущего аккаунта: квота подписки
+    или бесплатный лимит (None — без лимита).
+    """
+    subscription = load_subscription(_state["id"])
+    if subscription and subscription.get("status") == "active":
+        return subscription.get("quota_month")
+    return settings.CHECKS_FREE_MONTH or None
 
 def start_subscription(
     plan: str = "Pro",
@@ -53,8 +68,7 @@ def start_subscription(
     """
     Включает подписку с дефолтными (или переданными) параметрами.
     """
-    global _sub_state
-    _sub_state = Subscription(
+    subscription = Subscription(
         status="active",
         plan=plan,
         price=price,
@@ -62,23 +76,24 @@ def start_subscription(
         quota_month=quota_month,
         used=0,
     ).model_dump()
-    return _sub_state.copy()
+    save_subscription(_state["id"], subscription)
+    reset_month(_state["id"])
+    return subscription
 
 def cancel_subscription() -> dict:
     """
     Полностью отключает подписку (возврат к состоянию 'none').
     """
-    global _sub_state
-    _sub_state = Subscription().model_dump()
-    return _sub_state.copy()
+    delete_subscription(_state["id"])
+    return Subscription().model_dump()
 
 def consume_checks(n: int = 1) -> dict | None:
     """
     Сервисная утилита: отметить использование n проверок из месячного лимита.
     Возвращает текущее состояние подписки (или None, если подписки нет).
     """
-    if _sub_state.get("status") != "active":
+    subscription = load_subscription(_state["id"])
+    if not subscription or subscription.get("status") != "active":
         return None
-    if isinstance(_sub_state.get("used"), int):
-        _sub_state["used"] = max(0, int(_sub_state["used"])) + max(0, n)
-    return _sub_state.copy()
+    consume_quota(_state["id"], subscription.get("quota_month"), max(0, n))
+    return get_subscription()
@@ -0,0 +1,92 @@
+"""
+Контроль допуска проверок в очередь.
+По глубине интерактивной очереди и наблюдаемой пропускной способности
+воркеров оценивается, сколько новая проверка простоит в очереди. Если
+дольше бюджета CHECK_WAIT_BUDGET_SECONDS — проверка не ставится
+(429 + Retry-After), вместо того чтобы копиться до таймаута.
+"""
+import math
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from redis.exceptions import RedisError
+from rq import Queue, Worker
+
+from ..settings import settings
+from ..workers.queue import redis, queue
+
+
+COMPLETIONS_KEY = "checks:completions"  # sorted set: момент завершения проверки
+DURATIONS_KEY = "checks:durations"  # последние длительности проверок, с
+THROUGHPUT_WINDOW = 300  # окно наблюдения пропускной способности, с
+DURATION_SAMPLES = 100
+DEFAULT_CHECK_SECONDS = 30.0  # длительность проверки, пока нет замеров
+MAX_RETRY_AFTER = 600
+
+
+def record_check_completion(duration: float) -> None:
+    """Учесть завершённую проверку (вызывается из задачи проверки)"""
+    now = time.time()
+    try:
+        pipe = redis.pipeline()
+        pipe.zadd(COMPLETIONS_KEY, {uuid.uuid4().hex: now})
+        pipe.zremrangebyscore(COMPLETIONS_KEY, 0, now - THROUGHPUT_WINDOW)
+        pipe.lpush(DURATIONS_KEY, duration)
+        pipe.ltrim(DURATIONS_KEY, 0, DURATION_SAMPLES - 1)
+        pipe.execute()
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось учесть завершение проверки: {e}")
+
+
+def estimate_wait(q: Queue = queue, position: Optional[int] = None) -> Dict:
+    """
+    Оценка ожидания в очереди: глубина, пропускная способность (проверок/с),
+    средняя длительность, ожидание до начала и до результата (с).
+    position — место задачи в очереди; по умолчанию — в конце очереди.
+    """
+    now = time.time()
+    pipe = redis.pipeline()
+    pipe.llen(q.key)
+    pipe.zcount(COMPLETIONS_KEY, now - THROUGHPUT_WINDOW, now)
+    pipe.lrange(DURATIONS_KEY, 0, -1)
+    queued, completed, durations = pipe.execute()
+
+    avg_duration = (
+        sum(float(d) for d in durations) / len(durations) if durations else DEFAULT_CHECK_SECONDS
+    )
+    # Наблюдаемая скорость — под нагрузкой; оценка по числу воркеров — когда проверок мало
+    observed = completed / THROUGHPUT_WINDOW
+    capacity = Worker.count(queue=q) / avg_duration
+    throughput = max(observed, capacity)
+
+    ahead = queued if position is None else position
+    # Нет ни воркеров, ни завершений — считаем, что скоро поднимется один воркер
+    wait = ahead / throughput if throughput else ahead * avg_duration
+    return {
+        "queued": queued,
+        "throughput": round(throughput, 3),
+        "avg_duration": round(avg_duration, 1),
+        "wait_seconds": math.ceil(wait),
+        "eta_seconds": math.ceil(wait + avg_duration),
+    }
+
+
+def check_admission(q: Queue = queue) -> Tuple[bool, Dict]:
+    """
+    Можно ли ставить новую проверку в очередь.
+    Возвращает (допущена, оценка); у отклонённой в оценке есть retry_after (с).
+    Без Redis оценить нагрузку нельзя — проверка допускается.
+    """
+    try:
+        estimate = estimate_wait(q)
+    except RedisError as e:
+        print(f"  ⚠️ Контроль допуска отключён, Redis недоступен: {e}")
+        return True, {}
+
+    budget = settings.CHECK_WAIT_BUDGET_SECONDS
+    if estimate["wait_seconds"] <= budget:
+        return True, estimate
+
+    estimate["retry_after"] = min(MAX_RETRY_AFTER, max(1, estimate["wait_seconds"] - budget))
+    return False, estimate
@@ -0,0 +1,144 @@
+"""
+Приём пакетов проверок (CSV / JSONL) и выдача их результатов.
+Раздача проверок по очереди — в родительской задаче (workers/batch.py).
+"""
+import asyncio
+import csv
+import io
+import json
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+from ..settings import settings
+from ..workers.queue import redis
+from ..workers.batch import (
+    BATCH_TTL, batch_key, items_key, results_key, progress_channel, enqueue_batch, get_batch, sweep_batch,
+)
+from .check_submission import async_redis
+from .quota import consume_quota, refund_quota
+
+
+STREAM_IDLE_TIMEOUT = 15  # как часто поток перепроверяет пакет, если событий нет, с
+STREAM_SWEEP_SECONDS = 60  # без новых строк столько — ищем задачи, завершившиеся без callback (sweep_batch)
+STREAM_MAX_IDLE_SECONDS = 30 * 60  # без новых строк столько — поток закрывается, клиент может переподключиться
+
+
+def parse_corpus(data: bytes, filename: str | None = None) -> List[Dict]:
+    """
+    Разобрать корпус объявлений: JSONL (по объекту {"text", "id"?} на строку)
+    или CSV с колонкой text (и необязательной id).
+    Возвращает [{"id", "text"}]; при ошибке формата — ValueError с описанием.
+    """
+    try:
+        content = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Файл должен быть в кодировке UTF-8")
+
+    name = (filename or "").lower()
+    is_jsonl = name.endswith((".jsonl", ".ndjson")) or content.lstrip().startswith("{")
+    items = []
+    if is_jsonl:
+        for line_no, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Строка {line_no}: некорректный JSON ({e.msg})")
+            if not isinstance(row, dict):
+                raise ValueError(f"Строка {line_no}: ожидается объект с полем text")
+            items.append({"id": row.get("id", line_no), "text": row.get("text"), "line": line_no})
+    else:
+        reader = csv.DictReader(io.StringIO(content))
+        if not reader.fieldnames or "text" not in reader.fieldnames:
+            raise ValueError("В CSV нужна колонка text")
+        for row in reader:
+            items.append({"id": row.get("id") or reader.line_num, "text": row["text"], "line": reader.line_num})
+
+    for item in items:
+        if not isinstance(item["text"], str) or not item["text"].strip():
+            raise ValueError(f"Строка {item['line']}: пустой text")
+    if not items:
+        raise ValueError("В файле нет проверок")
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise ValueError(f"Слишком много проверок в пакете: {len(items)} (максимум {settings.BATCH_MAX_ITEMS})")
+    return [{"id": item["id"], "text": item["text"]} for item in items]
+
+
+def create_batch(items: List[Dict], account_id: int, month_limit: Optional[int]) -> Dict:
+    """
+    Принять пакет: списать квоту за все проверки, сохранить их и поставить
+    родительскую задачу. Возвращает {"status": "queued", "batch_id", "total"}
+    или {"status": "rejected", "reason", "retry_after", ...}, если не хватает квоты.
+    Лимит в минуту к пакетам не применяется — они идут в массовую очередь.
+    """
+    quota = consume_quota(account_id, month_limit, n=len(items), per_minute=0)
+    if not quota["allowed"]:
+        return {"status": "rejected", **quota}
+
+    batch_id = uuid.uuid4().hex
+    try:
+        pipe = redis.pipeline()
+        pipe.hset(batch_key(batch_id), mapping={
+            "status": "queued", "total": len(items), "done": 0, "failed": 0,
+            "account_id": account_id, "created_at": time.time(),
+        })
+        pipe.rpush(items_key(batch_id), *[json.dumps(item, ensure_ascii=False) for item in items])
+        pipe.expire(batch_key(batch_id), BATCH_TTL)
+        pipe.expire(items_key(batch_id), BATCH_TTL)
+        pipe.execute()
+        enqueue_batch(batch_id, account_id)
+    except Exception:
+        refund_quota(account_id, len(items), minute=False)
+        raise
+    return {"status": "queued", "batch_id": batch_id, "total": len(items)}
+
+
+def batch_progress(batch_id: str) -> Optional[Dict]:
+    """Прогресс пакета: статус, сколько готово из скольких, доля"""
+    batch = get_batch(batch_id)
+    if batch is None:
+        return None
+    batch.pop("account_id", None)
+    batch["progress"] = round(batch["done"] / batch["total"], 4) if batch["total"] else 1.0
+    return batch
+
+
+async def stream_batch_results(batch_id: str) -> AsyncIterator[str]:
+    """
+    Строки результатов пакета (JSONL) по мере завершения проверок.
+    Новые строки будит событие пакета (pub/sub); поток заканчивается,
+    когда пакет завершён или упал. Если строк долго нет, проверки, чьи задачи
+    завершились без callback, дописываются с ошибкой (sweep_batch), а после
+    STREAM_MAX_IDLE_SECONDS без строк поток закрывается — соединение не висит до TTL пакета.
+    """
+    pubsub = async_redis.pubsub()
+    await pubsub.subscribe(progress_channel(batch_id))
+    loop = asyncio.get_running_loop()
+    cursor = 0
+    last_line = last_sweep = loop.time()
+    try:
+        while True:
+            # Статус читаем до строк: после "finished" новых строк уже не будет
+            status = await async_redis.hget(batch_key(batch_id), "status")
+            lines = await async_redis.lrange(results_key(batch_id), cursor, -1)
+            cursor += len(lines)
+            for line in lines:
+                yield line.decode() + "\n"
+            if status is None or status.decode() in ("finished", "failed"):
+                return
+
+            now = loop.time()
+            if lines:
+                last_line = now
+            elif now - last_line >= STREAM_MAX_IDLE_SECONDS:
+                print(f"⏹️ Пакет {batch_id}: нет результатов {STREAM_MAX_IDLE_SECONDS} с, поток закрыт")
+                return
+            if now - max(last_line, last_sweep) >= STREAM_SWEEP_SECONDS:
+                last_sweep = now
+                if await asyncio.to_thread(sweep_batch, batch_id):
+                    continue
+            await pubsub.get_message(ignore_subscribe_messages=True, timeout=STREAM_IDLE_TIMEOUT)
+    finally:
+        await pubsub.aclose()
@@ -0,0 +1,259 @@
+"""
+Бенчмарки производительности (запускаются через manage.py).
+Бенчмарки с записью в БД работают с реальной БД из настроек и за собой всё удаляют.
+"""
+import time
+from datetime import date
+from typing import Dict, List
+
+from ..db import SessionLocal
+from ..repositories.law_repository import LawRepository
+
+
+BENCH_LAW_CODE = "BENCH"
+
+
+def _fake_parsed_chapters(chapters: int, articles_per_chapter: int) -> List[Dict]:
+    """Синтетические главы/статьи размером с реальные страницы закона"""
+    content = "Текст статьи закона о рекламе. " * 150
+    content_html = "<p>" + content + "</p>"
+    return [
+        {
+            "chapter": {
+                "chapter_number": ch,
+                "title": f"Глава {ch}. Бенчмарк",
+                "content": content,
+                "source_url": f"https://bench.invalid/ch{ch}/",
+            },
+            "articles": [
+                {
+                    "article_number": f"{ch}.{a}",
+                    "title": f"Статья {ch}.{a}. Бенчмарк",
+                    "content": content,
+                    "content_html": content_html,
+                    "source_url": f"https://bench.invalid/ch{ch}/art{a}/",
+                }
+                for a in range(1, articles_per_chapter + 1)
+            ],
+        }
+        for ch in range(1, chapters + 1)
+    ]
+
+
+def _per_row_ingest(repo: LawRepository, version_id: int, parsed_chapters: List[Dict]) -> None:
+    """Старый путь: commit+refresh на каждую главу, коммит каждые 5 записей"""
+    total_count = 0
+    for item in parsed_chapters:
+        chapter = repo.create_chapter(version_id=version_id, **item["chapter"])
+        total_count += 1
+        for article in item["articles"]:
+            repo.create_article(version_id=version_id, chapter_id=chapter.id, **article)
+            total_count += 1
+            if total_count % 5 == 0:
+                repo.bulk_commit()
+    repo.bulk_commit()
+
+
+def _bulk_ingest(repo: LawRepository, version_id: int, parsed_chapters: List[Dict]) -> None:
+    """Новый путь: массовая вставка через bulk_save_chapters"""
+    from .law_parser import bulk_save_chapters
+
+    bulk_save_chapters(repo, version_id, parsed_chapters)
+    repo.bulk_commit()
+
+
+def bench_law_ingestion(chapters: int = 10, articles_per_chapter: int = 10, rounds: int = 3) -> Dict[str, float]:
+    """
+    Сравнение времени записи закона в БД: построчный путь против массового.
+    Возвращает лучшее время каждого пути в секундах.
+    """
+    parsed_chapters = _fake_parsed_chapters(chapters, articles_per_chapter)
+    paths = {"per_row": _per_row_ingest, "bulk": _bulk_ingest}
+    best = {name: float("inf") for name in paths}
+
+    db = SessionLocal()
+    repo = LawRepository(db)
+    try:
+        for _ in range(rounds):
+            for name, ingest in paths.items():
+                version = repo.create_version(
+                    law_name="Бенчмарк",
+                    law_code=BENCH_LAW_CODE,
+                    source_url="https://bench.invalid/",
+                    version_date=date.today(),
+                    is_active=False,
+                )
+                started = time.perf_counter()
+                ingest(repo, version.id, parsed_chapters)
+                best[name] = min(best[name], time.perf_counter() - started)
+                repo.delete_version(version.id)
+    finally:
+        db.close()
+
+    docs = chapters * (articles_per_chapter + 1)
+    print(f"📊 Запись {docs} документов (лучшее из {rounds}):")
+    for name, seconds in best.items():
+        print(f"  - {name}: {seconds * 1000:.1f} мс ({docs / seconds:.0f} док/с)")
+    print(f"  - ускорение: x{best['per_row'] / best['bulk']:.1f}")
+    return best
+
+
+def bench_article_parser(pages: Dict[str, str], rounds: int = 5) -> Dict[str, float]:
+    """
+    Сравнение парсеров страниц статей: BeautifulSoup (эталон) и lxml.
+    pages — {url: html}. Сначала проверяет, что результаты совпадают,
+    затем возвращает лучшее время разбора всех страниц в секундах.
+    """
+    from .law_parser import parse_article_page, parse_article_page_bs4
+
+    mismatches = [
+        url for url, html in pages.items()
+        if parse_article_page(html, url) != parse_article_page_bs4(html, url)
+    ]
+    if mismatches:
+        print(f"❌ Результаты отличаются на {len(mismatches)} страницах:")
+        for url in mismatches[:10]:
+            print(f"  - {url}")
+    else:
+        print(f"✅ Результаты совпадают на всех {len(pages)} страницах")
+
+    paths = {"bs4": parse_article_page_bs4, "lxml": parse_article_page}
+    best = {name: float("inf") for name in paths}
+    for _ in range(rounds):
+        for name, parse in paths.items():
+            started = time.perf_counter()
+            for url, html in pages.items():
+                parse(html, url)
+            best[name] = min(best[name], time.perf_counter() - started)
+
+    print(f"📊 Разбор {len(pages)} страниц (лучшее из {rounds}):")
+    for name, seconds in best.items():
+        print(f"  - {name}: {seconds * 1000:.1f} мс ({len(pages) / seconds:.0f} стр/с)")
+    print(f"  - ускорение: x{best['bs4'] / best['lxml']:.1f}")
+    return best
+
+
+# Короткие объявления для бенчмарка пакетной классификации (если корпус не передан)
+BENCH_ADS = [
+    "Лучший кредит в городе! Одобрение за 5 минут, без справок и поручителей.",
+    "Самые низкие цены на окна — дешевле, чем у всех конкурентов!",
+    "Гарантированно вылечим простуду за один день. Без побочных эффектов.",
+    "Пиво «Северное» — вкус, который объединяет. Скидка 20% в выходные.",
+    "Курсы английского: 100% результат или вернём деньги.",
+    "Новая коллекция обуви уже в магазинах. Подробности на сайте.",
+    "Инвестируйте в наш фонд — доходность 40% годовых гарантирована!",
+    "Стоматология «Улыбка»: имплантация со скидкой до конца месяца.",
+    "Доставка пиццы за 30 минут или бесплатно.",
+    "Похудей на 10 кг за неделю с нашим чаем — одобрено врачами.",
+    "Ремонт квартир под ключ. Работаем без выходных.",
+    "Единственный в России смартфон с такой камерой!",
+]
+
+
+def bench_llm_batching(ad_texts: List[str] | None = None, live: bool = False) -> Dict[str, Dict[str, float]]:
+    """
+    Запросы и токены промпта на объявление: по запросу на объявление и пакетами
+    (ml.classifiers.get_questions_answers_batch). Без live — по оценке токенов
+    промптов (сеть не нужна); с live — реальные запросы к LLM и usage из ответов.
+    """
+    from ml import classifiers
+
+    ad_texts = ad_texts or BENCH_ADS
+    plans = classifiers.plan_batches(ad_texts)
+    ads = len(ad_texts)
+
+    if not live:
+        stats = {
+            "single": {
+                "requests": ads,
+                "prompt_tokens": sum(classifiers.estimate_tokens(classifiers.form_prompt(t)) for t in ad_texts),
+            },
+            "batched": {
+                "requests": len(plans),
+                "prompt_tokens": sum(
+                    classifiers.estimate_tokens(classifiers.form_batch_prompt([ad_texts[i] for i in plan]))
+                    for plan in plans
+                ),
+            },
+        }
+    else:
+        paths = {
+            "single": lambda: [classifiers.get_questions_answers(t) for t in ad_texts],
+            "batched": lambda: classifiers.get_questions_answers_batch(ad_texts),
+        }
+        stats = {}
+        for name, run in paths.items():
+            before = dict(classifiers.LLM_USAGE)
+            started = time.perf_counter()
+            answers = run()
+            stats[name] = {key: classifiers.LLM_USAGE[key] - before[key] for key in before}
+            stats[name]["seconds"] = time.perf_counter() - started
+            stats[name]["parsed"] = sum(1 for a in answers if a)
+
+    source = "usage из ответов LLM" if live else "оценка по длине промптов"
+    print(f"📊 Классификация {ads} объявлений, пакетов {len(plans)} "
+          f"(бюджет {classifiers.LLM_BATCH_TOKEN_BUDGET} токенов, {source}):")
+    for name, s in stats.items():
+        line = f"  - {name}: {s['requests'] / ads:.2f} запросов и {s['prompt_tokens'] / ads:.0f} токенов промпта на объявление"
+        if live:
+            line += (f", {s['completion_tokens'] / ads:.0f} токенов ответа, {s['seconds']:.1f} с, "
+                     f"разобрано {s['parsed']}/{ads}, откатов на одиночные запросы {s['batch_fallbacks']}")
+        print(line)
+    print(f"  - токенов промпта меньше в x{stats['single']['prompt_tokens'] / max(1, stats['batched']['prompt_tokens']):.1f}")
+    return stats
+
+
+def _bench_report(violations: int) -> Dict:
+    """Синтетический результат проверки с violations нарушениями и столькими же делами"""
+    return {
+        "check_date_formatted": "01.01.2025 в 12:00",
+        "law_name": "Федеральный закон \"О рекламе\" от 13.03.2006 N 38-ФЗ",
+        "is_ok": not violations,
+        "flags": [{"type": "warn" if violations else "ok", "text": "Бенчмарк", "strong": True}],
+        "violations": [
+            {
+                "title": f"п.{i} ч.3 ст.5 ФЗ о рекламе",
+                "text": "Недостоверной признаётся реклама, которая содержит не соответствующие "
+                        "действительности сведения. " * 4,
+                "fix": "Уберите из текста сравнение с конкурентами без подтверждения. " * 3,
+            }
+            for i in range(1, violations + 1)
+        ],
+        "cases": [
+            {"title": f"Дело № А40-{i}/2024", "text": "Суд признал рекламу ненадлежащей. " * 6}
+            for i in range(1, violations + 1)
+        ],
+    }
+
+
+def bench_pdf_rendering(sizes: tuple = (0, 3, 10), reports: int = 20) -> Dict[str, Dict[int, float]]:
+    """
+    Отчётов в секунду по размерам отчёта (число нарушений): рендер с созданием
+    PdfReportRenderer на каждый отчёт (шрифты и стили заново) и общий прогретый
+    рендер процесса (pdf_generator.get_renderer).
+    """
+    import contextlib
+    import io
+    from .pdf_generator import PdfReportRenderer, get_renderer
+
+    paths = {
+        "cold": lambda report: PdfReportRenderer().render(report),
+        "warm": lambda report: get_renderer().render(report),
+    }
+    get_renderer()  # прогрев не входит в замер
+    stats = {name: {} for name in paths}
+    for size in sizes:
+        report = _bench_report(size)
+        for name, render in paths.items():
+            # Регистрация шрифтов печатает по строке на отчёт — не засоряем вывод
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                for _ in range(reports):
+                    render(report)
+                stats[name][size] = reports / (time.perf_counter() - started)
+
+    print(f"📊 Рендер PDF-отчётов ({reports} на размер), отчётов в секунду:")
+    for size in sizes:
+        cold, warm = stats["cold"][size], stats["warm"][size]
+        print(f"  - нарушений {size}: cold {cold:.1f}, warm {warm:.1f} (x{warm / cold:.1f})")
+    return stats
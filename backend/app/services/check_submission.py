@@ -0,0 +1,133 @@
+"""
+Постановка проверки в очередь — общий путь для формы /v2/check и JSON API:
+дедупликация → контроль допуска → квота → очередь.
+Здесь же ожидание результата для API: подписка на событие завершения
+задачи (pub/sub), без опроса статуса.
+"""
+import asyncio
+import json
+import uuid
+from typing import Dict, Optional
+
+from redis.asyncio import Redis as AsyncRedis
+from rq import Callback, Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+
+from ..settings import settings
+from ..workers.queue import redis, queue, process_ad_check_task
+from ..workers.cancellation import add_watcher, is_cancelled
+from ..workers.check_events import CHANNEL, on_check_success, on_check_failure, on_check_stopped
+from ..workers.webhooks import register_webhook, attach_webhook, validate_callback_url
+from .admission import check_admission
+from .deadline import new_deadline
+from .dedup import content_key, claim_check, claim_pending, release_check
+from .quota import consume_quota, refund_quota
+
+
+async_redis = AsyncRedis.from_url(settings.REDIS_URL)
+
+
+def submit_check(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None,
+                 account_id: int, month_limit: Optional[int], q: Queue = queue,
+                 callback_url: Optional[str] = None, client_id: Optional[str] = None) -> Dict:
+    """
+    Поставить проверку в очередь q.
+    Возвращает {"status": "queued" | "attached", "job_id", "client_id"} — attached, если такая же
+    проверка уже идёт, — или {"status": "rejected", "reason": "queue" | "month" | "minute",
+    "retry_after", ...}, если очередь перегружена или исчерпана квота.
+    callback_url — куда отправить вебхук с итогом проверки (webhooks.py).
+    client_id — кто ждёт проверку (отменить её может только он, cancellation.py);
+    без него — новый ID на эту постановку.
+    Срок проверки (deadline.py) отсчитывается отсюда — ожидание в очереди входит в него.
+    callback_url во внутренней сети или с неразрешимым хостом — ValueError.
+    """
+    if callback_url:
+        try:
+            validate_callback_url(callback_url)
+        except OSError as e:
+            raise ValueError(f"callback_url: хост не найден ({e})") from e
+    job_id = str(uuid.uuid4())
+    client_id = client_id or str(uuid.uuid4())
+    dedup_key = content_key(text, audio_bytes, audio_content_type)
+    existing_job_id = claim_check(dedup_key, job_id)
+    if existing_job_id:
+        add_watcher(existing_job_id, client_id)
+        if callback_url:
+            attach_webhook(existing_job_id, callback_url)
+        return {"status": "attached", "job_id": existing_job_id, "client_id": client_id}
+
+    admitted, estimate = check_admission(q)
+    if not admitted:
+        release_check(dedup_key, job_id)
+        return {"status": "rejected", "reason": "queue", **estimate}
+
+    quota = consume_quota(account_id, month_limit)
+    if not quota["allowed"]:
+        release_check(dedup_key, job_id)
+        return {"status": "rejected", **quota}
+
+    try:
+        # Подписка до постановки в очередь — быстрая проверка не обгонит её
+        if callback_url:
+            register_webhook(job_id, callback_url)
+        add_watcher(job_id, client_id)
+        q.enqueue(
+            process_ad_check_task, text, audio_bytes, audio_content_type,
+            deadline_at=new_deadline(),
+            job_id=job_id,
+            # Запасной предел RQ: все внешние запросы ограничены сроком проверки
+            job_timeout=settings.CHECK_DEADLINE_SECONDS + 60,
+            on_success=Callback(on_check_success),
+            on_failure=Callback(on_check_failure),
+            on_stopped=Callback(on_check_stopped),
+        )
+    except Exception:
+        refund_quota(account_id)
+        release_check(dedup_key, job_id)
+        raise
+    return {"status": "queued", "job_id": job_id, "client_id": client_id}
+
+
+def job_outcome(job_id: str) -> Optional[Dict]:
+    """
+    Итог задачи, если она уже завершилась: {"status": "completed", "result"},
+    {"status": "failed", "error"} или {"status": "cancelled"}
+    """
+    try:
+        job = Job.fetch(job_id, connection=redis)
+    except NoSuchJobError:
+        if claim_pending(job_id):
+            return None  # к задаче присоединились до того, как её поставили в очередь
+        return {"status": "failed", "error": "Задача не найдена"}
+    if job.is_canceled or job.is_stopped or (job.is_failed and is_cancelled(job_id)):
+        return {"status": "cancelled"}
+    if job.is_finished:
+        return {"status": "completed", "result": job.result}
+    if job.is_failed:
+        return {"status": "failed", "error": str(job.exc_info)}
+    return None
+
+
+async def wait_for_check(job_id: str, timeout: float) -> Optional[Dict]:
+    """
+    Дождаться завершения задачи не дольше timeout секунд.
+    Возвращает итог (см. job_outcome) или None, если задача не успела.
+    """
+    pubsub = async_redis.pubsub()
+    await pubsub.subscribe(CHANNEL.format(job_id=job_id))
+    try:
+        # Подписались — теперь проверяем, не завершилась ли задача раньше
+        outcome = await asyncio.to_thread(job_outcome, job_id)
+        if outcome:
+            return outcome
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message:
+                return json.loads(message["data"])
+        return None
+    finally:
+        await pubsub.aclose()
@@ -0,0 +1,42 @@
+"""
+Срок проверки (deadline): один на всю проверку, назначается при постановке
+в очередь (CHECK_DEADLINE_SECONDS) и передаётся задаче как deadline_at.
+Этапы — распознавание речи, классификация, отчёт — получают долю
+оставшегося времени сроком своих внешних запросов — по часам, а не на
+каждое чтение сокета (ml.classifiers.call_with_deadline). Этап, которому
+времени не досталось или который не уложился, не ломает проверку:
+она завершается частичным результатом с пометкой (см. ml_core.run_ml).
+"""
+import time
+from typing import Dict, Optional
+
+from ..settings import settings
+
+
+REPORT_RESERVE_SECONDS = 5  # в конце срока — на отчёт (версия закона из БД)
+MIN_STAGE_SECONDS = 1  # меньше — этап не начинаем, запрос всё равно не успеет
+ASR_SHARE = 0.4  # доля оставшегося времени на распознавание речи, остальное — LLM
+
+PARTIAL_NOTES = {
+    "asr": "Распознавание речи не уложилось в срок проверки",
+    "llm": "Классификация нарушений не уложилась в срок проверки",
+}
+
+
+def new_deadline(seconds: Optional[float] = None) -> float:
+    """Срок проверки, отсчитанный от текущего момента (unix time)"""
+    return time.time() + (settings.CHECK_DEADLINE_SECONDS if seconds is None else seconds)
+
+
+def stage_budget(deadline_at: float, share: float = 1.0) -> float:
+    """
+    Таймаут этапа: доля share времени до срока за вычетом резерва на отчёт.
+    0 — времени на этап не осталось.
+    """
+    budget = (deadline_at - time.time() - REPORT_RESERVE_SECONDS) * share
+    return budget if budget >= MIN_STAGE_SECONDS else 0.0
+
+
+def partial_marker(stage: str) -> Dict:
+    """Пометка частичного результата: какой этап не уложился в срок"""
+    return {"stage": stage, "note": PARTIAL_NOTES[stage]}
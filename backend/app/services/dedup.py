@@ -0,0 +1,166 @@
+"""
+Single-flight для проверок: пока проверка с тем же содержимым (текст или
+хэш аудио) ещё в работе, повторная отправка (двойной клик, общий креатив
+у команды) не ставит вторую задачу, а присоединяется к уже идущей.
+Ключ содержимого → ID задачи хранится в Redis; доля присоединений — dedup_stats().
+Здесь же кэш готовых результатов по тому же ключу содержимого.
+"""
+import hashlib
+import json
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+
+from ..settings import settings
+from ..workers.queue import redis
+
+
+INFLIGHT_TTL = 15 * 60  # дольше проверка не живёт (ожидание + выполнение)
+CLAIM_GRACE_SECONDS = 60  # сколько закреплённая задача может ещё не быть в очереди
+IN_FLIGHT_STATUSES = {"queued", "started", "deferred", "scheduled"}
+SUBMITTED_KEY = "checks:dedup:submitted"
+ATTACHED_KEY = "checks:dedup:attached"
+
+# Закрепить ключ за задачей, если он пуст (ARGV[2] == '') или всё ещё указывает
+# на прежнюю завершившуюся задачу ARGV[2]; иначе вернуть ID задачи в ключе.
+# Заодно — отметка "закреплена, в очередь ещё не поставлена" (см. claim_pending)
+_CLAIM_LUA = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[2] then
+    return current
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+redis.call('SET', KEYS[2], 1, 'EX', ARGV[4])
+return false
+"""
+_claim_script = redis.register_script(_CLAIM_LUA)
+
+# Удалить ключ, только если он всё ещё указывает на нашу задачу
+_RELEASE_LUA = """
+redis.call('DEL', KEYS[2])
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_release_script = redis.register_script(_RELEASE_LUA)
+
+
+def content_digest(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None) -> str:
+    """sha256 содержимого проверки: текст (без крайних пробелов) и аудио"""
+    digest = hashlib.sha256()
+    digest.update((text or "").strip().encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((audio_content_type or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(audio_bytes or b"")
+    return digest.hexdigest()
+
+
+def content_key(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None) -> str:
+    """Ключ выполняющейся проверки с таким содержимым"""
+    return f"checks:inflight:{content_digest(text, audio_bytes, audio_content_type)}"
+
+
+def result_key(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None) -> str:
+    """Ключ готового результата проверки с таким содержимым"""
+    return f"checks:result:{content_digest(text, audio_bytes, audio_content_type)}"
+
+
+def claimed_key(job_id: str) -> str:
+    """Отметка: задача закреплена за содержимым, но ещё не поставлена в очередь"""
+    return f"checks:claimed:{job_id}"
+
+
+def claim_pending(job_id: str) -> bool:
+    """Задачу закрепили только что и вот-вот поставят в очередь (её ещё нет в RQ)"""
+    try:
+        return bool(redis.exists(claimed_key(job_id)))
+    except RedisError:
+        return False
+
+
+def _in_flight(job_id: str) -> bool:
+    try:
+        return Job.fetch(job_id, connection=redis).get_status() in IN_FLIGHT_STATUSES
+    except NoSuchJobError:
+        # Закреплена, но ещё не в очереди (пакет закрепляет проверки до enqueue_many)
+        return claim_pending(job_id)
+
+
+def claim_check(key: str, job_id: str) -> Optional[str]:
+    """
+    Закрепить содержимое за новой задачей job_id.
+    Возвращает ID уже идущей задачи с тем же содержимым (к ней надо присоединиться)
+    или None, если новую задачу нужно ставить. Без Redis дедупликация выключается.
+    Закрепление и замена завершившейся задачи — атомарны (_CLAIM_LUA):
+    из одновременных отправок новую задачу ставит только одна.
+    """
+    try:
+        redis.incr(SUBMITTED_KEY)
+        expected = ""
+        while True:
+            existing = _claim_script(
+                keys=[key, claimed_key(job_id)], args=[job_id, expected, INFLIGHT_TTL, CLAIM_GRACE_SECONDS],
+            )
+            if existing is None:
+                return None
+            existing = existing.decode()
+            if _in_flight(existing):
+                redis.incr(ATTACHED_KEY)
+                return existing
+            # Прежняя задача уже завершилась — ключ переходит к новой, если его не перехватили
+            expected = existing
+    except RedisError as e:
+        print(f"  ⚠️ Дедупликация проверок отключена, Redis недоступен: {e}")
+        return None
+
+
+def inflight_job(key: str) -> Optional[str]:
+    """ID выполняющейся задачи с таким содержимым (без закрепления) или None"""
+    try:
+        existing = redis.get(key)
+    except RedisError:
+        return None
+    if existing and _in_flight(existing.decode()):
+        return existing.decode()
+    return None
+
+
+def release_check(key: str, job_id: str) -> None:
+    """Освободить ключ, если задача так и не была поставлена в очередь"""
+    try:
+        _release_script(keys=[key, claimed_key(job_id)], args=[job_id])
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось освободить ключ проверки: {e}")
+
+
+def cache_result(key: str, result: Dict) -> None:
+    """Сохранить результат проверки на CHECK_RESULT_CACHE_TTL"""
+    try:
+        redis.set(key, json.dumps(result, ensure_ascii=False, default=str), ex=settings.CHECK_RESULT_CACHE_TTL)
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось закэшировать результат проверки: {e}")
+
+
+def get_cached_result(key: str) -> Optional[Dict]:
+    """Готовый результат проверки такого же содержимого или None"""
+    try:
+        raw = redis.get(key)
+    except RedisError:
+        return None
+    return json.loads(raw) if raw else None
+
+
+def dedup_stats() -> Dict:
+    """Сколько проверок отправлено, сколько присоединено к идущим и доля присоединений"""
+    submitted, attached = redis.mget(SUBMITTED_KEY, ATTACHED_KEY)
+    submitted = int(submitted or 0)
+    attached = int(attached or 0)
+    return {
+        "submitted": submitted,
+        "attached": attached,
+        "dedup_rate": round(attached / submitted, 4) if submitted else 0.0,
+    }
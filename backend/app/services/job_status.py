@@ -0,0 +1,50 @@
+"""
+Статусы многих задач проверки за один запрос к Redis.
+Вместо Job.fetch на каждую задачу — один pipeline: поля хэша задачи
+и, если нужны результаты, последняя запись из потока результатов RQ.
+"""
+from typing import Dict, List
+
+from rq.job import Job
+from rq.results import Result
+
+from ..workers.queue import redis
+
+
+STATUS_FIELDS = ("status", "enqueued_at", "started_at", "ended_at")
+
+
+def fetch_job_statuses(job_ids: List[str], include_results: bool = False) -> List[Dict]:
+    """
+    Краткие статусы задач в порядке job_ids: {"job_id", "status", "enqueued_at",
+    "started_at", "ended_at"}; для несуществующих — status "not_found".
+    С include_results — ещё "result" у завершённых и "error" у упавших.
+    """
+    pipe = redis.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.hmget(Job.key_for(job_id), *STATUS_FIELDS)
+        if include_results:
+            pipe.xrevrange(Result.get_key(job_id), "+", "-", count=1)
+    replies = pipe.execute()
+    step = 2 if include_results else 1
+
+    records = []
+    for i, job_id in enumerate(job_ids):
+        values = replies[i * step]
+        if values[0] is None:
+            records.append({"job_id": job_id, "status": "not_found"})
+            continue
+
+        record = {"job_id": job_id}
+        for field, value in zip(STATUS_FIELDS, values):
+            record[field] = value.decode() if value else None
+
+        if include_results and replies[i * step + 1]:
+            result_id, payload = replies[i * step + 1][0]
+            result = Result.restore(job_id, result_id.decode(), payload, connection=redis)
+            if result.type == Result.Type.SUCCESSFUL:
+                record["result"] = result.return_value
+            elif result.type == Result.Type.FAILED:
+                record["error"] = result.exc_string
+        records.append(record)
+    return records
@@ -0,0 +1,101 @@
+"""
+Локальный архив сырых HTML-страниц КонсультантПлюс.
+Каждая скачанная страница сохраняется сжатой (gzip) под своим sha256,
+индекс (index.jsonl) хранит URL и время загрузки. По архиву закон
+можно перепарсить без сети (python manage.py reparse).
+"""
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..settings import settings
+
+
+class SnapshotArchive:
+    """Content-addressed архив страниц: objects/<sha[:2]>/<sha>.html.gz + index.jsonl"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.html.gz"
+
+    def store(self, url: str, html: str, fetched_at: Optional[datetime] = None) -> str:
+        """Сохранить страницу, вернуть её sha256. Одинаковые страницы хранятся один раз"""
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+            with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        record = {
+            "url": url,
+            "sha256": digest,
+            "fetched_at": (fetched_at or datetime.utcnow()).isoformat(timespec="seconds"),
+        }
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        return digest
+
+    def read(self, digest: str) -> str:
+        """HTML страницы по sha256"""
+        with gzip.open(self._object_path(digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def index(self) -> Dict[str, List[Tuple[str, str]]]:
+        """URL → [(fetched_at, sha256), ...] в порядке загрузки"""
+        result: Dict[str, List[Tuple[str, str]]] = {}
+        if not self.index_path.exists():
+            return result
+        with open(self.index_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                result.setdefault(record["url"], []).append((record["fetched_at"], record["sha256"]))
+        return result
+
+    def snapshot(self, at: Optional[datetime] = None) -> Dict[str, str]:
+        """
+        URL → sha256 последней загрузки каждой страницы
+        (не позже момента at, если он задан).
+        """
+        limit = at.isoformat(timespec="seconds") if at else None
+        result = {}
+        for url, fetches in self.index().items():
+            candidates = [f for f in fetches if limit is None or f[0] <= limit]
+            if candidates:
+                result[url] = max(candidates)[1]
+        return result
+
+    def export(self, dest: str, limit: Optional[int] = None, at: Optional[datetime] = None) -> Dict[str, str]:
+        """
+        Выгрузить страницы снапшота (не позже at) в папку dest как *.html
+        и urls.json (имя файла → URL) — записанный корпус для тестов парсера.
+        limit — сколько страниц, по порядку URL. Возвращает {имя файла: URL}.
+        """
+        dest_dir = Path(dest)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        pages = sorted(self.snapshot(at).items())[:limit]
+        names = {}
+        for number, (url, digest) in enumerate(pages, 1):
+            slug = url.rstrip("/").rsplit("/", 1)[-1][:40] or "index"
+            name = f"{number:03d}_{slug}.html"
+            (dest_dir / name).write_text(self.read(digest), encoding="utf-8")
+            names[name] = url
+        (dest_dir / "urls.json").write_text(json.dumps(names, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        return names
+
+
+archive = SnapshotArchive(settings.LAW_ARCHIVE_DIR)
@@ -0,0 +1,99 @@
+"""
+Чекпоинты загрузки закона в Redis.
+Хранят уже спарсенные страницы по URL, чтобы повторный запуск
+парсера продолжил с места падения, а не начинал обход заново.
+Здесь же — блокировка, не дающая запустить две загрузки одновременно.
+"""
+import json
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from ..workers.queue import redis
+
+
+CHECKPOINT_TTL = 2 * 24 * 60 * 60  # 2 дня: дольше незавершённая загрузка не живёт
+INGEST_LOCK_TTL = 3 * 60 * 60  # 3 часа: страховка, если загрузка упала, не сняв блокировку
+
+
+def acquire_ingest_lock(law_code: str, owner: str) -> bool:
+    """
+    Захватить блокировку загрузки закона.
+    Без Redis блокировка не работает — загрузка разрешается.
+    """
+    try:
+        return bool(redis.set(f"law_ingest:lock:{law_code}", owner, nx=True, ex=INGEST_LOCK_TTL))
+    except RedisError as e:
+        print(f"  ⚠️ Блокировка загрузки недоступна, Redis недоступен: {e}")
+        return True
+
+
+def release_ingest_lock(law_code: str) -> None:
+    """Снять блокировку загрузки закона"""
+    try:
+        redis.delete(f"law_ingest:lock:{law_code}")
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось снять блокировку загрузки: {e}")
+
+
+def ingest_in_progress(law_code: str) -> bool:
+    """Идёт ли сейчас загрузка закона (держится ли блокировка)"""
+    try:
+        return bool(redis.exists(f"law_ingest:lock:{law_code}"))
+    except RedisError:
+        return False
+
+
+class IngestCheckpoint:
+    """Спарсенные страницы одной загрузки (закон + дата редакции)"""
+
+    def __init__(self, law_code: str, version_date):
+        self.key = f"law_ingest:{law_code}:{version_date}"
+        self.enabled = True
+
+    def _disable(self, e: RedisError) -> None:
+        """Redis недоступен — дальше парсим без чекпоинтов"""
+        print(f"  ⚠️ Чекпоинты отключены, Redis недоступен: {e}")
+        self.enabled = False
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Страница из чекпоинта или None, если её ещё не парсили"""
+        if not self.enabled:
+            return None
+        try:
+            raw = redis.hget(self.key, url)
+        except RedisError as e:
+            self._disable(e)
+            return None
+        return json.loads(raw) if raw else None
+
+    def save(self, url: str, parsed: Dict) -> None:
+        """Запомнить спарсенную страницу"""
+        if not self.enabled:
+            return
+        try:
+            pipe = redis.pipeline()
+            pipe.hset(self.key, url, json.dumps(parsed, ensure_ascii=False))
+            pipe.expire(self.key, CHECKPOINT_TTL)
+            pipe.execute()
+        except RedisError as e:
+            self._disable(e)
+
+    def count(self) -> int:
+        """Сколько страниц уже сохранено"""
+        if not self.enabled:
+            return 0
+        try:
+            return redis.hlen(self.key)
+        except RedisError as e:
+            self._disable(e)
+            return 0
+
+    def clear(self) -> None:
+        """Удалить чекпоинт после успешной загрузки"""
+        if not self.enabled:
+            return
+        try:
+            redis.delete(self.key)
+        except RedisError as e:
+            self._disable(e)
@@ -0,0 +1,417 @@
+"""
+Однопроходный парсер страниц статей КонсультантПлюс на lxml.
+Даёт тот же результат, что и BeautifulSoup-версия из law_parser
+(clean_node_text + extract_clean_html), но обходит область контента
+один раз и собирает plain text и очищенный HTML одновременно.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+
+# -------------------- PATTERNS -------------------- #
+# Разбор строк plain text (общий для lxml- и bs4-версий)
+RE_POINT = re.compile(r'^\d+(\.\d+)?\.')
+RE_POINT_END = re.compile(r'^(\d+(\.\d+)?\.|[а-я]\)|\d+\))')
+RE_SUBPOINT = re.compile(r'^\d+\)$')
+RE_SUBPOINT_END = re.compile(r'^(\d+\)|[а-я]\)|\d+(\.\d+)?\.)')
+RE_LETTER = re.compile(r'^[а-я]\)$', re.IGNORECASE)
+RE_LETTER_END = re.compile(r'^([а-я]\)|\d+\)|\d+(\.\d+)?\.)')
+RE_SPACES = re.compile(r" +")
+RE_NEWLINES = re.compile(r"\n{4,}")
+
+# Очистка HTML
+RE_ARTICLE_HEADING = re.compile(r'^Статья\s+\d+[\.\d]*\.\s+.+$')
+RE_ATTR_CLEANUP = (
+    re.compile(r'class="[^"]*"'),
+    re.compile(r'style="[^"]*"'),
+    re.compile(r'id="[^"]*"'),
+    re.compile(r'data-[a-z-]+="[^"]*"'),
+)
+RE_EMPTY_P = re.compile(r'<p>\s*</p>')
+RE_EMPTY_DIV = re.compile(r'<div>\s*</div>')
+
+# Поиск узлов
+_CLS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+XP_CONTENT = etree.XPath(f"//*[{_CLS.format('document-page__content')}]")
+XP_MAIN = etree.XPath(f"//section[{_CLS.format('document-page__main')}]")
+XP_TITLE_H1 = etree.XPath(
+    f"//*[{_CLS.format('document-page__content')}]//*[{_CLS.format('doc-style')}]//h1"
+)
+XP_BREADCRUMB = etree.XPath(
+    f"//*[{_CLS.format('document-page__breadcrumbs')}]//li[not(following-sibling::*)]"
+)
+XP_TITLE = etree.XPath("//title")
+
+
+# -------------------- TREE RULES -------------------- #
+# Мусорные блоки (вырезаются и из текста, и из HTML)
+JUNK_CLASSES = frozenset((
+    "info-link", "document__insert", "document__edit",
+    "dnk-button-dummy", "document-page__balloon",
+    "full-text", "document-page__banner-middle",
+))
+JUNK_TAGS = frozenset(("script", "style", "noscript"))
+
+# Заголовки: остаются в тексте, но вырезаются из HTML (они отдельно)
+HEADING_TAGS = frozenset(("h1", "h2", "h3"))
+
+# Пробельные строки вне этих тегов BeautifulSoup схлопывает до " " или "\n"
+PRESERVE_WS_TAGS = frozenset(("pre", "textarea"))
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+# Строки внутри этих тегов BeautifulSoup не считает текстом
+NON_TEXT_TAGS = frozenset(("rt", "rp", "style", "script", "template"))
+
+# Пустые (void) теги сериализуются как <br/>
+VOID_TAGS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link",
+    "menuitem", "meta", "param", "source", "track", "wbr",
+    "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+))
+
+# Атрибуты-списки: BeautifulSoup нормализует в них пробелы
+LIST_ATTRS_ANY = frozenset(("class", "accesskey", "dropzone"))
+LIST_ATTRS = {
+    "a": frozenset(("rel", "rev")),
+    "link": frozenset(("rel", "rev")),
+    "td": frozenset(("headers",)),
+    "th": frozenset(("headers",)),
+    "form": frozenset(("accept-charset",)),
+    "object": frozenset(("archive",)),
+    "area": frozenset(("rel",)),
+    "icon": frozenset(("sizes",)),
+    "iframe": frozenset(("sandbox",)),
+    "output": frozenset(("for",)),
+}
+
+
+# -------------------- HELPERS -------------------- #
+def format_plain_text(text: str) -> str:
+    """Склейка строк в пункты/подпункты закона (результат get_text("\\n"))"""
+    lines = []
+
+    i = 0
+    text_lines = [l.strip() for l in text.split("\n") if l.strip()]
+
+    while i < len(text_lines):
+        line = text_lines[i]
+
+        # Основные пункты (1., 2., 3., 3.1. и т.д.)
+        if RE_POINT.match(line):
+            # Склеиваем с последующими строками до следующего пункта
+            full_line = line
+            i += 1
+            while i < len(text_lines) and not RE_POINT_END.match(text_lines[i]):
+                full_line += " " + text_lines[i]
+                i += 1
+            lines.append(f"\n\n{full_line}")
+            continue
+
+        # Подпункты с номерами (1), 2), 3)) - для определений
+        elif RE_SUBPOINT.match(line):  # Только номер без текста
+            # Склеиваем следующую строку (определение)
+            i += 1
+            if i < len(text_lines):
+                definition = text_lines[i]
+                # Продолжаем склеивать до следующего номера
+                i += 1
+                while i < len(text_lines) and not RE_SUBPOINT_END.match(text_lines[i]):
+                    definition += " " + text_lines[i]
+                    i += 1
+                lines.append(f"\n{line} {definition}")
+            else:
+                lines.append(f"\n{line}")
+            continue
+
+        # Подпункты с буквами (а), б), в))
+        elif RE_LETTER.match(line):
+            i += 1
+            if i < len(text_lines):
+                definition = text_lines[i]
+                i += 1
+                while i < len(text_lines) and not RE_LETTER_END.match(text_lines[i]):
+                    definition += " " + text_lines[i]
+                    i += 1
+                lines.append(f"\n  {line} {definition}")
+            else:
+                lines.append(f"\n  {line}")
+            continue
+
+        # Обычная строка
+        if lines:
+            lines[-1] += " " + line
+        else:
+            lines.append(line)
+        i += 1
+
+    text = "\n".join(lines)
+
+    # Очистка
+    text = RE_SPACES.sub(" ", text)  # Убираем множественные пробелы
+    text = RE_NEWLINES.sub("\n\n", text)  # Максимум 2 переноса подряд
+
+    return text.strip()
+
+
+def _escape(text: str) -> str:
+    """Экранирование как у BeautifulSoup (formatter="minimal")"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _cleanup_attrs(markup: str) -> str:
+    """Удаление class/style/id/data-* тем же набором замен, что и раньше"""
+    if '="' not in markup:
+        return markup
+    for pattern in RE_ATTR_CLEANUP:
+        markup = pattern.sub('', markup)
+    return markup
+
+
+def _quote(value: str) -> str:
+    """Кавычки для значения атрибута как у BeautifulSoup"""
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def _start_tag(el: etree._Element) -> Tuple[str, bool]:
+    """Открывающий тег (уже очищенный от атрибутов) и флаг «были атрибуты»"""
+    tag = el.tag
+    attrib = el.attrib
+    if not attrib:
+        return f"<{tag}>", False
+
+    list_attrs = LIST_ATTRS.get(tag)
+    parts = []
+    for name, value in sorted(attrib.items()):
+        if name in LIST_ATTRS_ANY or (list_attrs and name in list_attrs):
+            value = " ".join(value.split())
+        parts.append(f"{name}={_quote(_escape(value))}")
+    return f"<{tag} {_cleanup_attrs(' '.join(parts))}>", True
+
+
+def _is_text_context(el: etree._Element) -> bool:
+    """Строки внутри элемента — обычный текст (нет предков вроде <template>)"""
+    return not any(a.tag in NON_TEXT_TAGS for a in el.iterancestors())
+
+
+def _text_of(el: etree._Element, separator: str) -> str:
+    """Аналог Tag.get_text(separator, strip=True)"""
+    strings = []
+    if _is_text_context(el):
+        _collect_strings(el, strings)
+    return separator.join(strings)
+
+
+def _collect_strings(el: etree._Element, out: List[str]) -> None:
+    if el.tag in NON_TEXT_TAGS:
+        return
+    if el.text:
+        s = el.text.strip()
+        if s:
+            out.append(s)
+    for child in el:
+        if isinstance(child.tag, str):
+            _collect_strings(child, out)
+        if child.tail:
+            s = child.tail.strip()
+            if s:
+                out.append(s)
+
+
+def _first(xpath: etree.XPath, root: etree._Element) -> Optional[etree._Element]:
+    found = xpath(root)
+    return found[0] if found else None
+
+
+# -------------------- SERIALIZER -------------------- #
+class _ContentWalker:
+    """
+    Один обход области контента: собирает строки для plain text
+    и одновременно сериализует очищенный HTML.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []  # строки plain text (после strip)
+        self.preserve_ws = 0  # глубина вложенности в <pre>/<textarea>
+
+    def _collapse(self, text: str) -> str:
+        """Пробельная строка → " " или "\n" (как при построении дерева BeautifulSoup)"""
+        if self.preserve_ws or text.strip(ASCII_SPACES):
+            return text
+        return "\n" if "\n" in text else " "
+
+    def _text(self, text: str, in_text: bool, in_html: bool, visible: Optional[List[str]]) -> str:
+        """Обработка текстового узла: возвращает его HTML-представление"""
+        if in_text:
+            stripped = text.strip()
+            if stripped:
+                self.strings.append(stripped)
+                if visible is not None:
+                    visible.append(stripped)
+        if not in_html:
+            return ""
+        return _cleanup_attrs(_escape(self._collapse(text)))
+
+    def children(self, el: etree._Element, in_text: bool, in_html: bool,
+                 visible: Optional[List[str]]) -> Tuple[List[str], bool]:
+        """
+        Сериализация содержимого элемента.
+        Возвращает (части HTML, есть ли непробельное содержимое до удаления пустых <div>).
+        """
+        parts = []
+        solid = False
+
+        if el.text:
+            s = self._text(el.text, in_text, in_html, visible)
+            parts.append(s)
+            solid = solid or bool(s.strip())
+
+        for child in el:
+            tag = child.tag
+            if isinstance(tag, str):
+                if tag in JUNK_TAGS or not JUNK_CLASSES.isdisjoint(child.get("class", "").split()):
+                    pass  # мусор: вырезаем вместе с содержимым
+                else:
+                    html, present = self.element(child, in_text, in_html, visible)
+                    if present:
+                        parts.append(html)
+                        solid = True
+            elif in_html and tag in (etree.Comment, etree.ProcessingInstruction):
+                # Комментарии и processing instructions в тексте не участвуют
+                if tag is etree.Comment:
+                    markup = f"<!--{self._collapse(child.text or '')}-->"
+                else:
+                    markup = f"<?{child.target} {child.text or ''}>"
+                markup = _cleanup_attrs(markup)
+                if "<p>" in markup or "<div>" in markup:
+                    markup = RE_EMPTY_DIV.sub('', RE_EMPTY_P.sub('', markup))
+                parts.append(markup)
+                solid = True
+
+            if child.tail:
+                s = self._text(child.tail, in_text, in_html, visible)
+                parts.append(s)
+                solid = solid or bool(s.strip())
+
+        return parts, solid
+
+    def element(self, el: etree._Element, in_text: bool, in_html: bool,
+                visible: Optional[List[str]]) -> Tuple[str, bool]:
+        """
+        Сериализация элемента. Возвращает (HTML, присутствует ли элемент в HTML
+        до удаления пустых <div>); HTML == "" если элемент удалён.
+        """
+        tag = el.tag
+        in_text = in_text and tag not in NON_TEXT_TAGS
+
+        if not in_html or tag in HEADING_TAGS:
+            # Заголовки (и всё внутри них) идут только в plain text
+            self.children(el, in_text, False, None)
+            return "", False
+
+        if tag == "p":
+            own_visible = []
+            parts, solid = self.children(el, in_text, True, own_visible)
+            if visible is not None:
+                visible.extend(own_visible)
+            heading = "".join(own_visible)
+            if len(heading) < 200 and RE_ARTICLE_HEADING.match(heading):
+                return "", False  # дубликат заголовка статьи
+        elif tag in PRESERVE_WS_TAGS:
+            self.preserve_ws += 1
+            parts, solid = self.children(el, in_text, True, visible)
+            self.preserve_ws -= 1
+        else:
+            parts, solid = self.children(el, in_text, True, visible)
+
+        start, has_attrs = _start_tag(el)
+        if not has_attrs and not solid and tag in ("p", "div"):
+            # <p> удаляется целиком; <div> — только из итогового HTML,
+            # для родительского <div> он по-прежнему считается содержимым
+            return "", tag == "div"
+
+        if not parts and tag in VOID_TAGS:
+            return start[:-1] + "/>", True
+        return f"{start}{''.join(parts)}</{tag}>", True
+
+
+# -------------------- PAGE PARSING -------------------- #
+def parse_html(html: str) -> Optional[etree._Element]:
+    """
+    Разбор HTML в дерево lxml. Как и BeautifulSoup, подаём разметку
+    через feed(): потоковый режим libxml2 иначе разбирает <script>.
+    """
+    parser = etree.HTMLParser()
+    try:
+        parser.feed(html)
+    except ValueError:
+        # Строка с XML-декларацией кодировки — парсим байты
+        parser = etree.HTMLParser(encoding="utf-8")
+        parser.feed(html.encode("utf-8"))
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        return None
+
+
+def extract_title(root: etree._Element, url: str) -> str:
+    """Заголовок страницы: h1 документа → хлебные крошки → <title>"""
+    title = ""
+    title_el = _first(XP_TITLE_H1, root)
+    if title_el is not None:
+        title = " ".join(_text_of(title_el, " ").split())
+    if not title:
+        bc = _first(XP_BREADCRUMB, root)
+        if bc is not None:
+            title = _text_of(bc, " ")
+    if not title:
+        title_tag = _first(XP_TITLE, root)
+        title = _text_of(title_tag, " ") if title_tag is not None else url
+    return title
+
+
+def parse_content(content_root: etree._Element) -> Tuple[str, str]:
+    """Plain text и очищенный HTML области контента за один обход"""
+    walker = _ContentWalker()
+    start, has_attrs = _start_tag(content_root)
+    in_text = content_root.tag not in NON_TEXT_TAGS and _is_text_context(content_root)
+    parts, solid = walker.children(content_root, in_text, True, None)
+
+    body_text = format_plain_text("\n".join(walker.strings))
+
+    tag = content_root.tag
+    if not has_attrs and not solid and tag in ("p", "div"):
+        body_html = ""
+    elif not parts and tag in VOID_TAGS:
+        body_html = start[:-1] + "/>"
+    else:
+        body_html = f"{start}{''.join(parts)}</{tag}>"
+
+    return body_text, body_html.strip()
+
+
+def parse_article_page_lxml(html: str, url: str) -> Optional[Dict[str, str]]:
+    """
+    Парсинг страницы статьи/главы напрямую через lxml.
+    Возвращает None, если на странице нет области контента
+    (такие страницы разбирает BeautifulSoup-версия целиком).
+    """
+    root = parse_html(html)
+    if root is None:
+        return None
+
+    content_root = _first(XP_CONTENT, root)
+    if content_root is None:
+        content_root = _first(XP_MAIN, root)
+    if content_root is None:
+        return None
+
+    title = extract_title(root, url)
+    body_text, body_html = parse_content(content_root)
+
+    return {"title": title, "content": body_text, "content_html": body_html, "url": url}
@@ -5,7 +5,8 @@
 import re
 import time
 import urllib.parse
-from typing import List, Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Dict, Optional
 from datetime import date, datetime
 
 import requests
@@ -14,6 +15,12 @@ from sqlalchemy.orm import Session
 
 from ..db import SessionLocal, engine
 from ..repositories.law_repository import LawRepository
+from .law_archive import archive
+from .law_checkpoint import IngestCheckpoint, acquire_ingest_lock, release_ingest_lock
+from .law_page_parser import (
+    RE_ARTICLE_HEADING, RE_ATTR_CLEANUP, RE_EMPTY_P, RE_EMPTY_DIV,
+    format_plain_text, parse_article_page_lxml,
+)
 
 
 # Константы
@@ -28,19 +35,39 @@ SESSION.headers.update({
 })
 
 
+FETCH_CONNECT_TIMEOUT = 5  # соединение с сайтом (с)
+FETCH_BUDGET_SECONDS = 60  # срок на страницу со всеми попытками и паузами между ними
+
+
 # -------------------- NETWORK -------------------- #
-def fetch(url: str, *, retries: int = 3, sleep: float = 1.0) -> str:
-    """Загрузка страницы с повторными попытками"""
+def fetch(url: str, *, retries: int = 3, sleep: float = 1.0, budget: float = FETCH_BUDGET_SECONDS) -> str:
+    """
+    Загрузка страницы с повторными попытками. Все попытки вместе с паузами
+    укладываются в budget секунд: каждая получает остаток срока
+    """
+    deadline = time.monotonic() + budget
     last_exc = None
     for i in range(retries):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"{url}: страница не загрузилась за {budget} с") from last_exc
         try:
-            resp = SESSION.get(url, timeout=20)
+            resp = SESSION.get(url, timeout=(min(FETCH_CONNECT_TIMEOUT, remaining), remaining))
             resp.raise_for_status()
-            return resp.text
+            html = resp.text
+            break
         except Exception as e:
             last_exc = e
-            time.sleep(sleep * (i + 1))
-    raise last_exc
+            time.sleep(max(0.0, min(sleep * (i + 1), deadline - time.monotonic())))
+    else:
+        raise last_exc
+    
+    # Сырой HTML — в архив, чтобы потом перепарсить без сети
+    try:
+        archive.store(url, html)
+    except OSError as e:
+        print(f"  ⚠️ Не удалось сохранить страницу в архив: {e}")
+    return html
 
 
 # -------------------- HELPERS -------------------- #
@@ -119,72 +146,7 @@ def clean_node_text(node: Tag) -> str:
         bad.decompose()
 
     # Собираем текст с сохранением структуры
-    text = node.get_text("\n", strip=True)
-    
-    # Разбиваем на строки и форматируем
-    lines = []
-    
-    i = 0
-    text_lines = [l.strip() for l in text.split("\n") if l.strip()]
-    
-    while i < len(text_lines):
-        line = text_lines[i]
-        
-        # Основные пункты (1., 2., 3., 3.1. и т.д.)
-        if re.match(r'^\d+(\.\d+)?\.', line):
-            # Склеиваем с последующими строками до следующего пункта
-            full_line = line
-            i += 1
-            while i < len(text_lines) and not re.match(r'^(\d+(\.\d+)?\.|[а-я]\)|\d+\))', text_lines[i]):
-                full_line += " " + text_lines[i]
-                i += 1
-            lines.append(f"\n\n{full_line}")
-            continue
-        
-        # Подпункты с номерами (1), 2), 3)) - для определений
-        elif re.match(r'^\d+\)$', line):  # Только номер без текста
-            # Склеиваем следующую строку (определение)
-            i += 1
-            if i < len(text_lines):
-                definition = text_lines[i]
-                # Продолжаем склеивать до следующего номера
-                i += 1
-                while i < len(text_lines) and not re.match(r'^(\d+\)|[а-я]\)|\d+(\.\d+)?\.)', text_lines[i]):
-                    definition += " " + text_lines[i]
-                    i += 1
-                lines.append(f"\n{line} {definition}")
-            else:
-                lines.append(f"\n{line}")
-            continue
-        
-        # Подпункты с буквами (а), б), в))
-        elif re.match(r'^[а-я]\)$', line, re.IGNORECASE):
-            i += 1
-            if i < len(text_lines):
-                definition = text_lines[i]
-                i += 1
-                while i < len(text_lines) and not re.match(r'^([а-я]\)|\d+\)|\d+(\.\d+)?\.)', text_lines[i]):
-                    definition += " " + text_lines[i]
-                    i += 1
-                lines.append(f"\n  {line} {definition}")
-            else:
-                lines.append(f"\n  {line}")
-            continue
-        
-        # Обычная строка
-        if lines:
-            lines[-1] += " " + line
-        else:
-            lines.append(line)
-        i += 1
-    
-    text = "\n".join(lines)
-    
-    # Очистка
-    text = re.sub(r" +", " ", text)  # Убираем множественные пробелы
-    text = re.sub(r"\n{4,}", "\n\n", text)  # Максимум 2 переноса подряд
-    
-    return text.strip()
+    return format_plain_text(node.get_text("\n", strip=True))
 
 
 def extract_clean_html(node: Tag) -> str:
@@ -206,27 +168,37 @@ def extract_clean_html(node: Tag) -> str:
     for p in node.find_all("p"):
         text = p.get_text(strip=True)
         # Если параграф содержит только заголовок статьи - удаляем
-        if re.match(r'^Статья\s+\d+[\.\d]*\.\s+.+$', text) and len(text) < 200:
+        if RE_ARTICLE_HEADING.match(text) and len(text) < 200:
             p.decompose()
     
     # Получаем HTML
     html = str(node)
     
     # Очистка лишних классов и атрибутов
-    html = re.sub(r'class="[^"]*"', '', html)
-    html = re.sub(r'style="[^"]*"', '', html)
-    html = re.sub(r'id="[^"]*"', '', html)
-    html = re.sub(r'data-[a-z-]+="[^"]*"', '', html)
+    for pattern in RE_ATTR_CLEANUP:
+        html = pattern.sub('', html)
     
     # Убираем пустые теги
-    html = re.sub(r'<p>\s*</p>', '', html)
-    html = re.sub(r'<div>\s*</div>', '', html)
+    html = RE_EMPTY_P.sub('', html)
+    html = RE_EMPTY_DIV.sub('', html)
     
     return html.strip()
 
 
 def parse_article_page(html: str, url: str) -> Dict[str, str]:
-    """Парсинг страницы статьи/главы"""
+    """
+    Парсинг страницы статьи/главы.
+    Основной путь — однопроходный lxml-парсер; страницы без области
+    контента разбираются BeautifulSoup-версией (результат совпадает).
+    """
+    parsed = parse_article_page_lxml(html, url)
+    if parsed is None:
+        parsed = parse_article_page_bs4(html, url)
+    return parsed
+
+
+def parse_article_page_bs4(html: str, url: str) -> Dict[str, str]:
+    """Парсинг страницы статьи/главы через BeautifulSoup (эталонная версия)"""
     soup = BeautifulSoup(html, "lxml")
     
     # Извлечение заголовка
@@ -255,87 +227,156 @@ def parse_article_page(html: str, url: str) -> Dict[str, str]:
     return {"title": title, "content": body_text, "content_html": body_html, "url": url}
 
 
+# -------------------- CRAWLING -------------------- #
+def chapter_row(chapter_data: Dict, parsed: Dict[str, str]) -> Dict:
+    """Строка law_chapters из пункта оглавления и спарсенной страницы"""
+    match = re.search(r"Глава\s+(\d+)", chapter_data["title"])
+    chapter_num = int(match.group(1)) if match else 0
+    
+    return {
+        "chapter_number": chapter_num,
+        "title": parsed["title"],
+        "content": parsed["content"],
+        "source_url": parsed["url"]
+    }
+
+
+def article_row(article_data: Dict, parsed: Dict[str, str]) -> Dict:
+    """Строка law_articles из пункта оглавления и спарсенной страницы"""
+    match = re.search(r"Статья\s+(\d+(?:\.\d+)?)", article_data["title"])
+    article_num = match.group(1) if match else "0"
+    
+    return {
+        "article_number": article_num,
+        "title": parsed["title"],
+        "content": parsed["content"],
+        "content_html": parsed.get("content_html"),
+        "source_url": parsed["url"]
+    }
+
+
+def fetch_and_parse(url: str, checkpoint: Optional[IngestCheckpoint] = None) -> Tuple[Dict[str, str], bool]:
+    """
+    Загрузка и парсинг страницы с учётом чекпоинта.
+    Возвращает (parsed, from_checkpoint).
+    """
+    if checkpoint:
+        parsed = checkpoint.get(url)
+        if parsed:
+            return parsed, True
+    
+    html = fetch(url)
+    parsed = parse_article_page(html, url)
+    if checkpoint:
+        checkpoint.save(url, parsed)
+    return parsed, False
+
+
+def crawl_structure(structure: List[Dict], checkpoint: Optional[IngestCheckpoint] = None) -> List[Dict]:
+    """
+    Загрузка и парсинг всех глав и статей из оглавления.
+    Уже спарсенные страницы берутся из чекпоинта (если он передан).
+    Возвращает список глав: {"chapter": {...}, "articles": [{...}, ...]}
+    """
+    parsed_chapters = []
+    
+    for chapter_data in structure:
+        # Парсим главу
+        print(f"[Глава] Парсю: {chapter_data['title']}")
+        
+        try:
+            parsed, _ = fetch_and_parse(chapter_data["url"], checkpoint)
+            chapter = chapter_row(chapter_data, parsed)
+            
+        except Exception as e:
+            print(f"  ⚠️ Ошибка парсинга главы: {e}")
+            continue
+        
+        # Парсим статьи этой главы
+        articles = []
+        for article_data in chapter_data["articles"]:
+            print(f"  [Статья] Парсю: {article_data['title']}")
+            
+            try:
+                parsed, from_checkpoint = fetch_and_parse(article_data["url"], checkpoint)
+                articles.append(article_row(article_data, parsed))
+                
+                if not from_checkpoint:
+                    time.sleep(0.7)  # Задержка между запросами
+                
+            except Exception as e:
+                print(f"    ⚠️ Ошибка парсинга статьи: {e}")
+                continue
+        
+        parsed_chapters.append({"chapter": chapter, "articles": articles})
+    
+    return parsed_chapters
+
+
 # -------------------- DATABASE OPERATIONS -------------------- #
-def save_to_database(structure: List[Dict], version_date: date, law_name: str = LAW_NAME) -> None:
-    """Сохранение спарсенных данных в БД со связями глава-статьи"""
+def bulk_save_chapters(repo: LawRepository, version_id: int, parsed_chapters: List[Dict]) -> int:
+    """
+    Массовая запись глав и статей версии: один INSERT для глав, один для статей.
+    Возвращает количество сохранённых документов.
+    """
+    chapter_ids = repo.bulk_create_chapters([
+        {**item["chapter"], "version_id": version_id}
+        for item in parsed_chapters
+    ])
+    
+    article_rows = [
+        {**article, "version_id": version_id, "chapter_id": chapter_id}
+        for chapter_id, item in zip(chapter_ids, parsed_chapters)
+        for article in item["articles"]
+    ]
+    article_ids = repo.bulk_create_articles(article_rows)
+    
+    return len(chapter_ids) + len(article_ids)
+
+
+def collect_garbage_versions(repo: LawRepository, law_code: str = LAW_CODE) -> int:
+    """Удаление недогруженных версий, оставшихся после падения загрузки"""
+    stale = repo.get_incomplete_versions(law_code)
+    for version in stale:
+        print(f"🧹 Удаляю недогруженную версию ID={version.id} от {version.parsed_at}")
+        repo.delete_version(version.id)
+    return len(stale)
+
+
+def save_parsed_version(parsed_chapters: List[Dict], version_date: date, law_name: str = LAW_NAME) -> int:
+    """
+    Запись спарсенных глав/статей новой версией закона.
+    Версия активируется только после записи всех документов. Возвращает ID версии.
+    Вызывается под блокировкой загрузки закона (acquire_ingest_lock): сборщик мусора
+    удаляет все недогруженные версии, в том числе те, что пишутся прямо сейчас.
+    """
     db = SessionLocal()
     repo = LawRepository(db)
     
     try:
-        # 1. Деактивировать старые версии
-        repo.deactivate_versions(LAW_CODE)
+        # 2. Убрать недогруженные версии прошлых запусков
+        collect_garbage_versions(repo)
         
-        # 2. Создать новую версию
+        # 3. Создать новую версию (пока неактивную и незавершённую)
         law_version = repo.create_version(
             law_name=law_name,
             law_code=LAW_CODE,
             source_url=LAW_BASE_URL,
             version_date=version_date,
-            is_active=True
+            is_active=False,
+            is_complete=False
         )
         
         print(f"✅ Создана версия закона ID={law_version.id}, дата={version_date}")
         
-        # 3. Парсинг и сохранение по структуре: глава → статьи
-        total_count = 0
-        for chapter_data in structure:
-            # Парсим главу
-            print(f"[Глава] Парсю: {chapter_data['title']}")
-            
-            try:
-                html = fetch(chapter_data["url"])
-                parsed = parse_article_page(html, chapter_data["url"])
-                
-                match = re.search(r"Глава\s+(\d+)", chapter_data["title"])
-                chapter_num = int(match.group(1)) if match else 0
-                
-                chapter = repo.create_chapter(
-                    version_id=law_version.id,
-                    chapter_number=chapter_num,
-                    title=parsed["title"],
-                    content=parsed["content"],
-                    source_url=parsed["url"]
-                )
-                total_count += 1
-                
-            except Exception as e:
-                print(f"  ⚠️ Ошибка парсинга главы: {e}")
-                continue
-            
-            # Парсим статьи этой главы
-            for article_data in chapter_data["articles"]:
-                print(f"  [Статья] Парсю: {article_data['title']}")
-                
-                try:
-                    html = fetch(article_data["url"])
-                    parsed = parse_article_page(html, article_data["url"])
-                    
-                    match = re.search(r"Статья\s+(\d+(?:\.\d+)?)", article_data["title"])
-                    article_num = match.group(1) if match else "0"
-                    
-                    repo.create_article(
-                        version_id=law_version.id,
-                        chapter_id=chapter.id,
-                        article_number=article_num,
-                        title=parsed["title"],
-                        content=parsed["content"],
-                        content_html=parsed.get("content_html"),
-                        source_url=parsed["url"]
-                    )
-                    total_count += 1
-                    
-                    # Коммитим каждые 5 записей
-                    if total_count % 5 == 0:
-                        repo.bulk_commit()
-                    
-                    time.sleep(0.7)  # Задержка между запросами
-                    
-                except Exception as e:
-                    print(f"    ⚠️ Ошибка парсинга статьи: {e}")
-                    continue
-        
+        # 4. Массовая вставка глав и статей
+        total_count = bulk_save_chapters(repo, law_version.id, parsed_chapters)
         repo.bulk_commit()
+        
+        # 5. Версия загружена целиком — активируем её вместо старых
+        repo.activate_version(law_version.id, LAW_CODE)
         print(f"✅ Сохранено {total_count} документов в БД")
+        return law_version.id
         
     except Exception as e:
         db.rollback()
@@ -345,6 +386,26 @@ def save_to_database(structure: List[Dict], version_date: date, law_name: str =
         db.close()
 
 
+def save_to_database(structure: List[Dict], version_date: date, law_name: str = LAW_NAME) -> None:
+    """
+    Сохранение спарсенных данных в БД со связями глава-статьи.
+    Прогресс обхода хранится в чекпоинте: при повторном запуске
+    уже спарсенные страницы повторно не скачиваются.
+    """
+    checkpoint = IngestCheckpoint(LAW_CODE, version_date)
+    resumed = checkpoint.count()
+    if resumed:
+        print(f"♻️ Продолжаю загрузку: {resumed} страниц уже в чекпоинте")
+    
+    # 1. Сначала скачиваем и парсим всё (без обращений к БД)
+    parsed_chapters = crawl_structure(structure, checkpoint)
+    
+    # 2. Записываем новую версию
+    save_parsed_version(parsed_chapters, version_date, law_name)
+    
+    checkpoint.clear()
+
+
 def extract_law_metadata(html: str) -> Dict:
     """Извлечение метаданных закона: название и дата из названия"""
     soup = BeautifulSoup(html, "lxml")
@@ -381,23 +442,90 @@ def parse_and_save_law(law_url: str = LAW_BASE_URL) -> None:
     """
     print(f"🔍 Начинаю парсинг закона: {law_url}")
     
-    # 1. Загрузка оглавления
-    toc_html = fetch(law_url)
+    if not acquire_ingest_lock(LAW_CODE, "parse_and_save_law"):
+        print("⏭️ Загрузка закона уже идёт, пропускаю")
+        return
     
-    # 2. Извлечение метаданных
-    metadata = extract_law_metadata(toc_html)
-    print(f"📋 Закон: {metadata['law_name']}")
-    print(f"📅 Дата последней редакции: {metadata['version_date']}")
+    try:
+        # 1. Загрузка оглавления
+        toc_html = fetch(law_url)
+        
+        # 2. Извлечение метаданных
+        metadata = extract_law_metadata(toc_html)
+        print(f"📋 Закон: {metadata['law_name']}")
+        print(f"📅 Дата последней редакции: {metadata['version_date']}")
+        
+        # 3. Извлечение структуры
+        structure = extract_structured_links(toc_html, law_url)
+        
+        # Подсчет общего количества документов
+        total_docs = len(structure) + sum(len(ch["articles"]) for ch in structure)
+        print(f"📚 Найдено {len(structure)} глав, {total_docs} документов для парсинга")
+        
+        # 4. Сохранение в БД со структурой и метаданными
+        save_to_database(structure, metadata["version_date"], metadata["law_name"])
+    finally:
+        release_ingest_lock(LAW_CODE)
+    
+    print("🎉 Парсинг закона завершён успешно!")
+
+
+# -------------------- OFFLINE REPARSE -------------------- #
+def parse_archived_page(url: str, digest: str) -> Optional[Dict[str, str]]:
+    """Парсинг страницы из архива (выполняется в процессе пула)"""
+    try:
+        return parse_article_page(archive.read(digest), url)
+    except Exception as e:
+        print(f"  ⚠️ Ошибка парсинга {url}: {e}")
+        return None
+
+
+def reparse_from_archive(at: Optional[datetime] = None, workers: Optional[int] = None,
+                         law_url: str = LAW_BASE_URL) -> int:
+    """
+    Пересборка версии закона из архива сырых страниц, без сети.
+    Берётся последняя загрузка каждой страницы (не позже at),
+    страницы парсятся параллельно в пуле процессов. Возвращает ID версии.
+    """
+    snapshot = archive.snapshot(at)
+    if law_url not in snapshot:
+        raise LookupError(f"В архиве нет оглавления {law_url}")
     
-    # 3. Извлечение структуры
+    toc_html = archive.read(snapshot[law_url])
+    metadata = extract_law_metadata(toc_html)
     structure = extract_structured_links(toc_html, law_url)
+    print(f"📋 Закон: {metadata['law_name']} (редакция {metadata['version_date']})")
     
-    # Подсчет общего количества документов
-    total_docs = len(structure) + sum(len(ch["articles"]) for ch in structure)
-    print(f"📚 Найдено {len(structure)} глав, {total_docs} документов для парсинга")
+    urls = [ch["url"] for ch in structure] + [a["url"] for ch in structure for a in ch["articles"]]
+    missing = [url for url in urls if url not in snapshot]
+    if missing:
+        print(f"⚠️ В архиве нет {len(missing)} страниц, они будут пропущены")
+    urls = [url for url in urls if url in snapshot]
     
-    # 4. Сохранение в БД со структурой и метаданными
-    save_to_database(structure, metadata["version_date"], metadata["law_name"])
+    print(f"⚙️ Парсинг {len(urls)} страниц из архива...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(parse_archived_page, urls, [snapshot[url] for url in urls], chunksize=4)
+        parsed_pages = {url: parsed for url, parsed in zip(urls, results) if parsed}
     
-    print("🎉 Парсинг закона завершён успешно!")
-
+    # Собираем главы/статьи в том же виде, что и при обходе сайта
+    parsed_chapters = []
+    for chapter_data in structure:
+        if chapter_data["url"] not in parsed_pages:
+            continue
+        parsed_chapters.append({
+            "chapter": chapter_row(chapter_data, parsed_pages[chapter_data["url"]]),
+            "articles": [
+                article_row(article_data, parsed_pages[article_data["url"]])
+                for article_data in chapter_data["articles"]
+                if article_data["url"] in parsed_pages
+            ]
+        })
+    
+    # Запись — под блокировкой загрузки: сборщик мусора не должен удалить версию,
+    # которую сейчас пишут задачи загрузки с сайта (workers/law_ingest.py)
+    if not acquire_ingest_lock(LAW_CODE, "reparse_from_archive"):
+        raise RuntimeError("Идёт загрузка закона, пересборка из архива отложена")
+    try:
+        return save_parsed_version(parsed_chapters, metadata["version_date"], metadata["law_name"])
+    finally:
+        release_ingest_lock(LAW_CODE)
@@ -0,0 +1,159 @@
+"""
+Снапшот закона: активная версия с главами и статьями в одном файле.
+Нужен, чтобы новое окружение (CI, ноутбук, новый регион) получило закон
+за секунды и без сети, не обходя КонсультантПлюс.
+
+Формат — gzip JSONL: первая строка — заголовок (формат, версия формата,
+сведения о версии закона, количество документов), далее по строке на главу
+в том же виде, что выдаёт crawl_structure: {"chapter": {...}, "articles": [...]}.
+Статьи без главы лежат в строке с "chapter": null.
+"""
+import gzip
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..db import SessionLocal
+from ..repositories.law_repository import LawRepository
+from .law_checkpoint import acquire_ingest_lock, release_ingest_lock
+from .law_parser import LAW_CODE, collect_garbage_versions
+
+
+SNAPSHOT_FORMAT = "adlaw-law-snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+
+CHAPTER_FIELDS = ("chapter_number", "title", "content", "source_url")
+ARTICLE_FIELDS = (
+    "article_number", "title", "content", "content_html", "summary",
+    "source_url", "keywords", "violation_type",
+)
+
+
+def export_snapshot(path: str, law_code: str = LAW_CODE) -> Dict:
+    """Выгрузить активную версию закона в файл. Возвращает заголовок снапшота"""
+    db = SessionLocal()
+    repo = LawRepository(db)
+    try:
+        law_version = repo.get_active_version(law_code)
+        if not law_version:
+            raise ValueError(f"Нет активной версии закона {law_code}")
+
+        chapters = repo.get_chapters_by_version(law_version.id)
+        articles_by_chapter: Dict[Optional[int], list] = {}
+        for article in sorted(repo.get_articles_by_version(law_version.id), key=lambda a: a.id):
+            articles_by_chapter.setdefault(article.chapter_id, []).append(
+                {field: getattr(article, field) for field in ARTICLE_FIELDS}
+            )
+
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "exported_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "version": {
+                "law_name": law_version.law_name,
+                "law_code": law_version.law_code,
+                "source_url": law_version.source_url,
+                "version_date": law_version.version_date.isoformat(),
+                "parsed_at": law_version.parsed_at.isoformat(timespec="seconds") if law_version.parsed_at else None,
+            },
+            "chapters": len(chapters),
+            "articles": sum(len(a) for a in articles_by_chapter.values()),
+        }
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=9) as f:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for chapter in chapters:
+                item = {
+                    "chapter": {field: getattr(chapter, field) for field in CHAPTER_FIELDS},
+                    "articles": articles_by_chapter.pop(chapter.id, []),
+                }
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            # Статьи без главы (и статьи глав, которых нет в версии)
+            orphans = [a for articles in articles_by_chapter.values() for a in articles]
+            if orphans:
+                f.write(json.dumps({"chapter": None, "articles": orphans}, ensure_ascii=False) + "\n")
+        Path(tmp_path).replace(path)
+    finally:
+        db.close()
+
+    print(f"📦 Выгружено: {header['chapters']} глав, {header['articles']} статей → {path}")
+    return header
+
+
+def import_snapshot(path: str, if_empty: bool = False) -> Optional[int]:
+    """
+    Загрузить снапшот новой активной версией закона.
+    if_empty — загружать, только если в БД ещё нет активной версии.
+    Возвращает ID версии или None, если загрузка пропущена.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path}: не снапшот закона")
+        if header.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"{path}: версия формата {header.get('format_version')}, поддерживается {SNAPSHOT_FORMAT_VERSION}"
+            )
+        items = [json.loads(line) for line in f if line.strip()]
+
+    meta = header["version"]
+    law_code = meta["law_code"]
+
+    # Загрузку закона с сайта и импорт нельзя вести одновременно (сборщик мусора удалит чужую версию)
+    if not acquire_ingest_lock(law_code, "import_snapshot"):
+        raise RuntimeError("Идёт загрузка закона, импорт снапшота отложен")
+
+    db = SessionLocal()
+    repo = LawRepository(db)
+    try:
+        if if_empty and repo.get_active_version(law_code):
+            print("⏭️ Закон уже есть в БД, снапшот не загружается")
+            return None
+
+        collect_garbage_versions(repo, law_code)
+        law_version = repo.create_version(
+            law_name=meta["law_name"],
+            law_code=law_code,
+            source_url=meta["source_url"],
+            version_date=date.fromisoformat(meta["version_date"]),
+            is_active=False,
+            is_complete=False
+        )
+        version_id = law_version.id
+
+        with_chapter = [item for item in items if item["chapter"]]
+        chapter_ids = repo.bulk_create_chapters([
+            {**item["chapter"], "version_id": version_id}
+            for item in with_chapter
+        ])
+        article_rows = [
+            {**article, "version_id": version_id, "chapter_id": chapter_id}
+            for chapter_id, item in zip(chapter_ids, with_chapter)
+            for article in item["articles"]
+        ] + [
+            {**article, "version_id": version_id, "chapter_id": None}
+            for item in items if not item["chapter"]
+            for article in item["articles"]
+        ]
+        articles = repo.copy_articles(article_rows)
+
+        if len(chapter_ids) != header["chapters"] or articles != header["articles"]:
+            raise ValueError(
+                f"{path}: снапшот повреждён — глав {len(chapter_ids)}/{header['chapters']}, "
+                f"статей {articles}/{header['articles']}"
+            )
+        repo.bulk_commit()
+        repo.activate_version(version_id, law_code)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        release_ingest_lock(law_code)
+
+    print(f"📥 Загружена версия ID={version_id} от {meta['version_date']}: "
+          f"{len(chapter_ids)} глав, {articles} статей")
+    return version_id
@@ -0,0 +1,63 @@
+"""
+Готовность закона для проверок.
+Пока первая версия закона не загружена в БД, проверки не ждут загрузку,
+а используют встроенные сведения о законе (FALLBACK_LAW) и помечают это в отчёте.
+"""
+from datetime import date
+from typing import Dict
+
+from ..db import SessionLocal
+from ..repositories.law_repository import LawRepository
+from .law_checkpoint import ingest_in_progress
+
+
+LAW_CODE = "38-FZ"
+
+# Встроенные сведения о законе — до появления первой версии в БД
+FALLBACK_LAW = {
+    "law_name": "Федеральный закон \"О рекламе\" от 13.03.2006 N 38-ФЗ (последняя редакция)",
+    "version_date": date(2024, 10, 1),
+}
+
+
+def get_law_metadata(repo: LawRepository) -> Dict:
+    """Название и дата редакции активной версии закона или встроенные сведения"""
+    law_version = repo.get_active_version(LAW_CODE)
+    if law_version:
+        return {
+            "law_name": law_version.law_name,
+            "version_date": law_version.version_date,
+            "is_fallback": False,
+        }
+    return {**FALLBACK_LAW, "is_fallback": True}
+
+
+def get_law_readiness() -> Dict:
+    """
+    Состояние закона для API:
+    ready — активная версия в БД; loading — версии нет, идёт загрузка;
+    fallback — версии нет и загрузка не идёт; db_unavailable — БД не отвечает.
+    """
+    ingesting = ingest_in_progress(LAW_CODE)
+    db = SessionLocal()
+    try:
+        metadata = get_law_metadata(LawRepository(db))
+    except Exception as e:
+        return {"status": "db_unavailable", "ingestion_running": ingesting, "error": str(e)}
+    finally:
+        db.close()
+
+    if not metadata["is_fallback"]:
+        status = "ready"
+    elif ingesting:
+        status = "loading"
+    else:
+        status = "fallback"
+
+    return {
+        "status": status,
+        "ingestion_running": ingesting,
+        "law_name": metadata["law_name"],
+        "law_version_date": metadata["version_date"].isoformat(),
+        "is_fallback": metadata["is_fallback"],
+    }
@@ -1,11 +1,82 @@
-from ml.classifiers import analyze_text, analyze_audio
+from typing import Callable
 
+from ml.classifiers import (
+    TIMEOUT_ERRORS, analyze_text, analyze_texts, analyze_text_async, transcribe_audio, transcribe_audio_async,
+)
+from .deadline import ASR_SHARE, new_deadline, partial_marker, stage_budget
 
-def run_ml(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None):
+
+def run_ml(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None,
+           check_cancelled: Callable[[], None] | None = None, deadline_at: float | None = None):
+    """
+    check_cancelled вызывается между этапами и прерывает проверку исключением, если её отменили.
+    deadline_at — срок проверки (deadline.py): этап, не уложившийся в свою долю,
+    завершает проверку частичным результатом — out["partial"] (см. partial_marker).
+    """
+    check_cancelled = check_cancelled or (lambda: None)
+    deadline_at = deadline_at or new_deadline()
+    out = {}
+    stage = "llm"
+    try:
+        if audio_bytes and audio_content_type:
+            # Текст рекламы — из аудио; переданный текст всё равно перекрылся бы результатом по аудио
+            stage = "asr"
+            budget = stage_budget(deadline_at, ASR_SHARE)
+            if not budget:
+                raise TimeoutError("no time left for ASR")
+            text = transcribe_audio(audio_bytes, audio_content_type, timeout=budget)
+            check_cancelled()
+            if text is None:
+                out["text"] = []
+                return out
+            stage = "llm"
+        if text:
+            budget = stage_budget(deadline_at)
+            if not budget:
+                raise TimeoutError("no time left for LLM")
+            out["text"] = analyze_text(text, timeout=budget)
+            check_cancelled()
+    except TIMEOUT_ERRORS as e:
+        print(f"⏱️ Этап {stage} не уложился в срок проверки: {e}")
+        out = {"text": [], "partial": partial_marker(stage)}
+    return out
+
+
+def run_ml_batch(texts: list[str], deadline_at: float | None = None) -> list[dict]:
+    """
+    Несколько коротких текстов — пакетными запросами к LLM; вывод как у run_ml на каждый текст.
+    Тексты, которые не успели проверить до deadline_at, — с пометкой partial.
+    """
+    budget = stage_budget(deadline_at or new_deadline())
+    return [
+        {"text": [], "partial": partial_marker("llm")} if violations is None else {"text": violations}
+        for violations in analyze_texts(texts, timeout=budget)
+    ]
+
+
+async def run_ml_async(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None,
+                       deadline_at: float | None = None):
+    """То же, что run_ml, для асинхронного воркера: HTTP-запросы не блокируют event loop"""
+    deadline_at = deadline_at or new_deadline()
     out = {}
-    if text:
-        out["text"] = analyze_text(text)
-    if audio_bytes and audio_content_type:
-        # Передаем аудио в байтах напрямую в ml модуль
-        out["text"] = analyze_audio(audio_bytes, audio_content_type)
+    stage = "llm"
+    try:
+        if audio_bytes and audio_content_type:
+            stage = "asr"
+            budget = stage_budget(deadline_at, ASR_SHARE)
+            if not budget:
+                raise TimeoutError("no time left for ASR")
+            text = await transcribe_audio_async(audio_bytes, audio_content_type, timeout=budget)
+            if text is None:
+                out["text"] = []
+                return out
+            stage = "llm"
+        if text:
+            budget = stage_budget(deadline_at)
+            if not budget:
+                raise TimeoutError("no time left for LLM")
+            out["text"] = await analyze_text_async(text, timeout=budget)
+    except TIMEOUT_ERRORS as e:
+        print(f"⏱️ Этап {stage} не уложился в срок проверки: {e}")
+        out = {"text": [], "partial": partial_marker(stage)}
     return out
@@ -1,9 +1,12 @@
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Tuple
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Flowable, PageBreak
+from reportlab.platypus.doctemplate import LayoutError
 from reportlab.lib.colors import HexColor, black, white
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 from reportlab.pdfbase import pdfmetrics
@@ -13,151 +16,156 @@ import os
 from backend.app.services.unreliability_text import UNRELIABILITY_TEXT
 
 
-def generate_pdf_report(report_data: dict) -> bytes:
+# Пути к шрифтам в контейнере Linux
+DEJAVU_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+DEJAVU_BOLD_PATH = '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'
+
+# Поля страницы и рамка текста SimpleDocTemplate (отступ рамки по умолчанию — 6 pt)
+PAGE_MARGIN = 50
+FRAME_WIDTH = A4[0] - 2 * PAGE_MARGIN - 12
+FRAME_HEIGHT = A4[1] - 2 * PAGE_MARGIN - 12
+
+
+class StaticPage(Flowable):
     """
-    Генерирует PDF отчет на основе данных проверки рекламы.
+    Страница постоянного раздела отчёта, разложенная заранее: абзацы уже
+    перенесены по строкам и поделены между страницами, остаётся их нарисовать
     """
-    
-    # Регистрируем DejaVu шрифты с поддержкой кириллицы
-    font_name = 'DejaVuSans'
-    font_name_bold = 'DejaVuSans-Bold'
-    
-    try:
-        # Пути к шрифтам в контейнере Linux
-        dejavu_path = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
-        dejavu_bold_path = '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'
-        
-        # Регистрируем шрифты
-        if os.path.exists(dejavu_path):
-            pdfmetrics.registerFont(TTFont(font_name, dejavu_path))
-            print(f"Зарегистрирован шрифт: {font_name}")
-        else:
+
+    def __init__(self, fragments: List[Tuple[Flowable, float]]):
+        super().__init__()
+        self.fragments = fragments  # (абзац, его низ от низа рамки)
+        self.height = FRAME_HEIGHT - fragments[-1][1]
+
+    def wrap(self, availWidth, availHeight):
+        return availWidth, self.height
+
+    def draw(self):
+        offset = FRAME_HEIGHT - self.height
+        for flowable, y in self.fragments:
+            flowable.drawOn(self.canv, 0, y - offset)
+
+
+def layout_static_pages(story: list) -> List[StaticPage]:
+    """
+    Раскладка постоянного раздела по страницам (как это делает рамка platypus):
+    перенос строк и деление абзацев между страницами выполняются один раз
+    """
+    pages, fragments = [], []
+    free, space_after = FRAME_HEIGHT, 0  # свободная высота рамки и отступ после предыдущего абзаца
+    pending = list(story)
+    while pending:
+        flowable = pending.pop(0)
+        space = max(flowable.getSpaceBefore() - space_after, 0) if fragments else 0
+        _, height = flowable.wrap(FRAME_WIDTH, free - space)
+        if space + height <= free:
+            free -= space + height
+            fragments.append((flowable, free))
+            space_after = flowable.getSpaceAfter()
+            free -= space_after
+            continue
+
+        parts = flowable.split(FRAME_WIDTH, free - space)
+        if parts:
+            pending[:0] = parts
+            continue
+        if not fragments:
+            raise LayoutError(f"{flowable.__class__.__name__} не помещается на пустую страницу")
+        pages.append(StaticPage(fragments))
+        fragments, free, space_after = [], FRAME_HEIGHT, 0
+        pending.insert(0, flowable)
+
+    if fragments:
+        pages.append(StaticPage(fragments))
+    return pages
+
+
+class PdfReportRenderer:
+    """
+    Рендер PDF-отчётов. Шрифты регистрируются (разбор TTF-файлов) и стили
+    собираются один раз, при создании; в процессе живёт один экземпляр —
+    get_renderer(), и каждый отчёт только раскладывает свои абзацы.
+    """
+
+    def __init__(self):
+        self.font_name, self.font_name_bold = self._register_fonts()
+        self.styles = self._build_styles()
+        self.info_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), HexColor('#f9fafb')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), self.font_name_bold),
+            ('FONTNAME', (1, 0), (-1, -1), self.font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, HexColor('#e5e7eb')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [HexColor('#ffffff'), HexColor('#f9fafb')])
+        ])
+        # Приложение о недостоверной рекламе одинаково во всех отчётах — раскладываем
+        # его по страницам один раз, отчёт добавляет готовые страницы после своих
+        self.appendix_pages = layout_static_pages(self._appendix_story())
+
+    @staticmethod
+    def _register_fonts() -> Tuple[str, str]:
+        """Регистрирует DejaVu шрифты с поддержкой кириллицы; возвращает имена обычного и жирного"""
+        font_name = 'DejaVuSans'
+        font_name_bold = 'DejaVuSans-Bold'
+
+        try:
+            if os.path.exists(DEJAVU_PATH):
+                pdfmetrics.registerFont(TTFont(font_name, DEJAVU_PATH))
+                print(f"Зарегистрирован шрифт: {font_name}")
+            else:
+                font_name = 'Times-Roman'
+                print(f"DejaVu не найден, используем fallback: {font_name}")
+
+            if os.path.exists(DEJAVU_BOLD_PATH):
+                pdfmetrics.registerFont(TTFont(font_name_bold, DEJAVU_BOLD_PATH))
+                print(f"Зарегистрирован жирный шрифт: {font_name_bold}")
+            else:
+                font_name_bold = 'Times-Bold'
+                print(f"DejaVu Bold не найден, используем fallback: {font_name_bold}")
+
+        except Exception as e:
+            print(f"Ошибка регистрации DejaVu шрифтов: {e}")
             font_name = 'Times-Roman'
-            print(f"DejaVu не найден, используем fallback: {font_name}")
-            
-        if os.path.exists(dejavu_bold_path):
-            pdfmetrics.registerFont(TTFont(font_name_bold, dejavu_bold_path))
-            print(f"Зарегистрирован жирный шрифт: {font_name_bold}")
-        else:
             font_name_bold = 'Times-Bold'
-            print(f"DejaVu Bold не найден, используем fallback: {font_name_bold}")
-            
-    except Exception as e:
-        print(f"Ошибка регистрации DejaVu шрифтов: {e}")
-        font_name = 'Times-Roman'
-        font_name_bold = 'Times-Bold'
-        print(f"Fallback на Times шрифты: {font_name}, {font_name_bold}")
-    
-    # Создаем буфер для PDF
-    buffer = BytesIO()
-    
-    # Создаем документ
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=50,
-        leftMargin=50,
-        topMargin=50,
-        bottomMargin=50
-    )
-    
-    # Элементы документа
-    story = []
-    
-    # Стили с поддержкой кириллицы
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=15,
-        alignment=TA_CENTER,
-        textColor=HexColor('#1f2937'),
-        fontName=font_name
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        spaceBefore=20,
-        textColor=HexColor('#1f2937'),
-        fontName=font_name
-    )
-
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=8,
-        alignment=TA_JUSTIFY,
-        fontName=font_name
-    )
-    
-    # Заголовок
-    story.append(Paragraph("Отчет о проверке рекламы", title_style))
-
-    story.append(Paragraph("Legal ADvice не проверяет рекламу на недостоверность. Предлагаем Вам ознакомиться "
-                           "с критериями оценки самостоятельно в конце отчёта", normal_style))
-
-    # Информация о проверке
-    story.append(Paragraph("Информация о проверке", heading_style))
-
-    info_data = [
-        [Paragraph('<b>Дата проверки:</b>', normal_style),
-         Paragraph(report_data.get('check_date_formatted', 'Не указана'), normal_style)],
-
-        [Paragraph('<b>Закон:</b>', normal_style),
-         Paragraph(report_data.get('law_name', 'Не указан'), normal_style)],
-
-        [Paragraph('<b>Статус:</b>', normal_style),
-         Paragraph(
-             'Соответствует законодательству' if report_data.get('is_ok')
-             else 'Не соответствует законодательству',
-             normal_style
-         )]
-    ]
-
-    info_table = Table(
-        info_data,
-        colWidths=[2 * inch, 4 * inch]  # обязательно задаем ширину столбцов
-    )
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), HexColor('#f9fafb')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), font_name_bold),
-        ('FONTNAME', (1, 0), (-1, -1), font_name),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, HexColor('#e5e7eb')),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [HexColor('#ffffff'), HexColor('#f9fafb')])
-    ]))
-    
-    story.append(info_table)
-    story.append(Spacer(1, 10))
-    
-    # Результат проверки
-    story.append(Paragraph("Результат проверки", heading_style))
-    
-    # Индикаторы (флаги)
-    flags = report_data.get('flags', [])
-    for flag in flags:
-        flag_text = flag.get('text', '')
-        if flag.get('type') == 'ok':
-            story.append(Paragraph(f"✓ {flag_text}", normal_style))
-        else:
-            story.append(Paragraph(f"⚠ {flag_text}", normal_style))
-
-    # Нарушения (если есть)
-    violations = report_data.get('violations', [])
-    if violations:
-        story.append(Paragraph("Выявленные нарушения из Федерального закона «О рекламе»", heading_style))
-        
-        for i, violation in enumerate(violations, 1):
-            # Заголовок нарушения
-            violation_title = ParagraphStyle(
+            print(f"Fallback на Times шрифты: {font_name}, {font_name_bold}")
+
+        return font_name, font_name_bold
+
+    def _build_styles(self) -> Dict[str, ParagraphStyle]:
+        """Стили с поддержкой кириллицы — общие для всех отчётов"""
+        styles = getSampleStyleSheet()
+        font_name, font_name_bold = self.font_name, self.font_name_bold
+        return {
+            "title": ParagraphStyle(
+                'CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=18,
+                spaceAfter=15,
+                alignment=TA_CENTER,
+                textColor=HexColor('#1f2937'),
+                fontName=font_name
+            ),
+            "heading": ParagraphStyle(
+                'CustomHeading',
+                parent=styles['Heading2'],
+                fontSize=14,
+                spaceAfter=12,
+                spaceBefore=20,
+                textColor=HexColor('#1f2937'),
+                fontName=font_name
+            ),
+            "normal": ParagraphStyle(
+                'CustomNormal',
+                parent=styles['Normal'],
+                fontSize=10,
+                spaceAfter=8,
+                alignment=TA_JUSTIFY,
+                fontName=font_name
+            ),
+            "violation_title": ParagraphStyle(
                 'ViolationTitle',
                 parent=styles['Heading3'],
                 fontSize=12,
@@ -165,101 +173,202 @@ def generate_pdf_report(report_data: dict) -> bytes:
                 spaceBefore=12,
                 textColor=HexColor('#dc2626'),
                 fontName=font_name
-            )
-            
-            story.append(Paragraph(violation.get('title', f'Нарушение {i}'), violation_title))
-            
-            # Текст нарушения
-            violation_text = violation.get('text', 'Описание недоступно')
-            story.append(Paragraph(violation_text, normal_style))
-            
-            # Рекомендации по исправлению
-            if violation.get('fix'):
-                story.append(Paragraph("<b>Рекомендации по исправлению:</b>", normal_style))
-                story.append(Paragraph(violation.get('fix'), normal_style))
-            
-            story.append(Spacer(1, 12))
-    
-    # Судебная практика (если есть)
-    cases = report_data.get('cases', [])
-    if cases:
-        story.append(Paragraph("Релевантная судебная практика", heading_style))
-        
-        for case in cases:
-            case_title = ParagraphStyle(
+            ),
+            "case_title": ParagraphStyle(
                 'CaseTitle',
                 parent=styles['Heading4'],
                 fontSize=11,
                 spaceAfter=6,
                 textColor=HexColor('#1f2937'),
                 fontName=font_name
-            )
-            
-            story.append(Paragraph(case.get('title', 'Судебное дело'), case_title))
-            story.append(Paragraph(case.get('text', 'Описание недоступно'), normal_style))
-            story.append(Spacer(1, 10))
-    
-    # Недостоверность рекламы
-    story.append(Paragraph("Признаки недостоверной рекламы", title_style))
-    story.append(Spacer(1, 5))
-
-    story.append(
-        Paragraph("Если в рекламе хоть что-то из перечисленного ниже не соответствует правде — это недостоверная "
-                  "реклама, то есть обман.", normal_style))
-
-    section_style = ParagraphStyle(
-        'Section',
-        parent=styles['Heading2'],
-        fontSize=13,
-        textColor=HexColor('#1f2937'),
-        spaceBefore=12,
-        spaceAfter=6,
-        fontName=font_name_bold
-    )
-
-    bullet_style = ParagraphStyle(
-        'Bullet',
-        parent=styles['Normal'],
-        fontSize=10,
-        leftIndent=20,
-        spaceAfter=4,
-        fontName=font_name
-    )
-
-    paragraphs = [p.strip() for p in UNRELIABILITY_TEXT.split("\n") if p.strip()]
-
-    for p in paragraphs:
-        if p[0].isdigit() and '.' in p[:3]:
-            story.append(Paragraph(p, section_style))
-        elif p.startswith('Реклама'):
-            story.append(Paragraph(p, normal_style))
-        else:
-            story.append(Paragraph(p, bullet_style))
-
-    # Заключительная информация
-    story.append(Spacer(1, 30))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_CENTER,
-        textColor=HexColor('#6b7280'),
-        fontName=font_name
-    )
-
-    story.append(Paragraph("Результаты проверки носят рекомендательный характер", footer_style))
-    story.append(Paragraph(f"Отчет сгенерирован: {datetime.now().strftime('%d.%m.%Y в %H:%M')}", footer_style))
-    
-    # Примечание
-    if report_data.get('footer_note'):
+            ),
+            "section": ParagraphStyle(
+                'Section',
+                parent=styles['Heading2'],
+                fontSize=13,
+                textColor=HexColor('#1f2937'),
+                spaceBefore=12,
+                spaceAfter=6,
+                fontName=font_name_bold
+            ),
+            "bullet": ParagraphStyle(
+                'Bullet',
+                parent=styles['Normal'],
+                fontSize=10,
+                leftIndent=20,
+                spaceAfter=4,
+                fontName=font_name
+            ),
+            "footer": ParagraphStyle(
+                'Footer',
+                parent=styles['Normal'],
+                fontSize=8,
+                alignment=TA_CENTER,
+                textColor=HexColor('#6b7280'),
+                fontName=font_name
+            ),
+        }
+
+    def _appendix_story(self) -> list:
+        """Приложение «Признаки недостоверной рекламы» (UNRELIABILITY_TEXT)"""
+        styles = self.styles
+        story = [
+            # Недостоверность рекламы
+            Paragraph("Признаки недостоверной рекламы", styles["title"]),
+            Spacer(1, 5),
+            Paragraph("Если в рекламе хоть что-то из перечисленного ниже не соответствует правде — это недостоверная "
+                      "реклама, то есть обман.", styles["normal"]),
+        ]
+
+        paragraphs = [p.strip() for p in UNRELIABILITY_TEXT.split("\n") if p.strip()]
+        for p in paragraphs:
+            if p[0].isdigit() and '.' in p[:3]:
+                story.append(Paragraph(p, styles["section"]))
+            elif p.startswith('Реклама'):
+                story.append(Paragraph(p, styles["normal"]))
+            else:
+                story.append(Paragraph(p, styles["bullet"]))
+        return story
+
+    def render(self, report_data: dict) -> bytes:
+        """
+        Генерирует PDF отчет на основе данных проверки рекламы.
+        """
+        styles = self.styles
+        title_style = styles["title"]
+        heading_style = styles["heading"]
+        normal_style = styles["normal"]
+
+        # Создаем буфер для PDF
+        buffer = BytesIO()
+
+        # Создаем документ
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=PAGE_MARGIN,
+            leftMargin=PAGE_MARGIN,
+            topMargin=PAGE_MARGIN,
+            bottomMargin=PAGE_MARGIN
+        )
+
+        # Элементы документа
+        story = []
+
+        # Заголовок
+        story.append(Paragraph("Отчет о проверке рекламы", title_style))
+
+        story.append(Paragraph("Legal ADvice не проверяет рекламу на недостоверность. Предлагаем Вам ознакомиться "
+                               "с критериями оценки самостоятельно в конце отчёта", normal_style))
+
+        # Информация о проверке
+        story.append(Paragraph("Информация о проверке", heading_style))
+
+        info_data = [
+            [Paragraph('<b>Дата проверки:</b>', normal_style),
+             Paragraph(report_data.get('check_date_formatted', 'Не указана'), normal_style)],
+
+            [Paragraph('<b>Закон:</b>', normal_style),
+             Paragraph(report_data.get('law_name', 'Не указан'), normal_style)],
+
+            [Paragraph('<b>Статус:</b>', normal_style),
+             Paragraph(
+                 'Проверка не завершена: результат неполный' if report_data.get('partial')
+                 else 'Соответствует законодательству' if report_data.get('is_ok')
+                 else 'Не соответствует законодательству',
+                 normal_style
+             )]
+        ]
+
+        info_table = Table(
+            info_data,
+            colWidths=[2 * inch, 4 * inch]  # обязательно задаем ширину столбцов
+        )
+        info_table.setStyle(self.info_table_style)
+
+        story.append(info_table)
         story.append(Spacer(1, 10))
-        story.append(Paragraph(report_data.get('footer_note'), footer_style))
-    
-    # Генерируем PDF
-    doc.build(story)
-    
-    # Получаем байты
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_bytes
+
+        # Результат проверки
+        story.append(Paragraph("Результат проверки", heading_style))
+
+        # Индикаторы (флаги)
+        flags = report_data.get('flags', [])
+        for flag in flags:
+            flag_text = flag.get('text', '')
+            if flag.get('type') == 'ok':
+                story.append(Paragraph(f"✓ {flag_text}", normal_style))
+            else:
+                story.append(Paragraph(f"⚠ {flag_text}", normal_style))
+
+        # Нарушения (если есть)
+        violations = report_data.get('violations', [])
+        if violations:
+            story.append(Paragraph("Выявленные нарушения из Федерального закона «О рекламе»", heading_style))
+
+            for i, violation in enumerate(violations, 1):
+                # Заголовок нарушения
+                story.append(Paragraph(violation.get('title', f'Нарушение {i}'), styles["violation_title"]))
+
+                # Текст нарушения
+                violation_text = violation.get('text', 'Описание недоступно')
+                story.append(Paragraph(violation_text, normal_style))
+
+                # Рекомендации по исправлению
+                if violation.get('fix'):
+                    story.append(Paragraph("<b>Рекомендации по исправлению:</b>", normal_style))
+                    story.append(Paragraph(violation.get('fix'), normal_style))
+
+                story.append(Spacer(1, 12))
+
+        # Судебная практика (если есть)
+        cases = report_data.get('cases', [])
+        if cases:
+            story.append(Paragraph("Релевантная судебная практика", heading_style))
+
+            for case in cases:
+                story.append(Paragraph(case.get('title', 'Судебное дело'), styles["case_title"]))
+                story.append(Paragraph(case.get('text', 'Описание недоступно'), normal_style))
+                story.append(Spacer(1, 10))
+
+        # Приложение о недостоверной рекламе — готовые страницы, каждая с новой страницы.
+        # Раньше приложение продолжало последнюю страницу отчёта; теперь оно всегда
+        # начинается с новой, и отчёт бывает на страницу длиннее (0 нарушений — 3 страницы
+        # вместо 2, 10 нарушений — 7 вместо 6): намеренное изменение вёрстки ради раскладки один раз
+        for page in self.appendix_pages:
+            story.append(PageBreak())
+            story.append(page)
+
+        # Заключительная информация
+        story.append(Spacer(1, 30))
+        footer_style = styles["footer"]
+
+        story.append(Paragraph("Результаты проверки носят рекомендательный характер", footer_style))
+        story.append(Paragraph(f"Отчет сгенерирован: {datetime.now().strftime('%d.%m.%Y в %H:%M')}", footer_style))
+
+        # Примечание
+        if report_data.get('footer_note'):
+            story.append(Spacer(1, 10))
+            story.append(Paragraph(report_data.get('footer_note'), footer_style))
+
+        # Генерируем PDF
+        doc.build(story)
+
+        # Получаем байты
+        pdf_bytes = buffer.getvalue()
+        buffer.close()
+
+        return pdf_bytes
+
+
+@lru_cache(maxsize=1)
+def get_renderer() -> PdfReportRenderer:
+    """Рендер PDF-отчётов, один на процесс: шрифты и стили готовы к первому отчёту"""
+    return PdfReportRenderer()
+
+
+def generate_pdf_report(report_data: dict) -> bytes:
+    """
+    Генерирует PDF отчет на основе данных проверки рекламы.
+    """
+    return get_renderer().render(report_data)
@@ -0,0 +1,164 @@
+"""
+Квоты и лимит частоты проверок на аккаунт.
+Счётчики живут в Redis, проверка и списание — один Lua-скрипт, то есть
+одна атомарная операция и один запрос к Redis на проверку, общие для
+всех процессов uvicorn. Окна: календарный месяц (UTC) и минута.
+Рядом со счётчиками хранится подписка аккаунта с её месячным лимитом —
+тоже общая для всех процессов.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from ..settings import settings
+from ..workers.queue import redis
+
+
+# KEYS: месячный счётчик, минутный счётчик
+# ARGV: лимит в месяц (0 — без лимита), лимит в минуту (0 — без лимита), TTL месяца, TTL минуты, n
+# Возвращает {допущено (1/0), причина отказа, использовано за месяц, за минуту}
+_CONSUME_LUA = """
+local month = tonumber(redis.call('GET', KEYS[1]) or '0')
+local minute = tonumber(redis.call('GET', KEYS[2]) or '0')
+local month_limit = tonumber(ARGV[1])
+local minute_limit = tonumber(ARGV[2])
+local n = tonumber(ARGV[5])
+if month_limit > 0 and month + n > month_limit then
+    return {0, 'month', month, minute}
+end
+if minute_limit > 0 and minute + n > minute_limit then
+    return {0, 'minute', month, minute}
+end
+month = redis.call('INCRBY', KEYS[1], n)
+if month == n then redis.call('EXPIRE', KEYS[1], ARGV[3]) end
+-- Без минутного лимита (пакеты) минутное окно не трогаем — иначе пакет заблокирует интерактивные проверки
+if minute_limit > 0 then
+    minute = redis.call('INCRBY', KEYS[2], n)
+    if minute == n then redis.call('EXPIRE', KEYS[2], ARGV[4]) end
+end
+return {1, '', month, minute}
+"""
+_consume_script = redis.register_script(_CONSUME_LUA)
+
+# KEYS: счётчики окон, в которых проверки были списаны; ARGV: n
+# Окно могло уже истечь — тогда возвращать некуда: новый счётчик с минусом и без TTL
+# навсегда добавил бы аккаунту квоты. Ниже нуля счётчик не опускаем.
+_REFUND_LUA = """
+for _, key in ipairs(KEYS) do
+    local used = tonumber(redis.call('GET', key) or '0')
+    if used > 0 then
+        redis.call('DECRBY', key, math.min(used, tonumber(ARGV[1])))
+    end
+end
+"""
+_refund_script = redis.register_script(_REFUND_LUA)
+
+
+def _month_key(account_id: int, now: datetime) -> str:
+    return f"quota:{account_id}:month:{now:%Y-%m}"
+
+
+def _minute_key(account_id: int, now: datetime) -> str:
+    return f"quota:{account_id}:minute:{now:%Y-%m-%dT%H:%M}"
+
+
+def _subscription_key(account_id: int) -> str:
+    return f"quota:{account_id}:subscription"
+
+
+def _seconds_to_next_month(now: datetime) -> int:
+    if now.month == 12:
+        next_month = now.replace(year=now.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    else:
+        next_month = now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((next_month - now).total_seconds()))
+
+
+def consume_quota(account_id: int, month_limit: Optional[int], n: int = 1,
+                  per_minute: Optional[int] = None) -> Dict:
+    """
+    Атомарно проверить лимиты и списать n проверок.
+    month_limit — месячная квота аккаунта (None или 0 — без лимита);
+    per_minute — лимит в минуту, по умолчанию CHECKS_PER_MINUTE (0 — без лимита).
+    Возвращает {"allowed", "reason" ("month" | "minute" | None), "used_month",
+    "used_minute", "retry_after"}. Без Redis проверка пропускается.
+    """
+    now = datetime.now(timezone.utc)
+    seconds_to_month_end = _seconds_to_next_month(now)
+    minute_limit = settings.CHECKS_PER_MINUTE if per_minute is None else per_minute
+    try:
+        allowed, reason, used_month, used_minute = _consume_script(
+            keys=[_month_key(account_id, now), _minute_key(account_id, now)],
+            args=[month_limit or 0, minute_limit, seconds_to_month_end + 86400, 120, n],
+        )
+    except RedisError as e:
+        print(f"  ⚠️ Квоты не проверены, Redis недоступен: {e}")
+        return {"allowed": True, "reason": None, "used_month": None, "used_minute": None, "retry_after": None}
+
+    reason = reason.decode() if isinstance(reason, bytes) else reason
+    retry_after = None
+    if reason == "month":
+        retry_after = seconds_to_month_end
+    elif reason == "minute":
+        retry_after = 60 - now.second
+    return {
+        "allowed": bool(allowed),
+        "reason": reason or None,
+        "used_month": used_month,
+        "used_minute": used_minute,
+        "retry_after": retry_after,
+    }
+
+
+def refund_quota(account_id: int, n: int = 1, minute: bool = True,
+                 charged_at: Optional[float] = None) -> None:
+    """
+    Вернуть списанные проверки (задача так и не попала в очередь).
+    minute=False — списание было без минутного лимита (пакеты), минутное окно не трогаем;
+    charged_at — когда проверки были списаны (unix time), по умолчанию — только что.
+    """
+    charged = datetime.fromtimestamp(charged_at, timezone.utc) if charged_at else datetime.now(timezone.utc)
+    keys = [_month_key(account_id, charged)]
+    if minute:
+        keys.append(_minute_key(account_id, charged))
+    try:
+        _refund_script(keys=keys, args=[n])
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось вернуть квоту: {e}")
+
+
+def get_used_this_month(account_id: int) -> int:
+    """Сколько проверок аккаунт использовал в текущем месяце"""
+    try:
+        return int(redis.get(_month_key(account_id, datetime.now(timezone.utc))) or 0)
+    except RedisError:
+        return 0
+
+
+def reset_month(account_id: int) -> None:
+    """Обнулить месячный счётчик (новая подписка)"""
+    try:
+        redis.delete(_month_key(account_id, datetime.now(timezone.utc)))
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось обнулить квоту: {e}")
+
+
+def save_subscription(account_id: int, subscription: Dict) -> None:
+    """Сохранить подписку аккаунта (тариф и месячный лимит) — для всех процессов"""
+    redis.set(_subscription_key(account_id), json.dumps(subscription, ensure_ascii=False))
+
+
+def load_subscription(account_id: int) -> Optional[Dict]:
+    """Подписка аккаунта или None (нет подписки или Redis недоступен)"""
+    try:
+        raw = redis.get(_subscription_key(account_id))
+    except RedisError:
+        return None
+    return json.loads(raw) if raw else None
+
+
+def delete_subscription(account_id: int) -> None:
+    """Отключить подписку аккаунта"""
+    redis.delete(_subscription_key(account_id))
@@ -0,0 +1,146 @@
+"""
+Выгрузка PDF-отчётов архивом ZIP — за пакет или за период.
+Архив отдаётся потоком по мере сборки: записи читаются из Redis порциями,
+готовые отчёты берутся из Redis (workers/reports.py), недостающие
+рендерятся в пуле процессов — не больше EXPORT_WINDOW отчётов в работе.
+Память не зависит от числа отчётов: в ней только окно отчётов и
+центральный каталог ZIP (около сотни байт на файл).
+"""
+import asyncio
+import json
+import re
+import zipfile
+from collections import deque
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+
+from ..settings import settings
+from ..workers.batch import results_key
+from ..workers.reports import REPORT_INDEX_KEY, pdf_key, report_key, render_pdf_on_demand
+from .check_submission import async_redis
+
+
+EXPORT_CHUNK = 200  # строк пакета или записей индекса за один запрос к Redis
+EXPORT_WINDOW = 2 * settings.PDF_RENDER_PROCESSES  # отчётов в работе одновременно
+
+
+class _ZipSink:
+    """Поток для zipfile без seek: копит записанное до следующей отдачи клиенту"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _safe_name(value) -> str:
+    """Фрагмент имени файла в архиве из произвольного ID"""
+    return re.sub(r"[^\w.-]+", "_", str(value))[:60]
+
+
+async def batch_report_entries(batch_id: str) -> AsyncIterator[Dict]:
+    """
+    Отчёты завершённых проверок пакета: {"name", "lookup", "report_id", "report"}.
+    Сначала ищется отчёт задачи проверки, затем — отчёт проверки пакета;
+    если нет ни того, ни другого, он рендерится из результата в строке пакета.
+    """
+    cursor = 0
+    while lines := await async_redis.lrange(results_key(batch_id), cursor, cursor + EXPORT_CHUNK - 1):
+        cursor += len(lines)
+        for raw in lines:
+            line = json.loads(raw)
+            if line.get("status") != "completed":
+                continue
+            report_id = f"{batch_id}-{line['index']}"
+            suffix = f"_{_safe_name(line['id'])}" if line.get("id") not in (None, "") else ""
+            yield {
+                "name": f"{line['index'] + 1:05d}{suffix}.pdf",
+                "lookup": [job_id for job_id in (line.get("job_id"), report_id) if job_id],
+                "report_id": report_id,
+                "report": line.get("result"),
+            }
+
+
+async def period_report_entries(date_from: Optional[date], date_to: Optional[date]) -> AsyncIterator[Dict]:
+    """
+    Отчёты проверок, завершённых с date_from по date_to включительно (индекс REPORT_INDEX_KEY,
+    за REPORT_PDF_TTL) — в том числе проверок пакета, чей PDF не рендерился заранее
+    """
+    low = datetime.combine(date_from, time.min).timestamp() if date_from else "-inf"
+    high = f"({datetime.combine(date_to + timedelta(days=1), time.min).timestamp()}" if date_to else "+inf"
+    offset = 0
+    while members := await async_redis.zrangebyscore(
+        REPORT_INDEX_KEY, low, high, start=offset, num=EXPORT_CHUNK, withscores=True,
+    ):
+        offset += len(members)
+        for member, score in members:
+            report_id = member.decode()
+            stamp = datetime.fromtimestamp(score).strftime("%Y-%m-%d_%H-%M-%S")
+            yield {
+                "name": f"{stamp}_{_safe_name(report_id)}.pdf",
+                "lookup": [report_id],
+                "report_id": report_id,
+                "report": None,
+            }
+
+
+async def _load_pdf(entry: Dict) -> Optional[bytes]:
+    """
+    PDF записи: готовый из Redis или отрендеренный в пуле — по результату из записи
+    или сохранённому при завершении проверки; None — отчёта нет и не из чего сделать
+    """
+    for report_id in entry["lookup"]:
+        pdf_bytes = await async_redis.hget(pdf_key(report_id), "pdf")
+        if pdf_bytes is not None:
+            return pdf_bytes
+    report = entry["report"]
+    if report is None:
+        raw = await async_redis.get(report_key(entry["report_id"]))
+        if raw is None:
+            return None
+        report = json.loads(raw)
+    pdf_bytes, _ = await render_pdf_on_demand(entry["report_id"], report)
+    return pdf_bytes
+
+
+async def stream_reports_zip(entries: AsyncIterator[Dict]) -> AsyncIterator[bytes]:
+    """ZIP с PDF-отчётами записей entries — потоком, файл за файлом в порядке записей"""
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)  # PDF уже сжат
+    pending = deque()  # (имя файла, загрузка PDF) — окно из EXPORT_WINDOW отчётов
+    written = 0
+
+    async def flush_one() -> bytes:
+        nonlocal written
+        name, task = pending.popleft()
+        pdf_bytes = await task
+        if pdf_bytes is not None:
+            archive.writestr(name, pdf_bytes)
+            written += 1
+        return sink.drain()
+
+    try:
+        async for entry in entries:
+            pending.append((entry["name"], asyncio.ensure_future(_load_pdf(entry))))
+            if len(pending) >= EXPORT_WINDOW and (data := await flush_one()):
+                yield data
+        while pending:
+            if data := await flush_one():
+                yield data
+        archive.close()
+        yield sink.drain()
+        print(f"🗜️ Выгрузка отчётов: {written} PDF в архиве")
+    finally:
+        # Клиент оборвал загрузку — незачем дорендеривать оставшееся окно
+        for _, task in pending:
+            task.cancel()
@@ -0,0 +1,61 @@
+"""
+Кэш HTML страниц отчётов о проверке.
+Отчёт завершённой проверки больше не меняется, а открывают его часто —
+по ссылке делятся. Готовая страница хранится в Redis по ID задачи и версии
+шаблонов (хэш всех шаблонов + адрес сайта, от которого зависят ссылки url_for),
+с сильным ETag: повторный просмотр — одно чтение из Redis или 304.
+"""
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+from ..settings import settings
+from ..workers.queue import redis
+
+
+TEMPLATES_DIR = Path("backend/app/templates")
+
+
+@lru_cache(maxsize=1)
+def templates_hash() -> str:
+    """Хэш всех шаблонов — считается один раз на процесс (шаблоны меняются только с выкладкой)"""
+    digest = hashlib.sha256()
+    for path in sorted(TEMPLATES_DIR.rglob("*.html")):
+        digest.update(str(path.relative_to(TEMPLATES_DIR)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def page_version(base_url: str) -> str:
+    """Версия страницы: шаблоны и адрес сайта"""
+    return hashlib.sha256(f"{templates_hash()}:{base_url}".encode()).hexdigest()[:16]
+
+
+def page_key(job_id: str, version: str) -> str:
+    """Готовая страница отчёта (hash: html, etag)"""
+    return f"checks:html:{version}:{job_id}"
+
+
+def get_page_etag(job_id: str, version: str) -> Optional[str]:
+    """ETag готовой страницы (для If-None-Match — без чтения HTML)"""
+    etag = redis.hget(page_key(job_id, version), "etag")
+    return etag.decode() if etag else None
+
+
+def get_page(job_id: str, version: str) -> Optional[Tuple[bytes, str]]:
+    """Готовая страница: (HTML, ETag) или None"""
+    html, etag = redis.hmget(page_key(job_id, version), "html", "etag")
+    if html is None or etag is None:
+        return None
+    return html, etag.decode()
+
+
+def store_page(job_id: str, version: str, html: bytes) -> str:
+    """Сохранить страницу на REPORT_HTML_TTL; возвращает её сильный ETag (хэш содержимого)"""
+    etag = '"' + hashlib.sha256(html).hexdigest()[:32] + '"'
+    pipe = redis.pipeline()
+    pipe.hset(page_key(job_id, version), mapping={"html": html, "etag": etag})
+    pipe.expire(page_key(job_id, version), settings.REPORT_HTML_TTL)
+    pipe.execute()
+    return etag
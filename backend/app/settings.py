@@ -9,6 +9,30 @@ class Settings(BaseSettings):
     S3_ENDPOINT: str | None = None
     S3_BUCKET: str | None = None
     BASE_URL: str = "http://localhost:8000"
+    LAW_ARCHIVE_DIR: str = "data/law_archive"  # архив сырых страниц закона
+    LAW_SNAPSHOT_PATH: str = "backend/app/data/law_snapshot.jsonl.gz"  # снапшот закона для быстрого старта
+    # Размеры пулов воркеров по классам очередей
+    WORKERS_INTERACTIVE: int = 2
+    WORKERS_BULK: int = 1
+    WORKERS_MAINTENANCE: int = 1
+    ASYNC_WORKER_CONCURRENCY: int = 20  # проверок одновременно в воркере с --async
+    CHECK_WAIT_BUDGET_SECONDS: int = 120  # дольше в очереди ждать нельзя — отвечаем 429
+    CHECK_DEADLINE_SECONDS: int = 240  # срок всей проверки от постановки в очередь (ожидание + ASR + LLM + отчёт)
+    # Лимиты проверок на аккаунт (0 — без лимита); с подпиской месячный лимит берётся из неё
+    CHECKS_FREE_MONTH: int = 0
+    CHECKS_PER_MINUTE: int = 10
+    CHECK_RESULT_CACHE_TTL: int = 24 * 60 * 60  # сколько хранится результат проверки того же текста
+    CHECK_MAX_WAIT_SECONDS: int = 60  # максимум wait в POST /api/v2/check
+    BATCH_MAX_ITEMS: int = 1000  # проверок в одном пакете (POST /api/v2/batch)
+    STATUS_BATCH_MAX_JOBS: int = 1000  # задач в одном POST /api/v2/check/status:batch
+    # Вебхуки о завершении проверок: таймаут запроса, число повторов и первая задержка (дальше x3)
+    WEBHOOK_TIMEOUT_SECONDS: int = 10
+    WEBHOOK_MAX_RETRIES: int = 5
+    WEBHOOK_RETRY_BASE_SECONDS: int = 10
+    WEBHOOK_ALLOW_PRIVATE_HOSTS: bool = False  # вебхуки во внутреннюю сеть (только для разработки)
+    REPORT_PDF_TTL: int = 7 * 24 * 60 * 60  # сколько хранится готовый PDF-отчёт проверки
+    PDF_RENDER_PROCESSES: int = 2  # процессов веб-сервера для PDF, которого ещё нет в Redis
+    REPORT_HTML_TTL: int = 7 * 24 * 60 * 60  # сколько хранится готовая HTML-страница отчёта
 
 
 settings = Settings() # читает .env
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+Асинхронный воркер проверок.
+Проверка почти всё время ждёт ответа ASR и LLM, поэтому один процесс
+выполняет до ASYNC_WORKER_CONCURRENCY проверок одновременно корутинами,
+а не по одной задаче на форк. Статусы, результаты и ошибки пишутся
+штатными методами RQ — web.py читает их через Job.fetch как обычно.
+Отменённая проверка (cancellation.py) прерывается отменой корутины —
+вместе с её запросами к ASR и LLM.
+
+Запуск: python -m backend.app.workers.worker interactive --async
+"""
+import asyncio
+import signal
+import sys
+import traceback
+from typing import Dict, List, Optional, Set, Tuple
+
+from redis.asyncio import Redis as AsyncRedis
+from rq import Queue, Worker
+from rq.exceptions import DequeueTimeout
+from rq.job import Job
+from rq.utils import utcnow
+
+from .queue import redis, process_ad_check_task_async
+from .cancellation import CANCEL_CHANNEL, CheckCancelled, is_cancelled
+from ..settings import settings
+
+
+# Задачи, у которых есть корутинный вариант; остальные выполняются в отдельном потоке
+ASYNC_TASKS = {
+    "backend.app.workers.queue.process_ad_check_task": process_ad_check_task_async,
+}
+
+DEQUEUE_TIMEOUT = 5  # секунд ожидания новой задачи (BLPOP)
+
+
+class AsyncCheckWorker:
+    """Берёт задачи из очередей RQ и выполняет до concurrency штук одновременно"""
+
+    def __init__(self, queues: List[Queue], concurrency: int):
+        self.queues = queues
+        self.concurrency = concurrency
+        # Обычный RQ Worker — только для учёта: регистрация, heartbeat, реестры и результаты задач
+        self.worker = Worker(queues, connection=redis)
+        self.running: Dict[asyncio.Task, Job] = {}
+        self.performing: Dict[str, asyncio.Future] = {}  # ID задачи → корутина проверки
+        self.cancel_requested: Set[str] = set()
+        self.stopping = False
+
+    def stop(self) -> None:
+        """Перестать брать новые задачи, дождаться выполняющихся"""
+        if not self.stopping:
+            print(f"🛑 Останавливаемся, дожидаемся {len(self.running)} проверок...")
+        self.stopping = True
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        self.worker.register_birth()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        cancellations = asyncio.create_task(self._listen_cancellations())
+        slots = asyncio.Semaphore(self.concurrency)
+        print(f"🚀 Асинхронный воркер {self.worker.name}: до {self.concurrency} проверок одновременно")
+
+        try:
+            while not self.stopping:
+                await slots.acquire()
+                dequeued = await asyncio.to_thread(self._dequeue)
+                if dequeued is None:
+                    slots.release()
+                    continue
+
+                job, queue = dequeued
+                task = asyncio.create_task(self._run_job(job, queue))
+                self.running[task] = job
+
+                def on_done(t: asyncio.Task) -> None:
+                    self.running.pop(t, None)
+                    slots.release()
+
+                task.add_done_callback(on_done)
+
+            if self.running:
+                await asyncio.gather(*self.running, return_exceptions=True)
+        finally:
+            heartbeat.cancel()
+            cancellations.cancel()
+            self.worker.register_death()
+
+    def _dequeue(self) -> Optional[Tuple[Job, Queue]]:
+        """Следующая задача по приоритету очередей или None, если за DEQUEUE_TIMEOUT ничего не пришло"""
+        try:
+            return Queue.dequeue_any(self.queues, DEQUEUE_TIMEOUT, connection=redis)
+        except DequeueTimeout:
+            return None
+
+    async def _heartbeat(self) -> None:
+        """Продлеваем жизнь воркера и выполняющихся задач, иначе RQ сочтёт их брошенными"""
+        interval = self.worker.job_monitoring_interval
+        while True:
+            await asyncio.sleep(interval)
+            with redis.pipeline() as pipeline:
+                self.worker.heartbeat(interval + 60, pipeline=pipeline)
+                for job in list(self.running.values()):
+                    job.heartbeat(utcnow(), self.worker.get_heartbeat_ttl(job), pipeline=pipeline, xx=True)
+                pipeline.execute()
+
+    async def _listen_cancellations(self) -> None:
+        """Сигналы отмены: прерываем корутину проверки, если она выполняется здесь"""
+        connection = AsyncRedis.from_url(settings.REDIS_URL)
+        pubsub = connection.pubsub()
+        await pubsub.subscribe(CANCEL_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                job_id = message["data"].decode()
+                perform = self.performing.get(job_id)
+                if perform is not None:
+                    self.cancel_requested.add(job_id)
+                    perform.cancel()
+        finally:
+            await pubsub.aclose()
+            await connection.aclose()
+
+    async def _perform(self, job: Job):
+        coroutine_func = ASYNC_TASKS.get(job.func_name)
+        if coroutine_func:
+            return await coroutine_func(*job.args, **job.kwargs)
+        return await asyncio.to_thread(job.func, *job.args, **job.kwargs)
+
+    async def _run_job(self, job: Job, queue: Queue) -> None:
+        """Выполнить задачу с её таймаутом и записать результат так же, как это делает RQ Worker"""
+        started_job_registry = queue.started_job_registry
+        self.worker.prepare_job_execution(job, remove_from_intermediate_queue=len(self.queues) == 1)
+        job.started_at = utcnow()
+        timeout = job.timeout or Queue.DEFAULT_TIMEOUT
+
+        try:
+            if is_cancelled(job.id):
+                raise CheckCancelled(f"Проверка {job.id} отменена до начала")
+            perform = asyncio.ensure_future(self._perform(job))
+            self.performing[job.id] = perform
+            try:
+                rv = await asyncio.wait_for(perform, None if timeout == -1 else timeout)
+            except asyncio.CancelledError:
+                if job.id not in self.cancel_requested:
+                    raise
+                raise CheckCancelled(f"Проверка {job.id} отменена")
+            finally:
+                self.performing.pop(job.id, None)
+                self.cancel_requested.discard(job.id)
+            job.ended_at = utcnow()
+            job._result = rv
+            job.execute_success_callback(self.worker.death_penalty_class, rv)
+            self.worker.handle_job_success(job=job, queue=queue, started_job_registry=started_job_registry)
+            print(f"✅ Задача {job.id} выполнена")
+        except Exception:
+            job.ended_at = utcnow()
+            exc_info = sys.exc_info()
+            exc_string = "".join(traceback.format_exception(*exc_info))
+            try:
+                job.execute_failure_callback(self.worker.death_penalty_class, *exc_info)
+            except Exception:
+                exc_string = traceback.format_exc()
+            self.worker.handle_job_failure(
+                job=job, exc_string=exc_string, queue=queue, started_job_registry=started_job_registry
+            )
+            print(f"❌ Задача {job.id} завершилась ошибкой: {exc_info[1]!r}")
+
+
+def run_async_worker(queues: List[Queue], concurrency: int) -> None:
+    """Точка входа для worker.py --async"""
+    asyncio.run(AsyncCheckWorker(queues, concurrency).run())
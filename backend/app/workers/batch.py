@@ -0,0 +1,337 @@
+"""
+Массовые проверки (пакеты) через RQ (очередь "checks-bulk").
+
+Родительская задача пакета раздаёт проверки: результат из кэша пишется
+сразу, такая же проверка в работе — присоединяемся к ней, остальные
+ставятся дочерними задачами в массовую очередь одной пачкой; короткие
+объявления — групповыми задачами, по запросу к LLM на группу.
+Завершение дочерней задачи (callback, см. check_events.py) дописывает
+строку результата в пакет — клиент читает их потоком JSONL.
+"""
+import json
+import time
+from typing import Dict, List, Optional
+
+from rq import Callback, Queue
+from rq.job import Job
+
+from ..settings import settings
+from .queue import redis, bulk_queue, process_ad_check_task, process_ad_check_group_task
+from .check_events import on_check_success, on_check_failure
+
+
+BATCH_TTL = 7 * 24 * 60 * 60  # сколько хранятся пакет и его результаты
+FANOUT_CHUNK = 200  # проверок за один проход родительской задачи (пачка enqueue_many)
+# Запасной предел RQ для дочерних и групповых задач: срок проверки отсчитывается от их начала
+CHILD_JOB_TIMEOUT = settings.CHECK_DEADLINE_SECONDS + 60
+
+
+def batch_key(batch_id: str) -> str:
+    """Сводка пакета (hash): статус, счётчики, аккаунт"""
+    return f"batch:{batch_id}"
+
+
+def items_key(batch_id: str) -> str:
+    """Проверки пакета (list JSON): {"id", "text"}"""
+    return f"batch:{batch_id}:items"
+
+
+def done_key(batch_id: str) -> str:
+    """Номера проверок с записанным результатом (hash) — защита от повторной записи"""
+    return f"batch:{batch_id}:done"
+
+
+def results_key(batch_id: str) -> str:
+    """Строки результатов JSONL в порядке завершения (list)"""
+    return f"batch:{batch_id}:results"
+
+
+def jobs_key(batch_id: str) -> str:
+    """Какая задача RQ отвечает за проверку пакета (hash номер → ID задачи) — для sweep_batch"""
+    return f"batch:{batch_id}:jobs"
+
+
+def progress_channel(batch_id: str) -> str:
+    """Канал pub/sub: в пакете появились новые результаты"""
+    return f"batch:{batch_id}:progress"
+
+
+def job_batches_key(job_id: str) -> str:
+    """Какие пакеты ждут задачу (set "batch_id:номер")"""
+    return f"checks:batches:{job_id}"
+
+
+def record_batch_item(batch_id: str, index: int, line: Dict) -> None:
+    """Записать результат проверки index пакета (один раз) и разбудить читателей"""
+    if not redis.hsetnx(done_key(batch_id), index, 1):
+        return
+
+    pipe = redis.pipeline()
+    pipe.rpush(results_key(batch_id), json.dumps(line, ensure_ascii=False, default=str))
+    pipe.hincrby(batch_key(batch_id), "done", 1)
+    pipe.hincrby(batch_key(batch_id), "failed", 1 if line["status"] == "failed" else 0)
+    pipe.hget(batch_key(batch_id), "total")
+    pipe.expire(done_key(batch_id), BATCH_TTL)
+    pipe.expire(results_key(batch_id), BATCH_TTL)
+    _, done, _, total, _, _ = pipe.execute()
+
+    if total is not None and done >= int(total):
+        redis.hset(batch_key(batch_id), mapping={"status": "finished", "finished_at": time.time()})
+    redis.publish(progress_channel(batch_id), done)
+
+
+def record_job_outcome(job_id: str, outcome: Dict) -> None:
+    """Задача проверки завершилась — записать её итог во все пакеты, которые её ждут"""
+    for member in redis.smembers(job_batches_key(job_id)):
+        batch_id, index = member.decode().rsplit(":", 1)
+        ref = redis.lindex(items_key(batch_id), int(index))
+        item = json.loads(ref) if ref else {}
+        record_batch_item(batch_id, int(index), {
+            "index": int(index), "id": item.get("id"), "job_id": job_id, "cached": False, **outcome,
+        })
+
+
+def run_batch(batch_id: str, account_id: int) -> Dict:
+    """
+    Родительская задача пакета: раздать проверки.
+    Короткие объявления собираются в групповые задачи — LLM получает их
+    пакетами (ml.classifiers.analyze_texts); остальные идут по одной.
+    Квота списана при приёме пакета за все проверки — за взятые из кэша
+    и присоединённые к уже идущим она возвращается.
+    """
+    from ml.classifiers import LLM_BATCH_MAX_AD_CHARS, plan_batches
+    from ..services.check_submission import job_outcome
+    from ..services.dedup import (
+        content_digest, content_key, result_key, claim_check, inflight_job,
+    )
+    from ..services.quota import refund_quota
+
+    redis.hset(batch_key(batch_id), "status", "running")
+    raw_items = redis.lrange(items_key(batch_id), 0, -1)
+    counts = {"cached": 0, "attached": 0, "queued": 0}
+    own_jobs: Dict[str, str] = {}  # одинаковые тексты внутри пакета — одна задача
+    grouped: Dict[str, Dict] = {}  # короткие объявления для групповых задач: текст → номера в пакете
+
+    for start in range(0, len(raw_items), FANOUT_CHUNK):
+        chunk = [json.loads(raw) for raw in raw_items[start:start + FANOUT_CHUNK]]
+        cached_results = redis.mget([result_key(item["text"], None, None) for item in chunk])
+
+        to_enqueue = []
+        waiting: Dict[int, str] = {}  # номер проверки → ID задачи
+        attached: List[int] = []
+        for offset, (item, cached) in enumerate(zip(chunk, cached_results)):
+            index = start + offset
+            if cached:
+                counts["cached"] += 1
+                record_batch_item(batch_id, index, {
+                    "index": index, "id": item.get("id"), "job_id": None, "cached": True,
+                    "status": "completed", "result": json.loads(cached),
+                })
+                continue
+
+            digest = content_digest(item["text"], None, None)
+            if digest in own_jobs or digest in grouped:
+                counts["attached"] += 1
+                if digest in grouped:
+                    grouped[digest]["indexes"].append(index)
+                else:
+                    waiting[index] = own_jobs[digest]
+                    attached.append(index)
+                continue
+
+            key = content_key(item["text"], None, None)
+            if len(item["text"]) <= LLM_BATCH_MAX_AD_CHARS:
+                existing_job_id = inflight_job(key)
+                if not existing_job_id:
+                    counts["queued"] += 1
+                    grouped[digest] = {"text": item["text"], "indexes": [index]}
+                    continue
+            else:
+                existing_job_id = claim_check(key, f"{batch_id}-{index}")
+
+            if existing_job_id:
+                counts["attached"] += 1
+                attached.append(index)
+                job_id = existing_job_id
+            else:
+                counts["queued"] += 1
+                job_id = f"{batch_id}-{index}"
+                to_enqueue.append(Queue.prepare_data(
+                    process_ad_check_task, (item["text"], None, None),
+                    job_id=job_id,
+                    description=f"batch {batch_id}: #{index}",
+                    timeout=CHILD_JOB_TIMEOUT,
+                    meta={"batch_id": batch_id},
+                    on_success=Callback(on_check_success),
+                    on_failure=Callback(on_check_failure),
+                ))
+            own_jobs[digest] = job_id
+            waiting[index] = job_id
+
+        # Сначала подписываем пакет на задачи, потом ставим их — быстрая задача не потеряет результат
+        pipe = redis.pipeline()
+        for index, job_id in waiting.items():
+            pipe.sadd(job_batches_key(job_id), f"{batch_id}:{index}")
+            pipe.expire(job_batches_key(job_id), BATCH_TTL)
+        if waiting:
+            pipe.hset(jobs_key(batch_id), mapping=waiting)
+            pipe.expire(jobs_key(batch_id), BATCH_TTL)
+        pipe.execute()
+        if to_enqueue:
+            bulk_queue.enqueue_many(to_enqueue)
+
+        # Присоединённая задача могла завершиться до подписки
+        for index in attached:
+            outcome = job_outcome(waiting[index])
+            if outcome:
+                item = chunk[index - start]
+                record_batch_item(batch_id, index, {
+                    "index": index, "id": item.get("id"), "job_id": waiting[index], "cached": False, **outcome,
+                })
+
+    # Короткие объявления — групповыми задачами под бюджет токенов одного запроса к LLM
+    groups = list(grouped.values())
+    texts = [group["text"] for group in groups]
+    group_jobs = [
+        Queue.prepare_data(
+            process_ad_check_group_task, ([texts[i] for i in plan],),
+            job_id=f"{batch_id}-g{plan[0]}",
+            description=f"batch {batch_id}: group of {len(plan)}",
+            timeout=CHILD_JOB_TIMEOUT,
+            meta={"batch_id": batch_id, "indexes": [groups[i]["indexes"] for i in plan]},
+            on_success=Callback(on_group_success),
+            on_failure=Callback(on_group_failure),
+        )
+        for plan in plan_batches(texts)
+    ]
+    if group_jobs:
+        pipe = redis.pipeline()
+        for group_job in group_jobs:
+            for indexes in group_job.meta["indexes"]:
+                pipe.hset(jobs_key(batch_id), mapping={index: group_job.job_id for index in indexes})
+        pipe.expire(jobs_key(batch_id), BATCH_TTL)
+        pipe.execute()
+        bulk_queue.enqueue_many(group_jobs)
+
+    refund = counts["cached"] + counts["attached"]
+    if refund:
+        # Квоту списали при приёме пакета — возвращаем в то окно, даже если месяц уже сменился
+        created_at = redis.hget(batch_key(batch_id), "created_at")
+        refund_quota(account_id, refund, minute=False, charged_at=float(created_at) if created_at else None)
+    redis.hset(batch_key(batch_id), mapping=counts)
+    print(f"📦 Пакет {batch_id}: {len(raw_items)} проверок — "
+          f"кэш {counts['cached']}, присоединено {counts['attached']}, в очереди {counts['queued']} "
+          f"(групповых задач {len(group_jobs)})")
+    return counts
+
+
+def _record_group(job, outcomes: List[Dict]) -> None:
+    """Записать итоги групповой задачи: по итогу на текст, на все его номера в пакете"""
+    batch_id = job.meta["batch_id"]
+    for indexes, outcome in zip(job.meta["indexes"], outcomes):
+        for index in indexes:
+            ref = redis.lindex(items_key(batch_id), index)
+            item = json.loads(ref) if ref else {}
+            record_batch_item(batch_id, index, {
+                "index": index, "id": item.get("id"), "job_id": job.id, "cached": False, **outcome,
+            })
+
+
+def on_group_success(job, connection, result, *args, **kwargs):
+    """Групповая задача завершилась: кэш результатов, индекс отчётов и строки пакета"""
+    from ..services.dedup import cache_result, result_key
+    from .reports import record_report
+
+    batch_id = job.meta["batch_id"]
+    for text, report, indexes in zip(job.args[0], result, job.meta["indexes"]):
+        if not report.get("partial"):
+            cache_result(result_key(text, None, None), report)
+        # У проверки в группе нет своей задачи — отчёт под ID строки пакета, как в выгрузке пакета
+        for index in indexes:
+            record_report(f"{batch_id}-{index}", report)
+    _record_group(job, [{"status": "completed", "result": report} for report in result])
+
+
+def on_group_failure(job, connection, exc_type, exc_value, traceback):
+    """Групповая задача упала: все её проверки — с ошибкой"""
+    error = f"{exc_type.__name__}: {exc_value}"
+    _record_group(job, [{"status": "failed", "error": error} for _ in job.args[0]])
+
+
+def sweep_batch(batch_id: str) -> int:
+    """
+    Дописать итоги проверок, чьи задачи завершились без callback: процесс задачи
+    убит (SIGKILL, OOM) или задачу убрал RQ как брошенную. Без этого пакет
+    не завершился бы никогда. Возвращает, сколько проверок дописано.
+    """
+    from ..services.check_submission import job_outcome
+    from ..services.dedup import claim_pending
+
+    done = set(redis.hkeys(done_key(batch_id)))
+    pending: Dict[str, List[int]] = {}  # ID задачи → номера ещё не записанных проверок
+    for index, job_id in redis.hgetall(jobs_key(batch_id)).items():
+        if index not in done:
+            pending.setdefault(job_id.decode(), []).append(int(index))
+    if not pending:
+        return 0
+
+    swept = 0
+    job_ids = list(pending)
+    for job_id, job in zip(job_ids, Job.fetch_many(job_ids, connection=redis)):
+        if job is None and claim_pending(job_id):
+            continue
+        status = job.get_status() if job is not None else None
+        if job is not None and status not in ("finished", "failed", "stopped", "canceled"):
+            continue  # ещё в очереди или выполняется
+
+        if job is not None and job.meta.get("indexes") is not None:
+            # Групповая задача: итог по каждому тексту
+            if status == "finished":
+                outcomes = [{"status": "completed", "result": report} for report in job.result]
+            else:
+                outcomes = [{"status": "failed", "error": f"Групповая задача не завершилась ({status})"}
+                            for _ in job.meta["indexes"]]
+            _record_group(job, outcomes)
+        else:
+            outcome = job_outcome(job_id) if job is not None else None
+            outcome = outcome or {"status": "failed", "error": "Задача не найдена"}
+            for index in pending[job_id]:
+                ref = redis.lindex(items_key(batch_id), index)
+                item = json.loads(ref) if ref else {}
+                record_batch_item(batch_id, index, {
+                    "index": index, "id": item.get("id"), "job_id": job_id, "cached": False, **outcome,
+                })
+        swept += len(pending[job_id])
+    if swept:
+        print(f"🧹 Пакет {batch_id}: дописано {swept} проверок, завершившихся без callback")
+    return swept
+
+
+def on_batch_failure(job, connection, exc_type, exc_value, traceback):
+    """Родительская задача упала — пакет не будет дописан"""
+    batch_id = job.args[0]
+    redis.hset(batch_key(batch_id), mapping={"status": "failed", "error": f"{exc_type.__name__}: {exc_value}"})
+    redis.publish(progress_channel(batch_id), "failed")
+
+
+def enqueue_batch(batch_id: str, account_id: int, q: Queue = bulk_queue) -> None:
+    """Поставить родительскую задачу пакета"""
+    q.enqueue(
+        run_batch, batch_id, account_id,
+        job_id=f"batch-{batch_id}",
+        job_timeout="10m",
+        description=f"batch {batch_id}: fan-out",
+        on_failure=Callback(on_batch_failure),
+    )
+
+
+def get_batch(batch_id: str) -> Optional[Dict]:
+    """Сводка пакета или None, если пакета нет"""
+    raw = redis.hgetall(batch_key(batch_id))
+    if not raw:
+        return None
+    batch = {k.decode(): v.decode() for k, v in raw.items()}
+    for field in ("total", "done", "failed", "cached", "attached", "queued"):
+        if field in batch:
+            batch[field] = int(batch[field])
+    return batch
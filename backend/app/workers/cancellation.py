@@ -0,0 +1,143 @@
+"""
+Отмена проверок: пользователь закрыл страницу ожидания, отправил новую
+проверку вместо старой или отменил её через API.
+
+Задача из очереди просто снимается. Выполняющаяся получает флаг отмены:
+синхронная задача проверяет его между этапами (ASR → LLM → отчёт),
+форкающий воркер вдобавок убивает процесс задачи вместе с открытыми
+HTTP-запросами, асинхронный — отменяет корутину (см. async_worker.py).
+Проверку, которую ждёт кто-то ещё (дедупликация, пакеты), отмена
+одного клиента не останавливает — он только перестаёт её ждать.
+Клиент — cookie браузера или client_id JSON API: повторная отмена
+тем же клиентом никого больше не отписывает.
+"""
+from datetime import timedelta, timezone
+from typing import Dict, Optional
+
+from rq.command import send_stop_job_command
+from rq.exceptions import InvalidJobOperation, NoSuchJobError
+from rq.job import Job, get_current_job
+
+from .queue import redis, webhook_queue
+
+
+CANCEL_CHANNEL = "checks:cancel"  # pub/sub: ID задачи, которую надо прервать
+CANCEL_TTL = 24 * 60 * 60
+ABANDON_GRACE_SECONDS = 15  # страницу ожидания могли просто обновить — ждём, не вернётся ли она
+PENDING_STATUSES = {"queued", "deferred", "scheduled"}
+DONE_STATUSES = {"finished", "failed", "stopped", "canceled"}
+
+
+class CheckCancelled(Exception):
+    """Проверка отменена — выполнение прерывается"""
+
+
+def cancel_key(job_id: str) -> str:
+    """Флаг отмены задачи (значение — причина)"""
+    return f"checks:cancelled:{job_id}"
+
+
+def watchers_key(job_id: str) -> str:
+    """Кто ждёт задачу: ID клиентов — отправившего и присоединившихся (set)"""
+    return f"checks:watchers:{job_id}"
+
+
+def abandon_key(job_id: str) -> str:
+    """Страницу ожидания закрыли — отмена, если она не вернётся за ABANDON_GRACE_SECONDS"""
+    return f"checks:abandoned:{job_id}"
+
+
+def add_watcher(job_id: str, client_id: str) -> None:
+    """Клиент client_id ждёт задачу"""
+    pipe = redis.pipeline()
+    pipe.sadd(watchers_key(job_id), client_id)
+    pipe.expire(watchers_key(job_id), CANCEL_TTL)
+    pipe.execute()
+
+
+def is_cancelled(job_id: str) -> bool:
+    return bool(redis.exists(cancel_key(job_id)))
+
+
+def raise_if_cancelled() -> None:
+    """Прервать текущую задачу RQ, если её отменили (вызывается между этапами проверки)"""
+    job = get_current_job()
+    if job is not None and is_cancelled(job.id):
+        raise CheckCancelled(f"Проверка {job.id} отменена")
+
+
+def cancel_check(job_id: str, client_id: str, reason: str = "cancelled") -> Dict:
+    """
+    Отменить проверку по просьбе клиента client_id (reason — "cancelled" или "superseded").
+    Возвращает {"status": ...}: "cancelled" — снята из очереди (was="queued", enqueued_at),
+    "cancelling" — выполняется и получила сигнал, "detached" — её ждут другие,
+    иначе текущий статус уже завершённой задачи или "not_found".
+    """
+    from ..services.dedup import content_key, release_check
+    from .check_events import finish_check
+
+    try:
+        job = Job.fetch(job_id, connection=redis)
+    except NoSuchJobError:
+        return {"status": "not_found"}
+
+    status = job.get_status()
+    if status in DONE_STATUSES:
+        return {"status": status}
+
+    from .batch import job_batches_key
+    # Отписываем только этого клиента; остальные ждущие и пакеты задачу сохраняют
+    pipe = redis.pipeline()
+    pipe.srem(watchers_key(job_id), client_id)
+    pipe.scard(watchers_key(job_id))
+    pipe.scard(job_batches_key(job_id))
+    _, watchers, batches = pipe.execute()
+    if watchers or batches:
+        return {"status": "detached"}
+
+    redis.set(cancel_key(job_id), reason, ex=CANCEL_TTL)
+    # Новые такие же проверки не должны присоединяться к отменённой
+    if job.func_name.endswith("process_ad_check_task"):
+        release_check(content_key(*job.args[:3]), job_id)
+
+    if status in PENDING_STATUSES:
+        try:
+            job.cancel()
+        except InvalidJobOperation:
+            pass
+        finish_check(job_id, {"status": "cancelled", "reason": reason})
+        print(f"🚫 Проверка {job_id} снята из очереди ({reason})")
+        # enqueued_at — когда за проверку списали квоту (её возвращают в то же окно)
+        enqueued_at = job.enqueued_at.replace(tzinfo=timezone.utc).timestamp() if job.enqueued_at else None
+        return {"status": "cancelled", "was": "queued", "enqueued_at": enqueued_at}
+
+    redis.publish(CANCEL_CHANNEL, job_id)
+    if job.meta.get("worker_mode") == "fork":
+        # Прерываем процесс задачи вместе с открытыми запросами к ASR и LLM
+        try:
+            send_stop_job_command(redis, job_id)
+        except InvalidJobOperation:
+            pass
+    print(f"🚫 Проверка {job_id} прерывается ({reason})")
+    return {"status": "cancelling"}
+
+
+def abandon_check(job_id: str, client_id: str) -> None:
+    """Клиент закрыл страницу ожидания: отменить для него проверку, если страница не вернётся"""
+    redis.set(abandon_key(job_id), 1, ex=ABANDON_GRACE_SECONDS * 4)
+    webhook_queue.enqueue_in(
+        timedelta(seconds=ABANDON_GRACE_SECONDS), cancel_if_abandoned, job_id, client_id,
+        description=f"cancel if abandoned: {job_id}",
+    )
+
+
+def keep_check(job_id: str) -> None:
+    """Страница ожидания опрашивает статус — проверка нужна"""
+    redis.delete(abandon_key(job_id))
+
+
+def cancel_if_abandoned(job_id: str, client_id: str) -> Optional[Dict]:
+    """Отложенная отмена брошенной проверки"""
+    if not redis.delete(abandon_key(job_id)):
+        return None
+    return cancel_check(job_id, client_id)
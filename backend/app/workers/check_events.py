@@ -0,0 +1,78 @@
+"""
+События завершения проверок (RQ callbacks on_success / on_failure).
+Результат кладётся в кэш по содержимому, а ожидающие клиенты API
+получают его сразу через Redis pub/sub — без опроса статуса;
+пакеты, которые ждут задачу, получают строку результата (batch.py),
+а подписанные адреса — вебхук (webhooks.py). Завершённая проверка
+отмечается в индексе отчётов по времени завершения; PDF-отчёт одиночной
+проверки рендерится заранее, в пуле обслуживания (reports.py).
+"""
+import json
+from typing import Dict
+
+from redis.exceptions import RedisError
+
+from .queue import redis
+
+
+CHANNEL = "checks:done:{job_id}"
+
+
+def publish_outcome(job_id: str, outcome: Dict) -> None:
+    """Разослать итог проверки подписчикам канала задачи"""
+    try:
+        redis.publish(CHANNEL.format(job_id=job_id), json.dumps(outcome, ensure_ascii=False, default=str))
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось опубликовать завершение проверки {job_id}: {e}")
+
+
+def on_check_success(job, connection, result, *args, **kwargs):
+    """Проверка завершилась: кэш результата + уведомление + рендер PDF-отчёта (кроме проверок пакета)"""
+    from ..services.dedup import cache_result, result_key
+    from .reports import enqueue_pdf_render, record_report
+
+    text, audio_bytes, audio_content_type = job.args[:3]
+    # Частичный результат (не уложились в срок) не кэшируем — повторная проверка должна пойти заново
+    if not result.get("partial"):
+        cache_result(result_key(text, audio_bytes, audio_content_type), result)
+    finish_check(job.id, {"status": "completed", "result": result})
+    try:
+        record_report(job.id, result)
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось отметить отчёт проверки {job.id} в индексе: {e}")
+    if job.meta.get("batch_id"):
+        # Отчёты пакета скачивают редко — их рендерят по запросу (/pdf, выгрузка ZIP),
+        # иначе тысячи рендеров пакета встали бы перед загрузкой закона в пуле обслуживания
+        return
+    try:
+        enqueue_pdf_render(job.id, result)
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось поставить рендер PDF-отчёта {job.id}: {e}")
+
+
+def on_check_failure(job, connection, exc_type, exc_value, traceback):
+    """Проверка упала (или прервана отменой между этапами): уведомление ожидающих"""
+    from .cancellation import CheckCancelled
+
+    if issubclass(exc_type, CheckCancelled):
+        finish_check(job.id, {"status": "cancelled"})
+        return
+    finish_check(job.id, {"status": "failed", "error": f"{exc_type.__name__}: {exc_value}"})
+
+
+def on_check_stopped(job, connection):
+    """Процесс проверки убит по команде отмены (форкающий воркер)"""
+    finish_check(job.id, {"status": "cancelled"})
+
+
+def finish_check(job_id: str, outcome: Dict) -> None:
+    """Итог проверки — ожидающим в API, пакетам и вебхукам"""
+    from .batch import record_job_outcome
+    from .webhooks import dispatch_webhooks
+
+    publish_outcome(job_id, outcome)
+    try:
+        record_job_outcome(job_id, outcome)
+        dispatch_webhooks(job_id, outcome)
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось записать результат проверки {job_id} в пакеты и вебхуки: {e}")
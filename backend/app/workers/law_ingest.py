@@ -0,0 +1,182 @@
+"""
+Распределённая загрузка закона через RQ (очередь "ingestion").
+
+Координатор скачивает оглавление, создаёт незавершённую версию и ставит
+по задаче на каждую главу — несколько воркеров парсят главы параллельно.
+Финальная задача (fan-in) запускается после всех глав, проверяет
+полноту версии и активирует её.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+from rq import Retry
+from rq.exceptions import NoSuchJobError
+from rq.job import Dependency, Job
+
+from .queue import redis, ingest_queue
+from ..db import SessionLocal
+from ..repositories.law_repository import LawRepository
+from ..services.law_checkpoint import IngestCheckpoint, acquire_ingest_lock, release_ingest_lock
+from ..services.law_parser import (
+    LAW_BASE_URL, LAW_CODE,
+    fetch, extract_law_metadata, extract_structured_links,
+    crawl_structure, bulk_save_chapters, collect_garbage_versions,
+)
+
+
+# Доля статей из оглавления, которую нужно загрузить, чтобы версия считалась годной
+MIN_ARTICLES_RATIO = 0.95
+
+# Один ID на первичную загрузку — несколько воркеров не поставят её дважды
+BOOTSTRAP_JOB_ID = "law-bootstrap"
+
+
+def enqueue_law_bootstrap() -> None:
+    """
+    Поставить первичную загрузку закона в очередь обслуживания.
+    Воркер не ждёт ни БД, ни загрузку: если БД ещё не готова,
+    задача повторится по расписанию RQ.
+    """
+    try:
+        job = Job.fetch(BOOTSTRAP_JOB_ID, connection=redis)
+        if job.get_status() in ("queued", "started", "scheduled", "deferred"):
+            return
+    except NoSuchJobError:
+        pass
+
+    ingest_queue.enqueue(
+        bootstrap_law_ingestion,
+        job_id=BOOTSTRAP_JOB_ID,
+        job_timeout="5m",
+        retry=Retry(max=10, interval=[5, 10, 30, 60, 120]),
+        description="law-ingest: bootstrap"
+    )
+    print("📨 Проверка наличия закона поставлена в очередь обслуживания")
+
+
+def bootstrap_law_ingestion() -> Optional[int]:
+    """Запустить загрузку закона, если в БД ещё нет активной версии"""
+    db = SessionLocal()
+    try:
+        law_version = LawRepository(db).get_active_version(LAW_CODE)
+    finally:
+        db.close()
+
+    if law_version:
+        print(f"✅ Закон найден в БД (версия от {law_version.version_date})")
+        return None
+
+    print("📚 Закон не найден в БД, запускаю первичную загрузку...")
+    return start_law_ingestion()
+
+
+def start_law_ingestion(law_url: str = LAW_BASE_URL) -> Optional[int]:
+    """
+    Координатор: оглавление → новая версия → задачи по главам + финальная задача.
+    Возвращает ID создаваемой версии (или None, если загрузка уже идёт).
+    """
+    if not acquire_ingest_lock(LAW_CODE, "start_law_ingestion"):
+        print("⏭️ Загрузка закона уже идёт, пропускаю")
+        return None
+
+    try:
+        toc_html = fetch(law_url)
+        metadata = extract_law_metadata(toc_html)
+        structure = extract_structured_links(toc_html, law_url)
+        if not structure:
+            raise ValueError(f"В оглавлении {law_url} не найдено ни одной главы")
+        total_articles = sum(len(ch["articles"]) for ch in structure)
+        print(f"📚 {metadata['law_name']}: {len(structure)} глав, {total_articles} статей")
+
+        db = SessionLocal()
+        repo = LawRepository(db)
+        try:
+            collect_garbage_versions(repo)
+            law_version = repo.create_version(
+                law_name=metadata["law_name"],
+                law_code=LAW_CODE,
+                source_url=law_url,
+                version_date=metadata["version_date"],
+                is_active=False,
+                is_complete=False
+            )
+            version_id = law_version.id
+        finally:
+            db.close()
+
+        chapter_jobs = [
+            ingest_queue.enqueue(
+                ingest_chapter, version_id, metadata["version_date"], chapter_data,
+                job_timeout="10m",
+                retry=Retry(max=2, interval=[30, 120]),
+                description=f"law-ingest v{version_id}: {chapter_data['title']}"
+            )
+            for chapter_data in structure
+        ]
+        ingest_queue.enqueue(
+            finalize_law_ingestion, version_id, metadata["version_date"], len(structure), total_articles,
+            depends_on=Dependency(jobs=chapter_jobs, allow_failure=True),
+            job_timeout="5m",
+            description=f"law-ingest v{version_id}: finalize"
+        )
+    except Exception:
+        release_ingest_lock(LAW_CODE)
+        raise
+
+    print(f"🚀 Версия ID={version_id}: поставлено {len(chapter_jobs)} задач по главам")
+    return version_id
+
+
+def ingest_chapter(version_id: int, version_date: date, chapter_data: Dict) -> int:
+    """
+    Загрузка одной главы со статьями в версию.
+    Идемпотентна: при повторе (retry) глава перезаписывается, уже спарсенные
+    страницы берутся из чекпоинта. Возвращает количество записанных документов.
+    """
+    checkpoint = IngestCheckpoint(LAW_CODE, version_date)
+    parsed_chapters: List[Dict] = crawl_structure([chapter_data], checkpoint)
+    if not parsed_chapters:
+        raise RuntimeError(f"Не удалось загрузить главу: {chapter_data['title']}")
+
+    db = SessionLocal()
+    repo = LawRepository(db)
+    try:
+        repo.delete_chapter_by_url(version_id, parsed_chapters[0]["chapter"]["source_url"])
+        total_count = bulk_save_chapters(repo, version_id, parsed_chapters)
+        repo.bulk_commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"✅ {chapter_data['title']}: сохранено {total_count} документов")
+    return total_count
+
+
+def finalize_law_ingestion(version_id: int, version_date: date,
+                           expected_chapters: int, expected_articles: int) -> bool:
+    """
+    Fan-in: проверка полноты версии и её активация.
+    Неполная версия удаляется, задача завершается ошибкой.
+    """
+    db = SessionLocal()
+    repo = LawRepository(db)
+    try:
+        chapters = repo.count_chapters(version_id)
+        articles = repo.count_articles(version_id)
+        print(f"🔎 Версия ID={version_id}: глав {chapters}/{expected_chapters}, "
+              f"статей {articles}/{expected_articles}")
+
+        if chapters < expected_chapters or articles < expected_articles * MIN_ARTICLES_RATIO:
+            repo.delete_version(version_id)
+            raise RuntimeError(f"Версия ID={version_id} загружена не полностью и удалена")
+
+        repo.activate_version(version_id, LAW_CODE)
+    finally:
+        db.close()
+        release_ingest_lock(LAW_CODE)
+
+    IngestCheckpoint(LAW_CODE, version_date).clear()
+    print(f"🎉 Версия ID={version_id} активирована")
+    return True
@@ -1,32 +1,89 @@
-from rq import Queue
+from rq import Queue, Worker
+from rq.registry import StartedJobRegistry, DeferredJobRegistry, FailedJobRegistry
 from redis import Redis
+from typing import Dict, List
 from ..settings import settings
+import asyncio
 import os
+import time
 
 
 redis = Redis.from_url(settings.REDIS_URL)
-queue = Queue("checks", connection=redis)
+# Классы очередей: у каждого свой пул воркеров, чтобы долгие задачи
+# (массовые проверки, загрузка закона) не задерживали проверки пользователей
+queue = Queue("checks", connection=redis)  # интерактивные проверки
+bulk_queue = Queue("checks-bulk", connection=redis)  # массовые проверки
+ingest_queue = Queue("ingestion", connection=redis)  # обслуживание: загрузка закона
+webhook_queue = Queue("webhooks", connection=redis)  # обслуживание: доставка вебхуков
+report_queue = Queue("reports", connection=redis)  # обслуживание: PDF-отчёты готовых проверок
+
+QUEUE_CLASSES = {
+    "interactive": queue,
+    "bulk": bulk_queue,
+    "maintenance": ingest_queue,
+    "webhooks": webhook_queue,
+    "reports": report_queue,
+}
+
+# Пулы воркеров: очереди в порядке приоритета и число процессов.
+# Интерактивный пул слушает только свою очередь; массовый в простое
+# помогает интерактивному; обслуживание никогда не берёт проверки,
+# а короткие доставки вебхуков и PDF-отчёты берёт раньше долгой загрузки закона.
+WORKER_POOLS = {
+    "interactive": {"queues": [queue], "size": settings.WORKERS_INTERACTIVE},
+    "bulk": {"queues": [queue, bulk_queue], "size": settings.WORKERS_BULK},
+    "maintenance": {"queues": [webhook_queue, report_queue, ingest_queue], "size": settings.WORKERS_MAINTENANCE},
+}
+
+
+def queue_depths() -> Dict[str, Dict[str, int]]:
+    """Глубина очередей по классам: ждут, выполняются, ждут зависимостей, упали, воркеров"""
+    depths = {}
+    for name, q in QUEUE_CLASSES.items():
+        depths[name] = {
+            "queue": q.name,
+            "queued": q.count,
+            "started": StartedJobRegistry(queue=q).count,
+            "deferred": DeferredJobRegistry(queue=q).count,
+            "failed": FailedJobRegistry(queue=q).count,
+            "workers": Worker.count(queue=q),
+        }
+    return depths
 
 # Фоновая задача для обработки ML модели
-def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None):
+def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None,
+                          deadline_at: float | None = None):
     """
     Фоновая задача для обработки проверки рекламы через ML модель.
     Выполняется в отдельном процессе воркера.
+    deadline_at — срок проверки, назначенный при постановке (services/deadline.py);
+    без него срок отсчитывается от начала задачи (массовые проверки).
     """
     print(f"🚀 Начинаем обработку ML задачи. Текст: {text[:100] if text else 'None'}...")
     print(f"🎵 Аудио: {'есть' if audio_bytes else 'нет'}, тип: {audio_content_type}")
+    started = time.perf_counter()
 
     try:
         from ..services.ml_core import run_ml
-        from ..repositories.law_repository import LawRepository  
-        from ..db import SessionLocal
-        from datetime import datetime, date
+        from ..services.admission import record_check_completion
+        from .warmup import record_startup_overhead
+        from .cancellation import CheckCancelled, raise_if_cancelled
+
+        # В прогретом воркере импорты выше уже в памяти — замеряем, сколько стоил запуск
+        record_startup_overhead()
+        # Отменённую проверку прерываем до запросов к ASR/LLM и между этапами
+        raise_if_cancelled()
         
         print("📚 Запускаем ML обработку...")
         # Запускаем ML обработку
-        ml_out = run_ml(text, audio_bytes, audio_content_type)
+        ml_out = run_ml(text, audio_bytes, audio_content_type, check_cancelled=raise_if_cancelled,
+                        deadline_at=deadline_at)
         print(f"✅ ML обработка завершена! Результат: {ml_out}")
+        raise_if_cancelled()
         
+    except CheckCancelled:
+        print("🚫 Проверка отменена, прерываем")
+        raise
     except Exception as e:
         print(f"❌ Ошибка в ML обработке: {e}")
         import traceback
@@ -34,6 +91,70 @@ def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_con
         # Пробрасываем ошибку дальше
         raise e
     
+    result = build_check_report(ml_out)
+    # Длительность проверки — для оценки ожидания в очереди (контроль допуска)
+    record_check_completion(time.perf_counter() - started)
+    return result
+
+
+async def process_ad_check_task_async(text: str | None, audio_bytes: bytes | None, audio_content_type: str | None,
+                                      deadline_at: float | None = None):
+    """
+    Асинхронный вариант process_ad_check_task для асинхронного воркера (async_worker.py):
+    запросы к ASR и LLM идут корутинами, десятки проверок делят один процесс.
+    """
+    print(f"🚀 Начинаем обработку ML задачи (async). Текст: {text[:100] if text else 'None'}...")
+    started = time.perf_counter()
+
+    try:
+        from ..services.ml_core import run_ml_async
+        from ..services.admission import record_check_completion
+
+        ml_out = await run_ml_async(text, audio_bytes, audio_content_type, deadline_at=deadline_at)
+        print(f"✅ ML обработка завершена! Результат: {ml_out}")
+
+    except Exception as e:
+        print(f"❌ Ошибка в ML обработке: {e}")
+        import traceback
+        print(f"📜 Полный трейс: {traceback.format_exc()}")
+        raise e
+
+    # Отчёт читает версию закона из БД синхронно — уводим в поток, чтобы не держать event loop
+    result = await asyncio.to_thread(build_check_report, ml_out)
+    await asyncio.to_thread(record_check_completion, time.perf_counter() - started)
+    return result
+
+
+def process_ad_check_group_task(texts: List[str]) -> List[dict]:
+    """
+    Проверка нескольких коротких объявлений массовой очереди: LLM получает
+    их пакетами (инструкция и вопросы — один раз на запрос).
+    Возвращает отчёты в том же порядке, что и texts.
+    """
+    print(f"🚀 Начинаем пакетную ML обработку: {len(texts)} объявлений")
+    started = time.perf_counter()
+
+    from ..services.ml_core import run_ml_batch
+    from ..services.admission import record_check_completion
+    from .warmup import record_startup_overhead
+
+    record_startup_overhead()
+    ml_outs = run_ml_batch(texts)  # срок — от начала задачи
+    results = [build_check_report(ml_out) for ml_out in ml_outs]
+
+    duration = (time.perf_counter() - started) / len(texts)
+    for _ in texts:
+        record_check_completion(duration)
+    return results
+
+
+def build_check_report(ml_out: dict) -> dict:
+    """Преобразует вывод ML в структуру отчета о проверке"""
+    from ..repositories.law_repository import LawRepository
+    from ..services.law_status import get_law_metadata
+    from ..db import SessionLocal
+    from datetime import datetime
+
     print("🔧 Обрабатываем результат ML в структуру отчета...")
     try:
         # Преобразуем вывод ML в структуру для отчета
@@ -86,6 +207,8 @@ def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_con
         print(f"📊 Найдено нарушений: {len(violations)}, кейсов: {len(cases)}")
 
         # Формируем результат
+        # Этап не уложился в срок проверки — нарушения не найдены, но и не исключены
+        partial = ml_out.get("partial")
         has_violations = len(violations) > 0
         percent = 100
         footer = None if not has_violations else ""
@@ -100,6 +223,10 @@ def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_con
         
         flags = (
             [
+                {"type": "warn", "text": f"{partial['note']}: результат неполный, повторите проверку", "strong": True},
+            ]
+            if partial
+            else [
                 {"type": "ok", "text": "Нет несоответствий ФЗ «О рекламе»", "strong": True},
                 {"type": "ok", "text": "В соответствии с существующей судебной практикой риск привлечения к ответственности отсутствует", "strong": False},
                 {"type": "ok", "text": "Риск привлечения к ответственности мал", "strong": False},
@@ -112,25 +239,21 @@ def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_con
             ]
         )
 
-        ring_color = "#ef4444" if has_violations else "#22c55e"
+        ring_color = "#ef4444" if has_violations else "#f59e0b" if partial else "#22c55e"
         ring_deg = 360.0
-        ring_label = "Нет" if has_violations else "Да" 
+        ring_label = "Нет" if has_violations else "?" if partial else "Да" 
         check_date = datetime.now()
 
         print("🗃️ Получаем информацию о законе из БД...")
-        # Получаем информацию о законе
+        # Получаем информацию о законе (пока закон не загружен — встроенные сведения)
         db = SessionLocal()
         repo = LawRepository(db)
         try:
-            law_version = repo.get_active_version("38-FZ")
-            if law_version:
-                law_name = law_version.law_name
-                law_version_date = law_version.version_date
-            else:
-                law_name = "Федеральный закон \"О рекламе\" от 13.03.2006 N 38-ФЗ (последняя редакция)"
-                law_version_date = date(2024, 10, 1)
+            law_metadata = get_law_metadata(repo)
         finally:
             db.close()
+        law_name = law_metadata["law_name"]
+        law_version_date = law_metadata["version_date"]
 
         # Форматируем даты для JSON совместимости
         check_date_str = check_date.strftime('%d.%m.%Y в %H:%M')
@@ -141,7 +264,9 @@ def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_con
             "ring_color": ring_color,
             "ring_deg": ring_deg,
             "ring_label": ring_label,
-            "is_ok": (not has_violations),
+            "is_ok": (not has_violations and not partial),
+            "partial": bool(partial),
+            "partial_note": partial["note"] if partial else None,
             "violations": violations,
             "marked_violations": [],
             "flags": flags,
@@ -151,6 +276,7 @@ def process_ad_check_task(text: str | None, audio_bytes: bytes | None, audio_con
             "check_date_short": check_date_short,    # Короткая версия для статуса
             "law_name": law_name,
             "law_version_date": law_version_date.isoformat() if hasattr(law_version_date, 'isoformat') else str(law_version_date),
+            "law_is_fallback": law_metadata["is_fallback"],
         }
         
         print("🎉 Отчет сформирован успешно!")
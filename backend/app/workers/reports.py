@@ -0,0 +1,123 @@
+"""
+Готовые PDF-отчёты проверок (очередь "reports", пул обслуживания).
+
+Сразу после завершения проверки ставится задача рендера: PDF кладётся
+в Redis на REPORT_PDF_TTL вместе с ETag, и скачивание отдаёт готовые
+байты без reportlab. Если отчёта ещё нет (рендер не успел или истёк TTL),
+веб-сервер рендерит его сам — в пуле процессов, не блокируя event loop.
+Завершённые проверки отмечаются в индексе по времени завершения вместе
+с результатом (record_report) — выгрузка за период находит и те, чей
+PDF не рендерился заранее, и рендерит его по результату.
+"""
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from .queue import redis, report_queue
+from ..settings import settings
+
+
+REPORT_INDEX_KEY = "checks:reports:index"  # zset: ID отчёта → когда завершилась проверка (выгрузка за период)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def pdf_key(job_id: str) -> str:
+    """Готовый PDF-отчёт задачи (hash: pdf, etag)"""
+    return f"checks:pdf:{job_id}"
+
+
+def report_key(report_id: str) -> str:
+    """Результат завершённой проверки для рендера отчёта (JSON)"""
+    return f"checks:report:{report_id}"
+
+
+def record_report(report_id: str, report: Dict) -> None:
+    """
+    Проверка завершилась: результат — на REPORT_PDF_TTL, ID — в индекс по времени завершения.
+    Дата ставится один раз: повторная запись и рендер PDF её не сдвигают.
+    """
+    now = time.time()
+    pipe = redis.pipeline()
+    pipe.set(report_key(report_id), json.dumps(report, ensure_ascii=False, default=str), ex=settings.REPORT_PDF_TTL)
+    pipe.zadd(REPORT_INDEX_KEY, {report_id: now}, nx=True)
+    pipe.zremrangebyscore(REPORT_INDEX_KEY, "-inf", now - settings.REPORT_PDF_TTL)
+    pipe.execute()
+
+
+def pdf_etag(pdf_bytes: bytes) -> str:
+    """Сильный ETag отчёта — хэш содержимого"""
+    return '"' + hashlib.sha256(pdf_bytes).hexdigest()[:32] + '"'
+
+
+def store_pdf(job_id: str, pdf_bytes: bytes) -> str:
+    """Сохранить PDF-отчёт на REPORT_PDF_TTL; возвращает его ETag"""
+    etag = pdf_etag(pdf_bytes)
+    pipe = redis.pipeline()
+    pipe.hset(pdf_key(job_id), mapping={"pdf": pdf_bytes, "etag": etag})
+    pipe.expire(pdf_key(job_id), settings.REPORT_PDF_TTL)
+    pipe.execute()
+    return etag
+
+
+def get_pdf_etag(job_id: str) -> Optional[str]:
+    """ETag готового отчёта (для If-None-Match — без чтения самого PDF)"""
+    etag = redis.hget(pdf_key(job_id), "etag")
+    return etag.decode() if etag else None
+
+
+def get_pdf(job_id: str) -> Optional[Tuple[bytes, str]]:
+    """Готовый отчёт: (PDF, ETag) или None"""
+    pdf_bytes, etag = redis.hmget(pdf_key(job_id), "pdf", "etag")
+    if pdf_bytes is None or etag is None:
+        return None
+    return pdf_bytes, etag.decode()
+
+
+def enqueue_pdf_render(job_id: str, report: Dict) -> None:
+    """Поставить рендер отчёта завершившейся проверки (из callback задачи)"""
+    report_queue.enqueue(
+        render_report_pdf, job_id, report,
+        result_ttl=0,
+        description=f"pdf {job_id}",
+    )
+
+
+def render_report_pdf(job_id: str, report: Dict) -> Optional[int]:
+    """Задача: отрендерить PDF-отчёт и сохранить; возвращает размер или None, если отчёт уже есть"""
+    from ..services.pdf_generator import generate_pdf_report
+
+    if redis.exists(pdf_key(job_id)):
+        return None
+    pdf_bytes = generate_pdf_report(report)
+    store_pdf(job_id, pdf_bytes)
+    print(f"📄 PDF-отчёт {job_id} готов ({len(pdf_bytes) // 1024} КБ)")
+    return len(pdf_bytes)
+
+
+def _render_pool() -> ProcessPoolExecutor:
+    """Пул процессов веб-сервера для рендера; spawn — без fork процесса с event loop и потоками"""
+    from ..services.pdf_generator import get_renderer
+
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=get_renderer,  # шрифты и стили — при старте процесса, а не в первом отчёте
+        )
+    return _pool
+
+
+async def render_pdf_on_demand(job_id: str, report: Dict) -> Tuple[bytes, str]:
+    """Отчёта в Redis нет — рендер в пуле процессов и сохранение; возвращает (PDF, ETag)"""
+    from ..services.pdf_generator import generate_pdf_report
+
+    loop = asyncio.get_running_loop()
+    pdf_bytes = await loop.run_in_executor(_render_pool(), generate_pdf_report, report)
+    etag = await asyncio.to_thread(store_pdf, job_id, pdf_bytes)
+    return pdf_bytes, etag
@@ -4,12 +4,12 @@ RQ Scheduler — планировщик задач для фоновых про
 """
 from rq_scheduler import Scheduler
 from datetime import datetime
-from .queue import redis
-from ..services.law_parser import parse_and_save_law
+from .queue import redis, ingest_queue
+from .law_ingest import start_law_ingestion
 
 
-# Создаём scheduler с подключением к Redis
-scheduler = Scheduler(connection=redis, queue_name="checks")
+# Создаём scheduler с подключением к Redis (задачи идут в очередь загрузки закона)
+scheduler = Scheduler(connection=redis, queue_name=ingest_queue.name)
 
 
 def setup_daily_tasks():
@@ -22,11 +22,11 @@ def setup_daily_tasks():
         if job.meta.get("task_name") == "daily_law_parsing":
             scheduler.cancel(job)
     
-    # Парсинг закона каждый день в 3:00
+    # Парсинг закона каждый день в 3:00 (координатор раздаёт главы воркерам)
     scheduler.cron(
         "0 3 * * *",  # cron: каждый день в 03:00
-        func=parse_and_save_law,
-        timeout="30m",  # таймаут 30 минут
+        func=start_law_ingestion,
+        timeout="5m",  # координатор только ставит задачи по главам
         meta={"task_name": "daily_law_parsing"}
     )
     
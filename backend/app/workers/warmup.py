@@ -0,0 +1,109 @@
+"""
+Прогретые воркеры проверок.
+Обычный RQ Worker форкает новый процесс на каждую задачу, и каждая проверка
+заново импортирует ML-модули, открывает соединение с БД и создаёт HF-клиент.
+WarmWorker загружает всё это один раз при старте и выполняет задачи в том же
+процессе (без fork), сохраняя пул соединений между задачами.
+
+Накладные расходы запуска каждой проверки (от взятия задачи из очереди
+до начала ML) пишутся в job.meta и в Redis — по режимам воркера, чтобы
+сравнивать «до» и «после»: python manage.py worker-overhead
+"""
+import time
+from typing import Dict
+
+from redis.exceptions import RedisError
+from rq import Worker, SimpleWorker, get_current_job
+
+from .queue import redis
+
+
+OVERHEAD_KEY = "worker:startup_overhead:{mode}"
+OVERHEAD_SAMPLES = 1000  # храним последние N замеров на режим
+
+
+def preload() -> float:
+    """Загрузить ML-модули и открыть соединение с БД заранее. Возвращает затраченное время в секундах"""
+    started = time.perf_counter()
+
+    import ml.dictionaries  # noqa: F401
+    import ml.classifiers
+    from ..services import ml_core  # noqa: F401
+    from ..repositories.law_repository import LawRepository  # noqa: F401
+    from ..services.pdf_generator import get_renderer
+    from ..db import engine
+
+    # Шрифты и стили PDF-отчётов (пул обслуживания рендерит отчёты)
+    get_renderer()
+
+    try:
+        ml.classifiers.get_inference_client()
+    except KeyError as e:
+        print(f"  ⚠️ HF-клиент не создан, нет переменной окружения {e}")
+
+    try:
+        # Соединение остаётся в пуле и достанется первой проверке
+        with engine.connect():
+            pass
+    except Exception as e:
+        print(f"  ⚠️ БД недоступна при прогреве, подключимся при первой задаче: {e}")
+
+    return time.perf_counter() - started
+
+
+class MeteredWorker(Worker):
+    """Обычный (форкающий) RQ Worker, отмечающий момент взятия задачи"""
+
+    mode = "fork"
+
+    def execute_job(self, job, queue):
+        job.meta["dequeued_at"] = time.time()
+        job.meta["worker_mode"] = self.mode
+        job.save_meta()
+        super().execute_job(job, queue)
+
+
+class WarmWorker(MeteredWorker, SimpleWorker):
+    """Постоянный процесс: модули, пул соединений с БД и HF-клиент живут между задачами"""
+
+    mode = "warm"
+
+    def bootstrap(self, *args, **kwargs):
+        super().bootstrap(*args, **kwargs)
+        # bootstrap выполняется уже в процессе воркера (в том числе в дочерних процессах WorkerPool)
+        print(f"🔥 Прогрев воркера: {preload() * 1000:.0f} мс")
+
+
+def record_startup_overhead() -> None:
+    """Записать накладные расходы запуска текущей задачи (вызывается из самой задачи)"""
+    job = get_current_job()
+    if job is None or "dequeued_at" not in job.meta:
+        return
+
+    overhead_ms = (time.time() - job.meta["dequeued_at"]) * 1000
+    job.meta["startup_overhead_ms"] = round(overhead_ms, 1)
+    try:
+        job.save_meta()
+        key = OVERHEAD_KEY.format(mode=job.meta.get("worker_mode", "fork"))
+        pipe = redis.pipeline()
+        pipe.lpush(key, overhead_ms)
+        pipe.ltrim(key, 0, OVERHEAD_SAMPLES - 1)
+        pipe.execute()
+    except RedisError as e:
+        print(f"  ⚠️ Не удалось записать накладные расходы запуска: {e}")
+
+
+def startup_overhead_stats() -> Dict[str, Dict[str, float]]:
+    """Накладные расходы запуска по режимам воркера: число замеров, медиана, p95, максимум (мс)"""
+    stats = {}
+    for mode in (MeteredWorker.mode, WarmWorker.mode):
+        samples = sorted(float(v) for v in redis.lrange(OVERHEAD_KEY.format(mode=mode), 0, -1))
+        if not samples:
+            continue
+        stats[mode] = {
+            "count": len(samples),
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        }
+    return stats
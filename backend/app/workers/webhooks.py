@@ -0,0 +1,227 @@
+"""
+Вебхуки о завершении проверок (очередь "webhooks", пул обслуживания).
+
+Клиент передаёт callback_url вместе с проверкой — вместо опроса статуса.
+Когда проверка завершилась, ставится задача доставки: POST с итогом,
+подписанным HMAC-SHA256 на SECRET_KEY. Неудачная доставка повторяется
+с экспоненциальной задержкой; после последней попытки — в список
+недоставленных (dead letter), откуда её можно поставить заново.
+Адрес проверяется при подписке и перед каждой доставкой (validate_callback_url):
+только http(s) и только публичные адреса — не внутренняя сеть. Доставка
+подключается к проверенному IP-адресу (post_pinned), а не разрешает имя заново.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import time
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from rq import Callback, Retry
+
+from .queue import redis, webhook_queue
+from ..settings import settings
+
+
+SIGNATURE_HEADER = "X-Webhook-Signature"
+TIMESTAMP_HEADER = "X-Webhook-Timestamp"
+DEAD_LETTER_KEY = "webhooks:dead"
+DEAD_LETTER_MAX = 1000
+WEBHOOKS_TTL = 24 * 60 * 60  # сколько хранится подписка на задачу
+
+
+def webhooks_key(job_id: str) -> str:
+    """Адреса, которые ждут итог задачи (set)"""
+    return f"checks:webhooks:{job_id}"
+
+
+def validate_callback_url(url: str) -> str:
+    """
+    Проверить адрес вебхука: схема http(s) и все адреса хоста — публичные
+    (не частная сеть, не loopback, не link-local вроде метаданных облака).
+    Возвращает проверенный IP-адрес хоста — подключаться нужно к нему (post_pinned).
+    Небезопасный адрес — ValueError; хост не разрешается — OSError (socket.gaierror).
+    WEBHOOK_ALLOW_PRIVATE_HOSTS отключает проверку адресов (локальная разработка).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"callback_url должен быть http(s)-адресом: {url}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    addresses = [
+        sockaddr[0].split("%")[0]
+        for *_, sockaddr in socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)
+    ]
+    if not settings.WEBHOOK_ALLOW_PRIVATE_HOSTS:
+        for raw in addresses:
+            address = ipaddress.ip_address(raw)
+            if getattr(address, "ipv4_mapped", None):
+                address = address.ipv4_mapped
+            if not address.is_global or address.is_multicast:
+                raise ValueError(f"callback_url указывает во внутреннюю сеть: {parts.hostname} → {address}")
+    return addresses[0]
+
+
+class PinnedHostAdapter(HTTPAdapter):
+    """https к IP-адресу, но SNI и проверка сертификата — по имени хоста из callback_url"""
+
+    def __init__(self, hostname: str):
+        self.hostname = hostname
+        super().__init__()
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["server_hostname"] = self.hostname
+        kwargs["assert_hostname"] = self.hostname
+        super().init_poolmanager(*args, **kwargs)
+
+
+def post_pinned(url: str, address: str, body: bytes, headers: Dict[str, str]) -> requests.Response:
+    """
+    POST на проверенный IP-адрес address, а не на имя хоста: повторное разрешение
+    имени (DNS rebinding) могло бы увести запрос во внутреннюю сеть.
+    Имя хоста остаётся в заголовке Host, а для https — в SNI и проверке сертификата.
+    """
+    parts = urlsplit(url)
+    host = f"[{address}]" if ":" in address else address
+    port = f":{parts.port}" if parts.port else ""
+    auth = (unquote(parts.username), unquote(parts.password or "")) if parts.username else None
+    with requests.Session() as session:
+        session.trust_env = False  # прокси из окружения разрешал бы имя сам
+        session.mount("https://", PinnedHostAdapter(parts.hostname))
+        return session.post(
+            urlunsplit(parts._replace(netloc=host + port)),
+            data=body,
+            auth=auth,
+            allow_redirects=False,  # редирект мог бы увести запрос во внутреннюю сеть
+            headers={**headers, "Host": parts.hostname + port},
+            timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+        )
+
+
+def sign_payload(body: bytes, timestamp: str, secret: str | None = None) -> str:
+    """Подпись тела запроса: hex HMAC-SHA256 от "timestamp.body" на SECRET_KEY"""
+    key = (secret or settings.SECRET_KEY).encode()
+    return hmac.new(key, timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body: bytes, timestamp: str, signature: str, secret: str | None = None) -> bool:
+    """Проверка подписи на стороне получателя"""
+    return hmac.compare_digest(sign_payload(body, timestamp, secret), signature)
+
+
+def retry_intervals() -> List[int]:
+    """Задержки перед повторами: WEBHOOK_RETRY_BASE_SECONDS, x3, x9, ..."""
+    return [settings.WEBHOOK_RETRY_BASE_SECONDS * 3 ** i for i in range(settings.WEBHOOK_MAX_RETRIES)]
+
+
+def enqueue_delivery(url: str, payload: Dict) -> None:
+    """Поставить доставку вебхука"""
+    retry = None
+    if settings.WEBHOOK_MAX_RETRIES:
+        retry = Retry(max=settings.WEBHOOK_MAX_RETRIES, interval=retry_intervals())
+    webhook_queue.enqueue(
+        deliver_webhook, url, payload,
+        retry=retry,
+        on_failure=Callback(on_delivery_failure),
+        description=f"webhook {payload.get('job_id')} → {url}",
+    )
+
+
+def webhook_payload(job_id: str, outcome: Dict) -> Dict:
+    """Тело вебхука: событие, ID задачи и итог (result или error)"""
+    event = {"completed": "check.completed", "cancelled": "check.cancelled"}.get(outcome["status"], "check.failed")
+    return {"event": event, "job_id": job_id, **outcome}
+
+
+def register_webhook(job_id: str, url: str) -> None:
+    """Подписать url на итог задачи (до её постановки в очередь)"""
+    pipe = redis.pipeline()
+    pipe.sadd(webhooks_key(job_id), url)
+    pipe.expire(webhooks_key(job_id), WEBHOOKS_TTL)
+    pipe.execute()
+
+
+def attach_webhook(job_id: str, url: str) -> None:
+    """
+    Подписать url на итог уже идущей задачи. Если она успела завершиться,
+    доставка ставится сразу; SREM решает, кто её ставит — мы или callback задачи.
+    """
+    from ..services.check_submission import job_outcome
+
+    register_webhook(job_id, url)
+    outcome = job_outcome(job_id)
+    if outcome and redis.srem(webhooks_key(job_id), url):
+        enqueue_delivery(url, webhook_payload(job_id, outcome))
+
+
+def dispatch_webhooks(job_id: str, outcome: Dict) -> None:
+    """Задача завершилась — поставить доставку всем подписанным адресам (из callback задачи)"""
+    pipe = redis.pipeline()
+    pipe.smembers(webhooks_key(job_id))
+    pipe.delete(webhooks_key(job_id))
+    urls, _ = pipe.execute()
+    if not urls:
+        return
+    payload = webhook_payload(job_id, outcome)
+    for url in urls:
+        enqueue_delivery(url.decode(), payload)
+
+
+def deliver_webhook(url: str, payload: Dict) -> Optional[int]:
+    """
+    Доставка: POST JSON с подписью. Не 2xx — исключение, RQ повторит задачу.
+    Адрес во внутренней сети не доставляется и не повторяется (None).
+    """
+    try:
+        # Повторно — хост мог с момента подписки начать указывать во внутреннюю сеть
+        address = validate_callback_url(url)
+    except ValueError as e:
+        print(f"❌ Вебхук {payload.get('job_id')} не отправлен: {e}")
+        return None
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    timestamp = str(int(time.time()))
+    response = post_pinned(url, address, body, {
+        "Content-Type": "application/json",
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: f"sha256={sign_payload(body, timestamp)}",
+    })
+    response.raise_for_status()
+    if response.is_redirect:
+        raise requests.HTTPError(f"Вебхук перенаправлен ({response.status_code}), редиректы не выполняются", response=response)
+    print(f"📬 Вебхук {payload.get('job_id')} доставлен: {url} ({response.status_code})")
+    return response.status_code
+
+
+def on_delivery_failure(job, connection, exc_type, exc_value, traceback):
+    """Попытка доставки не удалась; после последней — в список недоставленных"""
+    url, payload = job.args
+    if job.retries_left:
+        print(f"  ⚠️ Вебхук {payload.get('job_id')} не доставлен ({exc_value}), повтор, осталось {job.retries_left}")
+        return
+
+    redis.lpush(DEAD_LETTER_KEY, json.dumps({
+        "url": url,
+        "payload": payload,
+        "error": f"{exc_type.__name__}: {exc_value}",
+        "failed_at": time.time(),
+    }, ensure_ascii=False, default=str))
+    redis.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_MAX - 1)
+    print(f"❌ Вебхук {payload.get('job_id')} не доставлен после всех попыток: {url}")
+
+
+def dead_letters(limit: int = 100) -> List[Dict]:
+    """Последние недоставленные вебхуки"""
+    return [json.loads(raw) for raw in redis.lrange(DEAD_LETTER_KEY, 0, limit - 1)]
+
+
+def requeue_dead_letters() -> int:
+    """Поставить все недоставленные вебхуки на доставку заново; возвращает их число"""
+    count = 0
+    while raw := redis.rpop(DEAD_LETTER_KEY):
+        letter = json.loads(raw)
+        enqueue_delivery(letter["url"], letter["payload"])
+        count += 1
+    return count
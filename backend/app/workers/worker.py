@@ -1,42 +1,45 @@
-from rq import Worker
-from .queue import redis  # это экземпляр Redis с твоего REDIS_URL
+import sys
+
+from rq.worker_pool import WorkerPool
+from .queue import redis, WORKER_POOLS  # это экземпляр Redis с твоего REDIS_URL
+from .warmup import MeteredWorker, WarmWorker
 from .scheduler import setup_daily_tasks
-from ..services.law_parser import parse_and_save_law
-from ..db import SessionLocal
-from ..repositories.law_repository import LawRepository
+from .law_ingest import enqueue_law_bootstrap
+from ..settings import settings
+
 
 if __name__ == "__main__":
-    print("🔧 Настройка планировщика задач...")
-    setup_daily_tasks()
-    
-    # Проверяем, есть ли данные в БД, если нет - запускаем парсер
-    print("🔍 Проверка наличия закона в БД...")
-    import time
-    
-    # Retry: ждем готовности БД (до 30 сек)
-    for attempt in range(10):
-        try:
-            db = SessionLocal()
-            repo = LawRepository(db)
-            law_exists = repo.get_active_version("38-FZ")
-            
-            if not law_exists:
-                print("📚 Закон не найден в БД, запускаю первичный парсинг...")
-                parse_and_save_law()
-                print("✅ Первичный парсинг завершён!")
-            else:
-                print(f"✅ Закон найден в БД (версия от {law_exists.version_date})")
-            
-            db.close()
-            break  # Успешно - выходим
-            
-        except Exception as e:
-            if attempt < 9:
-                print(f"⏳ БД не готова, повтор через 3 сек... ({attempt + 1}/10)")
-                time.sleep(3)
-            else:
-                print(f"⚠️ Не удалось подключиться к БД: {e}")
-                break
-    
-    print("🚀 Запуск RQ Worker...")
-    Worker(["checks"], connection=redis).work(with_scheduler=True)
\ No newline at end of file
+    # Пул передаётся аргументом: python -m backend.app.workers.worker [interactive|bulk|maintenance] [--async|--warm]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    async_mode = "--async" in sys.argv[1:]
+    # --warm: постоянный процесс без fork на задачу, модули и соединения прогреты (см. warmup.py)
+    worker_class = WarmWorker if "--warm" in sys.argv[1:] else MeteredWorker
+    pool_name = args[0] if args else "interactive"
+    if pool_name not in WORKER_POOLS:
+        print(f"❌ Неизвестный пул воркеров: {pool_name} (доступны: {', '.join(WORKER_POOLS)})")
+        sys.exit(1)
+    pool = WORKER_POOLS[pool_name]
+
+    # Планировщик и первичная загрузка закона — забота пула обслуживания.
+    # Загрузка идёт фоновой задачей: воркер сразу начинает брать задачи,
+    # а проверки до появления закона в БД используют встроенные сведения
+    if pool_name == "maintenance":
+        print("🔧 Настройка планировщика задач...")
+        setup_daily_tasks()
+        enqueue_law_bootstrap()
+
+    if async_mode:
+        # Один процесс, проверки выполняются корутинами (см. async_worker.py)
+        from .async_worker import run_async_worker
+        run_async_worker(pool["queues"], settings.ASYNC_WORKER_CONCURRENCY)
+        sys.exit(0)
+
+    queue_names = [q.name for q in pool["queues"]]
+    print(
+        f"🚀 Запуск пула {pool_name}: {pool['size']} воркер(ов) ({worker_class.mode}), "
+        f"очереди по приоритету: {', '.join(queue_names)}"
+    )
+    if pool["size"] > 1:
+        WorkerPool(queue_names, connection=redis, num_workers=pool["size"], worker_class=worker_class).start()
+    else:
+        worker_class(queue_names, connection=redis).work(with_scheduler=True)
\ No newline at end of file
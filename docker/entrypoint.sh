@@ -7,6 +7,9 @@ sleep 3
 echo "🗄️ Применение миграций..."
 python manage.py db upgrade || echo "⚠️ Миграции не применились (возможно, уже применены)"
 
+echo "📥 Загрузка закона из снапшота (если БД пуста)..."
+python manage.py law-import --if-empty || echo "⚠️ Снапшот закона не загружен, закон будет загружен с сайта"
+
 echo "🚀 Запуск приложения..."
 exec "$@"
 
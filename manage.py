@@ -7,6 +7,31 @@
     python manage.py db upgrade    - применить миграции
     python manage.py db downgrade  - откатить миграцию
     python manage.py parse-law     - запустить парсер закона вручную
+    python manage.py ingest-law    - поставить распределённую загрузку закона в очередь
+    python manage.py queues        - глубина очередей по классам и доля дедупликации проверок
+    python manage.py webhooks-dead [--requeue]
+                                   - недоставленные вебхуки (--requeue — поставить заново)
+    python manage.py worker-overhead
+                                   - накладные расходы запуска проверок по режимам воркера
+    python manage.py law-export [файл]
+                                   - выгрузить активную версию закона в снапшот
+    python manage.py law-import [файл] [--if-empty]
+                                   - загрузить закон из снапшота (без сети)
+    python manage.py reparse [YYYY-MM-DDTHH:MM] [процессов]
+                                   - пересобрать закон из архива страниц (без сети)
+    python manage.py bench-ingest [глав] [статей_в_главе]
+                                   - бенчмарк записи закона в БД
+    python manage.py bench-parser [папка с *.html]
+                                   - сверка и бенчмарк парсеров страниц статей
+                                     (по умолчанию — страницы из архива)
+    python manage.py parser-fixtures [страниц] [папка]
+                                   - выгрузить страницы из архива в корпус тестов парсера
+                                     (по умолчанию 30 страниц в tests/fixtures/law_pages/recorded)
+    python manage.py bench-llm-batch [корпус.csv|.jsonl] [--live]
+                                   - запросы и токены LLM на объявление: по одному и пакетами
+                                     (--live — реальные запросы, нужен HF_TOKEN)
+    python manage.py bench-pdf [отчётов]
+                                   - отчётов PDF в секунду: рендер с нуля и прогретый рендер процесса
 """
 import sys
 import subprocess
@@ -64,6 +89,123 @@ def main():
         parse_and_save_law()
         print("✅ Парсинг завершён!")
     
+    elif command == "ingest-law":
+        # Распределённая загрузка: координатор в очереди ingestion раздаёт главы воркерам
+        from backend.app.workers.queue import ingest_queue
+        from backend.app.workers.law_ingest import start_law_ingestion
+        job = ingest_queue.enqueue(start_law_ingestion, job_timeout="5m")
+        print(f"📨 Загрузка закона поставлена в очередь: задача {job.id}")
+    
+    elif command == "queues":
+        # Сколько задач ждёт и выполняется в каждом классе очередей
+        from backend.app.workers.queue import queue_depths
+        for name, depth in queue_depths().items():
+            print(
+                f"📬 {name} ({depth['queue']}): ждут {depth['queued']}, выполняются {depth['started']}, "
+                f"ждут зависимостей {depth['deferred']}, упали {depth['failed']}, воркеров {depth['workers']}"
+            )
+        from backend.app.services.dedup import dedup_stats
+        dedup = dedup_stats()
+        print(f"🔁 Дедупликация: присоединено {dedup['attached']} из {dedup['submitted']} ({dedup['dedup_rate']:.1%})")
+    
+    elif command == "webhooks-dead":
+        # Вебхуки, не доставленные после всех повторов
+        from backend.app.workers.webhooks import dead_letters, requeue_dead_letters
+        if "--requeue" in sys.argv[2:]:
+            print(f"📨 Поставлено на доставку заново: {requeue_dead_letters()}")
+        else:
+            letters = dead_letters()
+            if not letters:
+                print("✅ Недоставленных вебхуков нет")
+            for letter in letters:
+                print(f"❌ {letter['payload'].get('job_id')} → {letter['url']}: {letter['error']}")
+    
+    elif command == "worker-overhead":
+        # Сравнение форкающего и прогретого воркера по последним проверкам
+        from backend.app.workers.warmup import startup_overhead_stats
+        stats = startup_overhead_stats()
+        if not stats:
+            print("ℹ️ Замеров пока нет")
+        for mode, s in stats.items():
+            print(f"⏱️ {mode}: {s['count']} задач, медиана {s['p50']:.1f} мс, p95 {s['p95']:.1f} мс, максимум {s['max']:.1f} мс")
+    
+    elif command == "law-export":
+        # Снапшот активной версии закона (gzip JSONL)
+        from backend.app.settings import settings
+        from backend.app.services.law_snapshot import export_snapshot
+        path = sys.argv[2] if len(sys.argv) > 2 else settings.LAW_SNAPSHOT_PATH
+        export_snapshot(path)
+    
+    elif command == "law-import":
+        # Загрузка закона из снапшота вместо обхода сайта
+        from backend.app.settings import settings
+        from backend.app.services.law_snapshot import import_snapshot
+        args = [arg for arg in sys.argv[2:] if arg != "--if-empty"]
+        path = args[0] if args else settings.LAW_SNAPSHOT_PATH
+        if not Path(path).exists():
+            print(f"ℹ️ Снапшот {path} не найден, пропускаю")
+            sys.exit(0)
+        import_snapshot(path, if_empty="--if-empty" in sys.argv[2:])
+    
+    elif command == "reparse":
+        # Пересборка версии закона из архива сырых страниц
+        from datetime import datetime
+        from backend.app.services.law_parser import reparse_from_archive
+        at = datetime.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        print("♻️ Пересобираю закон из архива страниц...")
+        version_id = reparse_from_archive(at, workers)
+        print(f"✅ Готово, версия ID={version_id}")
+    
+    elif command == "bench-ingest":
+        # Сравнение построчной и массовой записи закона в БД
+        from backend.app.services.benchmarks import bench_law_ingestion
+        chapters = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        articles = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        bench_law_ingestion(chapters, articles)
+    
+    elif command == "bench-parser":
+        # Сверка lxml-парсера с BeautifulSoup на записанных страницах
+        from backend.app.services.benchmarks import bench_article_parser
+        if len(sys.argv) > 2:
+            pages = {
+                path.name: path.read_text(encoding="utf-8")
+                for path in sorted(Path(sys.argv[2]).glob("*.html"))
+            }
+        else:
+            from backend.app.services.law_archive import archive
+            pages = {url: archive.read(digest) for url, digest in archive.snapshot().items()}
+        bench_article_parser(pages)
+    
+    elif command == "parser-fixtures":
+        # Записанный корпус для тестов парсера: реальные страницы из архива + ожидаемый результат
+        from backend.app.services.law_archive import archive
+        limit = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+        dest = sys.argv[3] if len(sys.argv) > 3 else "tests/fixtures/law_pages/recorded"
+        names = archive.export(dest, limit)
+        if not names:
+            print(f"❌ Архив страниц {archive.root} пуст — сначала python manage.py parse-law")
+            sys.exit(1)
+        print(f"📥 Выгружено {len(names)} страниц в {dest}")
+        subprocess.run([sys.executable, "-m", "tests.test_law_page_parser"], check=True)
+    
+    elif command == "bench-llm-batch":
+        # Пакетная классификация коротких объявлений против запроса на объявление
+        from backend.app.services.benchmarks import bench_llm_batching
+        from backend.app.services.batch import parse_corpus
+        args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+        ad_texts = None
+        if args:
+            path = Path(args[0])
+            ad_texts = [item["text"] for item in parse_corpus(path.read_bytes(), path.name)]
+        bench_llm_batching(ad_texts, live="--live" in sys.argv)
+    
+    elif command == "bench-pdf":
+        # Прогретый рендер PDF (шрифты и стили один раз) против рендера с нуля
+        from backend.app.services.benchmarks import bench_pdf_rendering
+        reports = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        bench_pdf_rendering(reports=reports)
+    
     else:
         print(f"❌ Неизвестная команда: {command}")
         print(__doc__)
@@ -1,9 +1,16 @@
 import os
+import copy
 import json
 import re
+import time
+import asyncio
 import requests
-from huggingface_hub import InferenceClient
+import aiohttp
+from huggingface_hub import InferenceClient, AsyncInferenceClient
+from huggingface_hub.errors import InferenceTimeoutError
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 from ml.dictionaries import *
 
@@ -11,6 +18,28 @@ from ml.dictionaries import *
 Модуль поиска нарушений в текстовой рекламе
 """
 
+# Поддерживаемые форматы аудио
+AUDIO_MIME_TYPES = ['audio/mpeg', 'audio/flac', 'audio/wav', 'audio/webm', 'audio/ogg', 'audio/mp4', 'audio/m4a',
+                    'audio/amr']
+
+# Пакетная классификация: бюджет токенов на запрос (промпт + ожидаемый ответ),
+# максимум объявлений в запросе и длина объявления, которое ещё считается коротким
+LLM_BATCH_TOKEN_BUDGET = int(os.environ.get("LLM_BATCH_TOKEN_BUDGET", 8000))
+LLM_BATCH_MAX_ADS = int(os.environ.get("LLM_BATCH_MAX_ADS", 8))
+LLM_BATCH_MAX_AD_CHARS = int(os.environ.get("LLM_BATCH_MAX_AD_CHARS", 1000))
+# Грубая оценка токенов для русского текста и длины ответа на все вопросы по одному объявлению
+CHARS_PER_TOKEN = 3
+ANSWER_TOKENS_PER_QUESTION = 30
+
+# Таймауты запросов (с), если вызывающий не передал свой — долю срока проверки
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", 120))
+ASR_TIMEOUT_SECONDS = float(os.environ.get("ASR_TIMEOUT_SECONDS", 120))
+# Исключения, которыми запросы к LLM и ASR сообщают, что не уложились в таймаут
+TIMEOUT_ERRORS = (requests.Timeout, InferenceTimeoutError, TimeoutError, asyncio.TimeoutError, aiohttp.ServerTimeoutError)
+
+# Расход LLM в процессе: запросы и токены (по usage из ответов)
+LLM_USAGE = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "batch_fallbacks": 0}
+
 
 def form_prompt(ad_text: str) -> str:
     """
@@ -29,31 +58,69 @@ def form_prompt(ad_text: str) -> str:
     '''
 
 
-def get_questions_answers(ad_text: str) -> list:
+def form_batch_prompt(ad_texts: list) -> str:
     """
-    Классификация нарушений в тексте рекламы по вопросам
-    :param ad_text: текст рекламы
-    :return: list вида [{"номер вопроса": "...", "ответ": "ДА/НЕТ", "рекомендация": "..."}]
+    Формирует промпт для нескольких объявлений: инструкция и вопросы — один раз
+    :param ad_texts: тексты рекламы
+    :return: str - текст запроса к LLM
     """
 
-    client = InferenceClient(
-        token=os.environ["HF_TOKEN"],
-        provider='novita'
-    )
+    ads = '\n'.join([f'Реклама {n}: {ad_text}' for n, ad_text in enumerate(ad_texts, start=1)])
+    return f'''
+        Ты — эксперт по законодательству о рекламе Российской Федерации. Проанализируй каждый текст рекламы отдельно и ответь на каждый вопрос строго «ДА» или «НЕТ». 
+        Если ответ «ДА», обязательно добавь краткую рекомендацию, как устранить нарушение. Если нарушение отсутствует, ответь «НЕТ» без рекомендации.
+        Руководствуйся пояснениями к каждому вопросу, чтобы не путать похожие вопросы. Обрати внимание, что есть вопросы на одну тему, но в каждом вопросе своя специфика.
+        Формат ответа — JSON-объект, где ключ — номер рекламы, а значение — JSON-список вида: {{"номер вопроса": "int", "ответ": "ДА/НЕТ", "рекомендация": "..."}}
+        Тексты рекламы:
+        {ads}
+        Вопросы с пояснениями: {' '.join([f'{n}. {q_text}' for n, q_text in QUESTIONS.items()])}
+    '''
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Грубая оценка числа токенов текста
+    :param text: текст
+    :return: int - число токенов
+    """
+
+    return len(text) // CHARS_PER_TOKEN + 1
 
-    # Отправка запроса
-    response = client.chat.completions.create(
-        model=os.environ["MODEL_TEXT"],
-        messages=[
-            {
-                "role": "user",
-                "content": form_prompt(ad_text)
-            }
-        ],
-    )
+
+def plan_batches(ad_texts: list, token_budget: int = LLM_BATCH_TOKEN_BUDGET,
+                 max_ads: int = LLM_BATCH_MAX_ADS) -> list:
+    """
+    Разбивка объявлений на пакеты под бюджет токенов: общая часть промпта
+    считается один раз, на каждое объявление — его текст и ответ на все вопросы
+    :param ad_texts: тексты рекламы
+    :param token_budget: бюджет токенов на запрос
+    :param max_ads: максимум объявлений в запросе
+    :return: list - списки индексов объявлений, по списку на запрос
+    """
+
+    overhead = estimate_tokens(form_batch_prompt([]))
+    answer_tokens = len(QUESTIONS) * ANSWER_TOKENS_PER_QUESTION
+    batches, current, used = [], [], overhead
+    for i, ad_text in enumerate(ad_texts):
+        cost = estimate_tokens(ad_text) + answer_tokens
+        if current and (used + cost > token_budget or len(current) >= max_ads):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_answers(json_answers: str) -> list:
+    """
+    Разбор ответа LLM в список ответов на вопросы
+    :param json_answers: текст ответа LLM
+    :return: list вида [{"номер вопроса": "...", "ответ": "ДА/НЕТ", "рекомендация": "..."}]
+    """
 
     # Очистка ответа
-    json_answers = response.choices[0].message.content
     json_answers = re.sub(r"^```json\s*|\s*```$", "", json_answers.strip())
 
     # Преобразование в list
@@ -63,19 +130,249 @@ def get_questions_answers(ad_text: str) -> list:
     except json.JSONDecodeError:
         return []
 
+    return filter_answers(data)
+
+
+def filter_answers(data) -> list:
+    """
+    Отбор корректных ответов на вопросы
+    :param data: разобранный ответ LLM
+    :return: list - ответы с номером вопроса, ответом и рекомендацией
+    """
+
+    if not isinstance(data, list):
+        return []
+
     # Убираем некорректные вопросы
     correct_data = []
     for item in data:
-        if all(k in item for k in ("номер вопроса", "ответ", "рекомендация")) \
+        if isinstance(item, dict) and all(k in item for k in ("номер вопроса", "ответ", "рекомендация")) \
                 and item['номер вопроса'] in QUESTIONS:
             correct_data.append(item)
     return correct_data
 
 
-def analyze_text(ad_text: str) -> list:
+def parse_batch_answers(json_answers: str, count: int) -> dict:
+    """
+    Разбор ответа LLM на пакет объявлений
+    :param json_answers: текст ответа LLM
+    :param count: число объявлений в пакете
+    :return: dict вида {индекс объявления (с 0): ответы (см. parse_answers)}, только разобранные
+    """
+
+    json_answers = re.sub(r"^```json\s*|\s*```$", "", json_answers.strip())
+    try:
+        data = json.loads(json_answers)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for key, answers in data.items():
+        try:
+            index = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        answers = filter_answers(answers)
+        if 0 <= index < count and answers:
+            parsed[index] = answers
+    return parsed
+
+
+def record_usage(response) -> None:
+    """
+    Учёт расхода LLM по ответу (запрос и токены, если провайдер их вернул)
+    :param response: ответ chat.completions
+    """
+
+    LLM_USAGE["requests"] += 1
+    usage = getattr(response, "usage", None)
+    if usage:
+        LLM_USAGE["prompt_tokens"] += usage.prompt_tokens or 0
+        LLM_USAGE["completion_tokens"] += usage.completion_tokens or 0
+
+
+@lru_cache(maxsize=1)
+def get_inference_client() -> InferenceClient:
+    """
+    Клиент HF Inference, один на процесс: в постоянном воркере
+    HTTP-соединения переиспользуются между проверками
+    :return: InferenceClient
+    """
+
+    return InferenceClient(
+        token=os.environ["HF_TOKEN"],
+        provider='novita'
+    )
+
+
+def get_timed_client(timeout: float = None) -> InferenceClient:
+    """
+    Общий клиент с другим таймаутом запроса: поверхностная копия, поэтому
+    HTTP-сессия та же, а у каждого вызова свой срок
+    :param timeout: таймаут запроса (с), None — LLM_TIMEOUT_SECONDS
+    :return: InferenceClient
+    """
+
+    client = copy.copy(get_inference_client())
+    client.timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    return client
+
+
+@lru_cache(maxsize=1)
+def get_call_pool() -> ThreadPoolExecutor:
+    """Потоки для запросов со сроком по часам (см. call_with_deadline); создаются в процессе задачи"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="ml-call")
+
+
+def call_with_deadline(timeout: float, fn, *args, **kwargs):
+    """
+    Вызов fn не дольше timeout секунд по часам. Таймаут requests и InferenceClient
+    ограничивает соединение и каждое чтение, а не весь запрос: медленный ответ
+    по частям растянулся бы дальше срока проверки. Запрос выполняется в потоке;
+    вышел срок — вызывающему TimeoutError, а поток завершится по таймауту чтения
+    :param timeout: срок (с); 0 и меньше — TimeoutError без запроса
+    :return: результат fn
+    """
+
+    if timeout <= 0:
+        raise TimeoutError('no time left for the request')
+    future = get_call_pool().submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        raise TimeoutError(f'request did not finish in {timeout:.1f}s') from None
+
+
+def get_questions_answers(ad_text: str, timeout: float = None) -> list:
+    """
+    Классификация нарушений в тексте рекламы по вопросам
+    :param ad_text: текст рекламы
+    :param timeout: срок запроса к LLM (с, по часам), None — LLM_TIMEOUT_SECONDS
+    :return: list вида [{"номер вопроса": "...", "ответ": "ДА/НЕТ", "рекомендация": "..."}]
+    """
+
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    client = get_timed_client(timeout)
+
+    # Отправка запроса
+    response = call_with_deadline(
+        timeout,
+        client.chat.completions.create,
+        model=os.environ["MODEL_TEXT"],
+        messages=[
+            {
+                "role": "user",
+                "content": form_prompt(ad_text)
+            }
+        ],
+    )
+    record_usage(response)
+
+    return parse_answers(response.choices[0].message.content)
+
+
+def get_questions_answers_batch(ad_texts: list, timeout: float = None) -> list:
+    """
+    Классификация нескольких коротких объявлений: пакеты под бюджет токенов,
+    по одному запросу к LLM на пакет. Объявления, ответ на которые не удалось
+    разобрать, классифицируются отдельными запросами
+    :param ad_texts: тексты рекламы
+    :param timeout: срок на все запросы (с); каждый запрос получает остаток срока,
+                    None — без общего срока, по LLM_TIMEOUT_SECONDS на запрос
+    :return: list - ответы на вопросы по каждому объявлению (см. get_questions_answers);
+                    None у объявлений, которые не успели классифицировать
+    """
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining():
+        return None if deadline is None else deadline - time.monotonic()
+
+    results = [None] * len(ad_texts)
+    try:
+        for batch in plan_batches(ad_texts):
+            if remaining() is not None and remaining() <= 0:
+                break
+            _classify_batch(ad_texts, batch, results, remaining)
+    except TIMEOUT_ERRORS as e:
+        # Срок вышел посреди запроса — что успели, то и возвращаем
+        print(f'LLM batch timed out: {e}')
+    return results
+
+
+def _classify_batch(ad_texts: list, batch: list, results: list, remaining) -> None:
+    """
+    Один пакет объявлений из get_questions_answers_batch: ответы пишутся в results
+    :param ad_texts: тексты рекламы
+    :param batch: индексы объявлений пакета
+    :param results: ответы по каждому объявлению
+    :param remaining: функция без аргументов — остаток срока (с) на момент вызова или None (без срока)
+    """
+
+    # Остаток срока — перед каждым запросом: после долгого пакетного запроса его может не остаться,
+    # тогда TimeoutError, и уже собранные ответы остаются в results
+    if len(batch) == 1:
+        results[batch[0]] = get_questions_answers(ad_texts[batch[0]], timeout=remaining())
+        return
+
+    timeout = remaining()
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    response = call_with_deadline(
+        timeout,
+        get_timed_client(timeout).chat.completions.create,
+        model=os.environ["MODEL_TEXT"],
+        messages=[
+            {
+                "role": "user",
+                "content": form_batch_prompt([ad_texts[i] for i in batch])
+            }
+        ],
+    )
+    record_usage(response)
+    parsed = parse_batch_answers(response.choices[0].message.content, len(batch))
+
+    for position, i in enumerate(batch):
+        if position in parsed:
+            results[i] = parsed[position]
+        else:
+            # Ответ пакета не разобрался для этого объявления — отдельный запрос
+            print(f'Batch answer for ad {i} could not be parsed, falling back to a single request')
+            LLM_USAGE["batch_fallbacks"] += 1
+            results[i] = get_questions_answers(ad_texts[i], timeout=remaining())
+
+
+async def get_questions_answers_async(ad_text: str, timeout: float = None) -> list:
+    """
+    То же, что get_questions_answers, но без блокировки event loop
+    :param ad_text: текст рекламы
+    :param timeout: таймаут запроса к LLM (с), None — LLM_TIMEOUT_SECONDS
+    :return: list вида [{"номер вопроса": "...", "ответ": "ДА/НЕТ", "рекомендация": "..."}]
+    """
+
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    async with AsyncInferenceClient(token=os.environ["HF_TOKEN"], provider='novita', timeout=timeout) as client:
+        response = await client.chat.completions.create(
+            model=os.environ["MODEL_TEXT"],
+            messages=[
+                {
+                    "role": "user",
+                    "content": form_prompt(ad_text)
+                }
+            ],
+        )
+    record_usage(response)
+
+    return parse_answers(response.choices[0].message.content)
+
+
+def analyze_text(ad_text: str, timeout: float = None) -> list:
     """
     Поиск нарушений 5 статьи ФЗ в тексте рекламы
     :param ad_text: текст рекламы
+    :param timeout: таймаут запроса к LLM (с), None — LLM_TIMEOUT_SECONDS
     :return: list - список нарушений вида ["N часть 5 статьи ФЗ": {
                 "text": "текст N части 5 статьи ФЗ",
                 "recommendations": "сгенерированные рекомендации",
@@ -84,7 +381,39 @@ def analyze_text(ad_text: str) -> list:
     """
 
     # Получаем ответы на вопросы от LLM
-    data = get_questions_answers(ad_text)
+    return answers_to_violations(get_questions_answers(ad_text, timeout=timeout))
+
+
+def analyze_texts(ad_texts: list, timeout: float = None) -> list:
+    """
+    Поиск нарушений 5 статьи ФЗ в нескольких коротких объявлениях пакетными запросами
+    :param ad_texts: тексты рекламы
+    :param timeout: срок на все запросы (с), см. get_questions_answers_batch
+    :return: list - списки нарушений по каждому объявлению (см. analyze_text);
+                    None у объявлений, которые не успели проверить
+    """
+
+    return [None if answers is None else answers_to_violations(answers)
+            for answers in get_questions_answers_batch(ad_texts, timeout=timeout)]
+
+
+async def analyze_text_async(ad_text: str, timeout: float = None) -> list:
+    """
+    Асинхронный вариант analyze_text
+    :param ad_text: текст рекламы
+    :param timeout: таймаут запроса к LLM (с), None — LLM_TIMEOUT_SECONDS
+    :return: list - список нарушений (см. analyze_text)
+    """
+
+    return answers_to_violations(await get_questions_answers_async(ad_text, timeout=timeout))
+
+
+def answers_to_violations(data: list) -> list:
+    """
+    Группировка ответов LLM по частям 5 статьи ФЗ
+    :param data: ответы на вопросы (см. get_questions_answers)
+    :return: list - список нарушений (см. analyze_text)
+    """
 
     # Реклама правильная / Не удалось распознать ответ LLM
     if not data:
@@ -120,25 +449,23 @@ def analyze_text(ad_text: str) -> list:
     return result
 
 
-def analyze_audio(audio: bytes, mime_type: str) -> list:
+def transcribe_audio(audio: bytes, mime_type: str, timeout: float = None) -> str | None:
     """
-    Поиск нарушений 5 статьи ФЗ в аудио рекламе
+    Распознавание речи в аудио рекламе
     :param audio: аудио в байтах
     :param mime_type: тип аудио ('audio/mpeg', 'audio/flac', 'audio/wav' или другой)
-    :return: list - список нарушений вида ["N часть 5 статьи ФЗ": {
-                "text": "текст N части 5 статьи ФЗ",
-                "recommendations": "сгенерированные рекомендации",
-                "judicial_proceedings": "сопутствующие дела из судебной практики"
-            }]
+    :param timeout: срок запроса (с, по часам — см. call_with_deadline), None — ASR_TIMEOUT_SECONDS
+    :return: str - текст рекламы или None, если ответ не удалось разобрать
     """
-    assert mime_type in ['audio/mpeg', 'audio/flac', 'audio/wav', 'audio/webm', 'audio/ogg', 'audio/mp4', 'audio/m4a',
-                         'audio/amr'], ValueError('got incorrect audio type')
+    assert mime_type in AUDIO_MIME_TYPES, ValueError('got incorrect audio type')
 
     headers = {
         "Authorization": f"Bearer {os.environ['HF_TOKEN']}",
     }
 
-    response = requests.post(os.environ["AUDIO_API_URL"], headers={"Content-Type": mime_type, **headers}, data=audio)
+    timeout = ASR_TIMEOUT_SECONDS if timeout is None else timeout
+    response = call_with_deadline(timeout, requests.post, os.environ["AUDIO_API_URL"],
+                                  headers={"Content-Type": mime_type, **headers}, data=audio, timeout=timeout)
 
     # Преобразование в json
     try:
@@ -146,7 +473,71 @@ def analyze_audio(audio: bytes, mime_type: str) -> list:
     # Ошибка преобразования в json
     except json.JSONDecodeError:
         print('Could not convert to json response from HF')
-        return []
+        return None
+
+    return response['text']
+
+
+async def transcribe_audio_async(audio: bytes, mime_type: str, timeout: float = None) -> str | None:
+    """
+    Асинхронный вариант transcribe_audio
+    :param audio: аудио в байтах
+    :param mime_type: тип аудио
+    :param timeout: срок запроса (с, ClientTimeout total — по часам), None — ASR_TIMEOUT_SECONDS
+    :return: str - текст рекламы или None (см. transcribe_audio)
+    """
+    assert mime_type in AUDIO_MIME_TYPES, ValueError('got incorrect audio type')
+
+    headers = {
+        "Authorization": f"Bearer {os.environ['HF_TOKEN']}",
+    }
+
+    client_timeout = aiohttp.ClientTimeout(total=ASR_TIMEOUT_SECONDS if timeout is None else timeout)
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        async with session.post(os.environ["AUDIO_API_URL"], headers={"Content-Type": mime_type, **headers},
+                                data=audio) as response:
+            # Преобразование в json
+            try:
+                response = await response.json(content_type=None)
+            # Ошибка преобразования в json
+            except json.JSONDecodeError:
+                print('Could not convert to json response from HF')
+                return None
+
+    return response['text']
 
-    ad_text = response['text']
+
+def analyze_audio(audio: bytes, mime_type: str, check_cancelled=None) -> list:
+    """
+    Поиск нарушений 5 статьи ФЗ в аудио рекламе
+    :param audio: аудио в байтах
+    :param mime_type: тип аудио ('audio/mpeg', 'audio/flac', 'audio/wav' или другой)
+    :param check_cancelled: вызывается после распознавания речи, до запроса к LLM;
+                            прерывает анализ исключением, если проверку отменили
+    :return: list - список нарушений вида ["N часть 5 статьи ФЗ": {
+                "text": "текст N части 5 статьи ФЗ",
+                "recommendations": "сгенерированные рекомендации",
+                "judicial_proceedings": "сопутствующие дела из судебной практики"
+            }]
+    """
+
+    ad_text = transcribe_audio(audio, mime_type)
+    if ad_text is None:
+        return []
+    if check_cancelled:
+        check_cancelled()
     return analyze_text(ad_text)
+
+
+async def analyze_audio_async(audio: bytes, mime_type: str) -> list:
+    """
+    Асинхронный вариант analyze_audio
+    :param audio: аудио в байтах
+    :param mime_type: тип аудио
+    :return: list - список нарушений (см. analyze_audio)
+    """
+
+    ad_text = await transcribe_audio_async(audio, mime_type)
+    if ad_text is None:
+        return []
+    return await analyze_text_async(ad_text)
@@ -0,0 +1,9 @@
+"""
+Общие настройки тестов: модули backend читают настройки при импорте,
+поэтому обязательные переменные окружения задаются до них.
+Тестам не нужны ни PostgreSQL, ни Redis.
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
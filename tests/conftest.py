@@ -0,0 +1,46 @@
+"""Общие фикстуры тестов"""
+import pytest
+
+
+@pytest.fixture
+def fake_redis_server():
+    """Один сервер Redis в памяти (fakeredis) для синхронных и асинхронных клиентов теста"""
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def fake_redis(fake_redis_server, monkeypatch):
+    """
+    Redis в памяти вместо сервера из настроек.
+    Модули, которые держат свою ссылку на клиент, тест подменяет сам:
+    monkeypatch.setattr(module, "redis", fake_redis).
+    """
+    import fakeredis
+    from backend.app.workers import queue
+
+    client = fakeredis.FakeRedis(server=fake_redis_server)
+    monkeypatch.setattr(queue, "redis", client)
+    return client
+
+
+@pytest.fixture
+def fake_async_redis(fake_redis_server):
+    """Асинхронный клиент того же сервера (вместо async_redis модулей)"""
+    import fakeredis
+
+    return fakeredis.aioredis.FakeRedis(server=fake_redis_server)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="запустить бенчмарки (замер времени)")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Бенчмарки сравнивают время по часам и на общем CI нестабильны — только с --benchmark"""
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="бенчмарк: python -m pytest --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
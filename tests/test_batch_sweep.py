@@ -0,0 +1,78 @@
+"""Пакет завершается, даже если задачи проверок умерли без callback (workers/batch.py sweep_batch)"""
+import asyncio
+import json
+
+import pytest
+from rq import Queue
+
+from backend.app.services import batch as batch_service, check_submission, dedup
+from backend.app.workers import batch, cancellation
+
+
+@pytest.fixture
+def redis(fake_redis, monkeypatch):
+    for module in (batch, dedup, check_submission, cancellation):
+        monkeypatch.setattr(module, "redis", fake_redis)
+    return fake_redis
+
+
+def make_batch(redis, jobs):
+    """Пакет из len(jobs) проверок; jobs — ID задачи каждой проверки"""
+    redis.hset(batch.batch_key("b1"), mapping={"status": "running", "total": len(jobs), "done": 0, "failed": 0})
+    redis.rpush(batch.items_key("b1"), *[json.dumps({"id": f"ad{i}", "text": "t"}) for i in range(len(jobs))])
+    redis.hset(batch.jobs_key("b1"), mapping=dict(enumerate(jobs)))
+
+
+def lines(redis):
+    return [json.loads(raw) for raw in redis.lrange(batch.results_key("b1"), 0, -1)]
+
+
+def test_dead_children_recorded_as_failed(redis):
+    queue = Queue("checks-bulk-test", connection=redis)
+    killed = queue.enqueue(print, "x", job_id="b1-1")
+    killed.set_status("failed")  # воркер убит: RQ пометил задачу, callback не вызывался
+    queue.enqueue(print, "y", job_id="b1-2")  # ещё в очереди
+    make_batch(redis, ["b1-0", "b1-1", "b1-2"])  # b1-0 — задачи нет совсем
+
+    assert batch.sweep_batch("b1") == 2
+    assert sorted((line["index"], line["status"]) for line in lines(redis)) == [(0, "failed"), (1, "failed")]
+    assert redis.hget(batch.batch_key("b1"), "status") == b"running"
+
+    redis.delete("rq:job:b1-2")
+    assert batch.sweep_batch("b1") == 1
+    assert redis.hget(batch.batch_key("b1"), "status") == b"finished"
+    assert batch.sweep_batch("b1") == 0
+
+
+def test_fresh_claim_not_swept(redis):
+    redis.set(dedup.claimed_key("b1-0"), 1)  # закреплена, но ещё не поставлена
+    make_batch(redis, ["b1-0"])
+    assert batch.sweep_batch("b1") == 0
+    assert lines(redis) == []
+
+
+def test_stream_finishes_without_callbacks(redis, fake_async_redis, monkeypatch):
+    monkeypatch.setattr(batch_service, "async_redis", fake_async_redis)
+    monkeypatch.setattr(batch_service, "STREAM_IDLE_TIMEOUT", 0.05)
+    monkeypatch.setattr(batch_service, "STREAM_SWEEP_SECONDS", 0)
+    make_batch(redis, ["b1-0", "b1-1"])
+
+    async def read():
+        return [json.loads(line) async for line in batch_service.stream_batch_results("b1")]
+
+    streamed = asyncio.run(asyncio.wait_for(read(), timeout=5))
+    assert [line["status"] for line in streamed] == ["failed", "failed"]
+
+
+def test_stream_closes_when_idle(redis, fake_async_redis, monkeypatch):
+    monkeypatch.setattr(batch_service, "async_redis", fake_async_redis)
+    monkeypatch.setattr(batch_service, "STREAM_IDLE_TIMEOUT", 0.05)
+    monkeypatch.setattr(batch_service, "STREAM_MAX_IDLE_SECONDS", 0.2)
+    Queue("checks-bulk-test", connection=redis).enqueue(print, "x", job_id="b1-0")  # в очереди и не движется
+    make_batch(redis, ["b1-0"])
+
+    async def read():
+        return [line async for line in batch_service.stream_batch_results("b1")]
+
+    assert asyncio.run(asyncio.wait_for(read(), timeout=5)) == []
+    assert redis.hget(batch.batch_key("b1"), "status") == b"running"
@@ -0,0 +1,32 @@
+"""Отмена проверки клиентом (workers/cancellation.py): отписывается только он и только один раз"""
+import pytest
+from rq import Queue
+
+from backend.app.workers import batch, cancellation, check_events, webhooks
+
+
+@pytest.fixture
+def job(fake_redis, monkeypatch):
+    """Проверка в очереди, которую ждут клиенты a и b"""
+    for module in (cancellation, batch, check_events, webhooks):
+        monkeypatch.setattr(module, "redis", fake_redis)
+    job = Queue("checks-test", connection=fake_redis).enqueue(print, "x")
+    cancellation.add_watcher(job.id, "a")
+    cancellation.add_watcher(job.id, "b")
+    return job
+
+
+def test_repeated_cancel_detaches_only_caller(job):
+    assert cancellation.cancel_check(job.id, "a")["status"] == "detached"
+    assert cancellation.cancel_check(job.id, "a")["status"] == "detached"
+    assert not cancellation.is_cancelled(job.id)
+
+    result = cancellation.cancel_check(job.id, "b")
+    assert result["status"] == "cancelled" and result["was"] == "queued"
+    assert cancellation.is_cancelled(job.id)
+
+
+def test_stranger_cannot_cancel_watched_check(job):
+    assert cancellation.cancel_check(job.id, "c")["status"] == "detached"
+    assert cancellation.cancel_check(job.id, "c")["status"] == "detached"
+    assert job.connection.smembers(cancellation.watchers_key(job.id)) == {b"a", b"b"}
@@ -0,0 +1,58 @@
+"""Срок запросов к LLM в пакетной классификации (ml.classifiers)"""
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ml import classifiers
+from ml.dictionaries import QUESTIONS
+
+
+QUESTION = next(iter(QUESTIONS))
+ANSWER = [{"номер вопроса": QUESTION, "ответ": "НЕТ", "рекомендация": ""}]
+
+
+class SlowClient:
+    """LLM, отвечающая через delay секунд: на пакет — только по первому объявлению"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        self.calls += 1
+        time.sleep(self.delay)
+        prompt = messages[0]["content"]
+        content = json.dumps({"1": ANSWER} if "Объявление" in prompt else ANSWER, ensure_ascii=False)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+@pytest.fixture
+def slow_client(monkeypatch):
+    client = SlowClient(delay=0.2)
+    monkeypatch.setenv("MODEL_TEXT", "test-model")
+    monkeypatch.setattr(classifiers, "get_timed_client", lambda timeout=None: client)
+    monkeypatch.setattr(classifiers, "form_batch_prompt", lambda texts: "Объявление " * len(texts))
+    return client
+
+
+def test_no_time_left_is_timeout():
+    with pytest.raises(TimeoutError):
+        classifiers.call_with_deadline(0, pytest.fail, "запрос без срока")
+    with pytest.raises(TimeoutError):
+        classifiers.call_with_deadline(-1.5, pytest.fail, "запрос без срока")
+
+
+def test_wall_clock_deadline():
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        classifiers.call_with_deadline(0.1, time.sleep, 1)
+    assert time.monotonic() - started < 0.5
+
+
+def test_batch_keeps_answers_when_fallback_runs_out_of_time(slow_client):
+    # Пакет ответил только по первому объявлению; на отдельный запрос времени уже не хватает
+    results = classifiers.get_questions_answers_batch(["реклама 1", "реклама 2", "реклама 3"], timeout=0.3)
+    assert results == [ANSWER, None, None]
@@ -0,0 +1,118 @@
+"""
+Парсер страниц статей (law_page_parser): результат совпадает с эталонной
+BeautifulSoup-версией и с записанным результатом.
+
+Корпуса в tests/fixtures/law_pages:
+    recorded  — реальные страницы сайта из архива (python manage.py parser-fixtures),
+    synthetic — небольшие страницы в разметке сайта на крайние случаи
+                (нет области контента, заголовок из <title>, <pre>, сущности).
+
+Перезаписать ожидаемый результат после намеренного изменения парсинга:
+    python -m tests.test_law_page_parser
+Сравнение скорости — бенчмарк, запускается явно: python -m pytest --benchmark
+"""
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from backend.app.services.law_page_parser import parse_article_page_lxml
+from backend.app.services.law_parser import LAW_BASE_URL, parse_article_page, parse_article_page_bs4
+
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "law_pages"
+CORPORA = ("recorded", "synthetic")
+
+BENCH_ROUNDS = 5
+BENCH_REPEAT = 20  # корпус маленький — разбираем его несколько раз за раунд
+MIN_SPEEDUP = 2.0
+
+
+def page_urls(corpus: str) -> dict:
+    """Имя файла → URL страницы; у синтетических страниц URL условный"""
+    corpus_dir = FIXTURES_DIR / corpus
+    urls_path = corpus_dir / "urls.json"
+    urls = json.loads(urls_path.read_text(encoding="utf-8")) if urls_path.exists() else {}
+    return {
+        path.name: urls.get(path.name, f"{LAW_BASE_URL}{path.stem}/")
+        for path in sorted(corpus_dir.glob("*.html"))
+    }
+
+
+def load_page(corpus: str, name: str):
+    """HTML записанной страницы и её URL"""
+    return (FIXTURES_DIR / corpus / name).read_text(encoding="utf-8"), page_urls(corpus)[name]
+
+
+def load_expected(corpus: str) -> dict:
+    path = FIXTURES_DIR / corpus / "expected.json"
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+PAGES = [
+    pytest.param(corpus, name, id=f"{corpus}/{name}")
+    for corpus in CORPORA
+    for name in page_urls(corpus)
+]
+
+
+def test_corpora_recorded():
+    for corpus in CORPORA:
+        assert sorted(load_expected(corpus)) == sorted(page_urls(corpus)), f"{corpus}: перезапишите expected.json"
+
+
+def test_recorded_corpus_present():
+    if not page_urls("recorded"):
+        pytest.skip("Нет записанных страниц сайта: python manage.py parser-fixtures (нужен архив страниц)")
+
+
+@pytest.mark.parametrize("corpus, name", PAGES)
+def test_matches_bs4(corpus, name):
+    html, url = load_page(corpus, name)
+    assert parse_article_page(html, url) == parse_article_page_bs4(html, url)
+
+
+@pytest.mark.parametrize("corpus, name", PAGES)
+def test_matches_recorded_output(corpus, name):
+    html, url = load_page(corpus, name)
+    assert parse_article_page(html, url) == load_expected(corpus)[name]
+
+
+def test_lxml_path_used():
+    """Страницы с областью контента разбирает lxml-версия, остальные — BeautifulSoup"""
+    fallback = [name for name in page_urls("synthetic") if parse_article_page_lxml(*load_page("synthetic", name)) is None]
+    assert fallback == ["bare_page.html"]
+
+
+def best_time(parse, pages) -> float:
+    """Лучшее время разбора корпуса из BENCH_ROUNDS раундов (с)"""
+    best = float("inf")
+    for _ in range(BENCH_ROUNDS):
+        started = time.perf_counter()
+        for _ in range(BENCH_REPEAT):
+            for html, url in pages:
+                parse(html, url)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+@pytest.mark.benchmark
+def test_faster_than_bs4():
+    pages = [load_page(corpus, name) for corpus in CORPORA for name in page_urls(corpus)]
+    bs4_seconds = best_time(parse_article_page_bs4, pages)
+    lxml_seconds = best_time(parse_article_page, pages)
+    print(f"\nbs4 {bs4_seconds * 1000:.1f} мс, lxml {lxml_seconds * 1000:.1f} мс, x{bs4_seconds / lxml_seconds:.1f}")
+    assert bs4_seconds / lxml_seconds >= MIN_SPEEDUP
+
+
+if __name__ == "__main__":
+    # Ожидаемый результат записывается эталонной BeautifulSoup-версией
+    for corpus in CORPORA:
+        urls = page_urls(corpus)
+        if not urls:
+            continue
+        recorded = {name: parse_article_page_bs4(*load_page(corpus, name)) for name in urls}
+        path = FIXTURES_DIR / corpus / "expected.json"
+        path.write_text(json.dumps(recorded, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"✅ {corpus}: записан результат разбора {len(recorded)} страниц: {path}")
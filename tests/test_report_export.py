@@ -0,0 +1,79 @@
+"""Выгрузка отчётов за период (report_export.py) — по времени завершения проверки, включая проверки без PDF"""
+import asyncio
+import io
+import time
+import zipfile
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app.services import dedup, report_export
+from backend.app.workers import batch, reports
+
+
+REPORT = {"violations": [], "summary": "ok"}
+
+
+@pytest.fixture
+def redis(fake_redis, fake_async_redis, monkeypatch):
+    for module in (reports, batch, dedup):
+        monkeypatch.setattr(module, "redis", fake_redis)
+    monkeypatch.setattr(report_export, "async_redis", fake_async_redis)
+    return fake_redis
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Рендер по требованию без пула процессов: ID отчётов, которые пришлось отрендерить"""
+    calls = []
+
+    async def render(report_id, report):
+        calls.append((report_id, report))
+        return b"%PDF " + report_id.encode(), '"etag"'
+
+    monkeypatch.setattr(report_export, "render_pdf_on_demand", render)
+    return calls
+
+
+def export(date_from=None, date_to=None):
+    async def read():
+        return b"".join([chunk async for chunk in report_export.stream_reports_zip(
+            report_export.period_report_entries(date_from, date_to),
+        )])
+    with zipfile.ZipFile(io.BytesIO(asyncio.run(read()))) as archive:
+        return {name.split("_", 2)[2]: archive.read(name) for name in archive.namelist()}
+
+
+def test_render_does_not_move_completion_date(redis):
+    reports.record_report("j1", REPORT)
+    completed_at = redis.zscore(reports.REPORT_INDEX_KEY, "j1")
+    time.sleep(0.01)
+    reports.store_pdf("j1", b"%PDF")
+    reports.record_report("j1", REPORT)
+    assert redis.zscore(reports.REPORT_INDEX_KEY, "j1") == completed_at
+
+
+def test_period_includes_checks_without_pdf(redis, rendered):
+    reports.record_report("j1", REPORT)
+    reports.store_pdf("j1", b"%PDF ready")
+    # Групповая задача пакета: отчёты под ID строк пакета, PDF заранее не рендерится
+    group = SimpleNamespace(id="b1-g0", args=(["a", "b"],), meta={"batch_id": "b1", "indexes": [[0, 2], [1]]})
+    batch.on_group_success(group, None, [REPORT, {**REPORT, "summary": "b"}])
+
+    files = export(date.today(), date.today())
+    assert files == {
+        "j1.pdf": b"%PDF ready",
+        "b1-0.pdf": b"%PDF b1-0",
+        "b1-1.pdf": b"%PDF b1-1",
+        "b1-2.pdf": b"%PDF b1-2",
+    }
+    assert sorted(report_id for report_id, _ in rendered) == ["b1-0", "b1-1", "b1-2"]
+    assert dict(rendered)["b1-1"]["summary"] == "b"
+
+
+def test_period_bounds(redis, rendered):
+    reports.record_report("j1", REPORT)
+    assert export(date.today() + timedelta(days=1)) == {}
+    assert export(date_to=date.today() - timedelta(days=1)) == {}
+    assert list(export(date_to=date.today())) == ["j1.pdf"]
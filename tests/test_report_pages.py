@@ -0,0 +1,45 @@
+"""Кэш страниц отчётов о проверке (report_pages.py, /v2/check/result/{id})"""
+import pytest
+from fastapi.testclient import TestClient
+from rq import Queue, SimpleWorker
+
+from backend.app.main import app
+from backend.app.services import report_pages
+from backend.app.services.benchmarks import _bench_report
+
+
+@pytest.fixture
+def finished_job(fake_redis, monkeypatch):
+    """ID завершённой проверки с отчётом на 3 нарушения"""
+    monkeypatch.setattr(report_pages, "redis", fake_redis)
+    queue = Queue("checks-test", connection=fake_redis)
+    job = queue.enqueue(_bench_report, 3)
+    SimpleWorker([queue], connection=fake_redis).work(burst=True)
+    return job.id
+
+
+def test_repeat_view_served_from_cache(finished_job, monkeypatch):
+    client = TestClient(app)
+    first = client.get(f"/v2/check/result/{finished_job}", follow_redirects=False)
+    assert first.status_code == 200 and first.headers["etag"]
+
+    # Второй просмотр не обращается к задаче RQ
+    monkeypatch.setattr("rq.job.Job.fetch", lambda *args, **kwargs: pytest.fail("Job.fetch при попадании в кэш"))
+    second = client.get(f"/v2/check/result/{finished_job}", follow_redirects=False)
+    assert second.content == first.content
+    assert second.headers["etag"] == first.headers["etag"]
+
+    not_modified = client.get(f"/v2/check/result/{finished_job}", headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304 and not not_modified.content
+
+
+def test_query_string_not_cached(finished_job):
+    client = TestClient(app)
+    marker = "подмена-поиска-1234"
+    first = client.get(f"/v2/check/result/{finished_job}", params={"q": marker}, follow_redirects=False)
+    assert first.status_code == 200
+    assert marker not in first.text
+
+    plain = client.get(f"/v2/check/result/{finished_job}", follow_redirects=False)
+    assert marker not in plain.text
+    assert plain.headers["etag"] == first.headers["etag"]
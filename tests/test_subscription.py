@@ -0,0 +1,27 @@
+"""Подписка и её месячный лимит — в Redis, общие для всех процессов (account_stub.py, quota.py)"""
+import pytest
+
+from backend.app.services import account_stub, quota
+from backend.app.settings import settings
+
+
+@pytest.fixture
+def redis(fake_redis, monkeypatch):
+    monkeypatch.setattr(quota, "redis", fake_redis)
+    return fake_redis
+
+
+def test_limit_shared_through_redis(redis):
+    account_stub.start_subscription(quota_month=250)
+    # Другой процесс видит только Redis
+    assert quota.load_subscription(account_stub.get_account()["id"])["quota_month"] == 250
+    assert account_stub.get_quota_month() == 250
+    assert account_stub.get_subscription()["plan"] == "Pro"
+
+
+def test_cancel_returns_free_limit(redis, monkeypatch):
+    monkeypatch.setattr(settings, "CHECKS_FREE_MONTH", 20)
+    account_stub.start_subscription(quota_month=250)
+    account_stub.cancel_subscription()
+    assert account_stub.get_subscription() is None
+    assert account_stub.get_quota_month() == 20
@@ -0,0 +1,141 @@
+"""Доставка вебхуков (workers/webhooks.py) на локальный http.server: подпись, повторы, dead letter, проверка адреса"""
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from rq import Queue, SimpleWorker
+
+from backend.app.settings import settings
+from backend.app.workers import webhooks
+
+
+class Receiver(BaseHTTPRequestHandler):
+    """Получатель вебхуков: первые fail_first запросов — 500, дальше — 200"""
+    fail_first = 0
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).requests.append((dict(self.headers), body))
+        self.send_response(500 if len(type(self).requests) <= type(self).fail_first else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    Receiver.requests = []
+    Receiver.fail_first = 0
+    server = HTTPServer(("127.0.0.1", 0), Receiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield Receiver, f"http://127.0.0.1:{server.server_port}/hook"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def redis(fake_redis, monkeypatch):
+    monkeypatch.setattr(webhooks, "redis", fake_redis)
+    monkeypatch.setattr(webhooks, "webhook_queue", Queue("webhooks", connection=fake_redis))
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOW_PRIVATE_HOSTS", True)
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_BASE_SECONDS", 0)  # повтор сразу, без планировщика
+    return fake_redis
+
+
+def deliver(redis, url):
+    webhooks.enqueue_delivery(url, {"event": "check.completed", "job_id": "j1", "result": {"ok": True}})
+    SimpleWorker([webhooks.webhook_queue], connection=redis).work(burst=True)
+
+
+def fake_dns(monkeypatch, address):
+    """Любое имя хоста разрешается в address"""
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (address, port))]
+    monkeypatch.setattr(webhooks.socket, "getaddrinfo", getaddrinfo)
+
+
+def test_signed_delivery(redis, receiver):
+    handler, url = receiver
+    deliver(redis, url)
+
+    (headers, body), = handler.requests
+    signature = headers[webhooks.SIGNATURE_HEADER].removeprefix("sha256=")
+    assert webhooks.verify_signature(body, headers[webhooks.TIMESTAMP_HEADER], signature)
+    assert json.loads(body)["job_id"] == "j1"
+    assert webhooks.dead_letters() == []
+
+
+def test_retried_until_delivered(redis, receiver):
+    handler, url = receiver
+    handler.fail_first = 2
+    deliver(redis, url)
+
+    assert len(handler.requests) == 3
+    assert webhooks.dead_letters() == []
+
+
+def test_dead_letter_after_last_retry(redis, receiver):
+    handler, url = receiver
+    handler.fail_first = 100
+    deliver(redis, url)
+
+    assert len(handler.requests) == 1 + settings.WEBHOOK_MAX_RETRIES
+    letter, = webhooks.dead_letters()
+    assert letter["url"] == url and letter["payload"]["job_id"] == "j1"
+    assert "500" in letter["error"]
+
+    handler.fail_first = 0
+    assert webhooks.requeue_dead_letters() == 1
+    SimpleWorker([webhooks.webhook_queue], connection=redis).work(burst=True)
+    assert len(handler.requests) == 2 + settings.WEBHOOK_MAX_RETRIES
+    assert webhooks.dead_letters() == []
+
+
+def test_retry_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_RETRIES", 3)
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_BASE_SECONDS", 10)
+    assert webhooks.retry_intervals() == [10, 30, 90]
+
+
+def test_connects_to_validated_address(redis, receiver, monkeypatch):
+    """Имя разрешается один раз при проверке; запрос идёт на этот IP с исходным Host"""
+    handler, url = receiver
+    fake_dns(monkeypatch, "127.0.0.1")
+    port = url.split(":")[2].split("/")[0]
+    deliver(redis, f"http://hooks.example:{port}/hook")
+
+    (headers, _), = handler.requests
+    assert headers["Host"] == f"hooks.example:{port}"
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "169.254.169.254", "::ffff:192.168.0.1"])
+def test_private_addresses_rejected(monkeypatch, address):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOW_PRIVATE_HOSTS", False)
+    fake_dns(monkeypatch, address)
+    with pytest.raises(ValueError):
+        webhooks.validate_callback_url("https://hooks.example/hook")
+
+
+def test_public_address_and_scheme(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOW_PRIVATE_HOSTS", False)
+    fake_dns(monkeypatch, "93.184.216.34")
+    assert webhooks.validate_callback_url("https://hooks.example/hook") == "93.184.216.34"
+    with pytest.raises(ValueError):
+        webhooks.validate_callback_url("ftp://hooks.example/hook")
+
+
+def test_not_delivered_after_rebinding(redis, receiver, monkeypatch):
+    """Хост после подписки стал указывать во внутреннюю сеть — доставки нет и повторов нет"""
+    handler, _ = receiver
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOW_PRIVATE_HOSTS", False)
+    fake_dns(monkeypatch, "127.0.0.1")
+    deliver(redis, "http://hooks.example/hook")
+
+    assert handler.requests == []
+    assert webhooks.dead_letters() == []